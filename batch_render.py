@@ -0,0 +1,235 @@
+"""
+Offline rendering of route maps, many at a time.
+
+Renders the route between every pair of rooms (or the first --limit
+pairs) to PNG files, drawn like DepartmentGraph.visualize draws a path,
+plus the route line of the interactive map. The routes are looked up in
+the main process and drawn by a pool of worker processes.
+
+The floor plan is decoded once and handed to the workers as a
+memory-mapped array, so they neither decode Map.png again nor hold a
+private copy of the raw pixels. Every worker sets up one Agg figure with
+the map and the door markers, without pyplot, and renders that static
+layer once. For each image it only redraws the route artists over a copy
+of it, the way the interactive map blits (see BlitManager), and writes
+the pixels out as a PNG file.
+
+Usage:
+    python batch_render.py [--output-dir route_maps] [--workers N]
+                           [--limit N] [--profile no_stairs] [--dpi 100]
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from navigation_system import (DEFAULT_PROFILE, WEIGHT_PROFILES, BlitManager,
+                               DepartmentGraph)
+
+OUTPUT_DIR = 'route_maps'
+FIGURE_SIZE = (14, 12)  # Inches, as DepartmentGraph.visualize
+DEFAULT_DPI = 100
+TASKS_PER_CHUNK = 8  # Routes sent to a worker at a time
+# zlib level of the PNG files: 1 writes them several times faster than the
+# default 6, for files that are about a third larger
+PNG_COMPRESS_LEVEL = 1
+
+# The RouteFigure of this worker process, set up by _init_worker
+_figure = None
+
+
+class RouteFigure:
+    """
+    An Agg figure with the floor plan and door markers. It is reused for
+    every route a worker renders: only the route line, the rooms along it,
+    the start and end markers and the title are drawn again for each image.
+    """
+
+    def __init__(self, bg_img, door_x, door_y, dpi=DEFAULT_DPI):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Patch, Rectangle
+
+        self.figure = Figure(figsize=FIGURE_SIZE, dpi=dpi, facecolor='#f0f0f8')
+        FigureCanvasAgg(self.figure)
+        ax = self.figure.add_subplot(facecolor='#f0f0f8')
+        ax.set_xticks([])
+        ax.set_yticks([])
+        ax.imshow(bg_img, extent=[0, 900, 0, 600], zorder=0)
+        ax.add_patch(Rectangle(
+            (0, 580), 900, 40, facecolor='#3a506b', alpha=0.7, zorder=30))
+        ax.scatter(door_x, door_y, c='#ff9e00', edgecolor='white', linewidth=1,
+                   s=40, alpha=0.9, zorder=10)
+        self.ax = ax
+
+        self.line, = ax.plot([], [], linewidth=5, alpha=0.9, zorder=20,
+                             solid_capstyle='round', color='#e94560')
+        # Doors and other rooms the route passes
+        self.stops = ax.scatter(np.empty(0), np.empty(0), c='#ff9e00', edgecolor='white',
+                                linewidth=1, s=60, alpha=1.0, zorder=28)
+        self.ends = []
+        for label, color in (("START", '#06d6a0'), ("END", '#7209b7')):
+            marker = ax.scatter(np.empty(0), np.empty(0), c=color, edgecolor='white',
+                                linewidth=1.5, s=150, marker='*', zorder=30)
+            text = ax.text(0, 0, label, color='white', fontweight='bold',
+                           horizontalalignment='center', verticalalignment='center',
+                           fontsize=12, zorder=35,
+                           bbox=dict(facecolor=color, alpha=0.9, edgecolor='white',
+                                     boxstyle='round,pad=0.3'))
+            self.ends.append((marker, text))
+
+        self.figure.legend(handles=[
+            Patch(color='#ff9e00', label='Door Nodes'),
+            Patch(color='#e94560', label='Path'),
+            Patch(color='#06d6a0', label='Start'),
+            Patch(color='#7209b7', label='End')],
+            loc='lower center', ncol=4, bbox_to_anchor=(0.5, 0), fontsize=10)
+        self.figure.subplots_adjust(left=0.02, right=0.98, top=0.95, bottom=0.06)
+
+        # Render the static layer once
+        self.blit = BlitManager(self.figure.canvas)
+        self.blit.add(ax.title)
+        self.blit.add(self.line)
+        self.blit.add(self.stops)
+        for marker, text in self.ends:
+            self.blit.add(marker)
+            self.blit.add(text)
+        self.figure.canvas.draw()
+
+    def render(self, filename, title, xs, ys, stops):
+        """
+        Draws one route and saves it as a PNG file.
+
+        Parameters:
+        - title: Title above the map
+        - xs, ys: Coordinates of every node of the route, start to end
+        - stops: Boolean mask of the nodes between start and end that are
+          drawn as rooms (everything but the junctions)
+        """
+        from matplotlib.image import imsave
+
+        self.line.set_data(xs, ys)
+        self.stops.set_offsets(np.column_stack((xs[stops], ys[stops])))
+        for (marker, text), index in zip(self.ends, (0, -1)):
+            marker.set_offsets([[xs[index], ys[index]]])
+            text.set_position((xs[index], ys[index] - 40))
+        self.ax.set_title(title, fontsize=18, color='white', fontweight='bold', pad=10)
+        self.blit.update()
+        imsave(filename, np.asarray(self.figure.canvas.buffer_rgba()),
+               pil_kwargs={'compress_level': PNG_COMPRESS_LEVEL})
+
+
+def _init_worker(image_file, door_x, door_y, dpi):
+    global _figure
+    bg_img = np.load(image_file, mmap_mode='r')
+    _figure = RouteFigure(bg_img, door_x, door_y, dpi)
+
+
+def _render(task):
+    # Runs in a worker; returns the seconds it took
+    started = time.perf_counter()
+    _figure.render(*task)
+    return time.perf_counter() - started
+
+
+def display_name(name):
+    return name.replace("_door", "").replace("_", " ")
+
+
+def route_tasks(graph, pairs, output_dir, profile=DEFAULT_PROFILE):
+    """
+    Looks up the route of every (start, end) pair and yields the render
+    tasks for the workers. Pairs without a route are skipped.
+    """
+    for start, end in pairs:
+        path, _ = graph.find_shortest_path(start, end, "table", profile=profile)
+        if path is None:
+            continue
+        names = [node.name for node in path]
+        stops = np.array(["Junction" not in name for name in names])
+        stops[[0, -1]] = False
+        filename = os.path.join(output_dir, f"{start}__{end}.png")
+        title = f"Path from {display_name(start)} to {display_name(end)}"
+        yield (filename, title,
+               np.array([node.x for node in path]),
+               np.array([node.y for node in path]), stops)
+
+
+def render_routes(graph, pairs, output_dir=OUTPUT_DIR, workers=None,
+                  profile=DEFAULT_PROFILE, dpi=DEFAULT_DPI):
+    """
+    Renders the route of every (start, end) pair into output_dir with a
+    pool of worker processes.
+
+    Returns (number of images, wall-clock seconds, seconds the workers
+    spent rendering).
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Door nodes, Main_Entrance and Corridor nodes, as visualize draws them
+    doors = graph.door_marker_ids()
+    door_x = graph.node_x[doors]
+    door_y = graph.node_y[doors]
+
+    # The decoded floor plan as 8-bit RGB, which is what Map.png holds
+    bg_img = graph.bg_img
+    if bg_img.dtype != np.uint8:
+        bg_img = np.round(bg_img * 255).astype(np.uint8)
+
+    started = time.perf_counter()
+    count = 0
+    busy = 0.0
+    with tempfile.TemporaryDirectory() as directory:
+        image_file = os.path.join(directory, 'map.npy')
+        np.save(image_file, bg_img)
+        with Pool(workers, initializer=_init_worker,
+                  initargs=(image_file, door_x, door_y, dpi)) as pool:
+            tasks = route_tasks(graph, pairs, output_dir, profile)
+            for seconds in pool.imap_unordered(_render, tasks, TASKS_PER_CHUNK):
+                count += 1
+                busy += seconds
+    return count, time.perf_counter() - started, busy
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the routes between rooms to PNG files in parallel.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR,
+                        help=f"directory for the images (default: {OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="only render the first N room pairs")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE,
+                        choices=sorted(WEIGHT_PROFILES),
+                        help=f"weight profile (default: {DEFAULT_PROFILE})")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI,
+                        help=f"resolution of the images (default: {DEFAULT_DPI})")
+    args = parser.parse_args()
+
+    graph = DepartmentGraph()
+    pairs = list(itertools.islice(
+        itertools.combinations(graph.destination_names(), 2), args.limit))
+    workers = args.workers or os.cpu_count() or 1
+
+    count, seconds, busy = render_routes(graph, pairs, args.output_dir, workers,
+                                         args.profile, args.dpi)
+    if count < len(pairs):
+        print(f"No route for {len(pairs) - count} of {len(pairs)} room pairs")
+    print(f"Rendered {count} images to {args.output_dir} in {seconds:.1f} s "
+          f"with {workers} workers")
+    if count:
+        print(f"  {count / seconds:.1f} images/s, "
+              f"{count / seconds / workers:.2f} images/s per core "
+              f"({busy / count * 1000:.0f} ms of rendering per image)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Compares the guided search methods against plain Dijkstra on every ordered
+pair of rooms.
+
+For each pair every method must return the same route and distance as
+Dijkstra; the script reports how many nodes each search expanded, and how
+many fewer than Dijkstra over all pairs together.
+
+Usage:
+    python benchmarks/compare_search.py [--verbose] [--route START END]
+"""
+import argparse
+import os
+import sys
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from navigation_system import DepartmentGraph  # noqa: E402
+
+
+METHODS = ["dijkstra", "astar", "bidirectional", "ch"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare search methods against Dijkstra.")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print the expanded node counts of every pair")
+    parser.add_argument("--route", nargs=2, metavar=("START", "END"),
+                        default=("Library_door", "Room_106_door"),
+                        help="route to report separately "
+                             "(default: Library_door Room_106_door)")
+    args = parser.parse_args()
+
+    graph = DepartmentGraph()
+    # Every query has to run its own search
+    graph.route_cache = None
+    rooms = graph.destination_names()
+
+    totals = dict.fromkeys(METHODS, 0)
+    mismatches = []
+    for start in rooms:
+        for end in rooms:
+            if start == end:
+                continue
+            expanded = {}
+            path, distance = graph.find_shortest_path(start, end, "dijkstra")
+            expanded["dijkstra"] = graph.last_expanded
+            for method in METHODS[1:]:
+                other_path, other_distance = graph.find_shortest_path(
+                    start, end, method)
+                expanded[method] = graph.last_expanded
+                if path != other_path or abs(distance - other_distance) > 1e-9:
+                    mismatches.append((start, end, method))
+
+            for method in METHODS:
+                totals[method] += expanded[method]
+            if args.verbose:
+                counts = "  ".join(f"{method} {expanded[method]:3d}"
+                                   for method in METHODS)
+                print(f"{start:>28} -> {end:<28} {counts}")
+
+    pairs = len(rooms) * (len(rooms) - 1)
+    print(f"Room pairs:       {pairs}")
+    print(f"Heuristic scale:  {graph.heuristic_scale:.3f}")
+    print("Expanded nodes:")
+    for method in METHODS:
+        saved = totals["dijkstra"] - totals[method]
+        reduction = saved / totals["dijkstra"]
+        print(f"  {method:<14} {totals[method]:7d} "
+              f"({totals[method] / pairs:5.1f} per query, "
+              f"{saved:6d} or {reduction:6.1%} fewer)")
+
+    start, end = args.route
+    print(f"{start} -> {end}:")
+    for method in METHODS:
+        graph.find_shortest_path(start, end, method)
+        print(f"  {method:<14} {graph.last_expanded:3d} expanded")
+
+    print(f"Route mismatches: {len(mismatches)}")
+    for start, end, method in mismatches:
+        print(f"  {start} -> {end} ({method})")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Cost of closing and reopening edges at runtime.
+
+Closes random edges one at a time and reopens them again, with the route
+table, zone overlay and a warm route cache in place. It times how long
+close_edge and reopen_edge take to repair them and how many route table
+rows each one touched, and compares that with rebuilding the table and
+overlay from scratch. Runs on the department graph and on a generated
+campus graph.
+
+Usage:
+    python benchmarks/edge_closures.py [--edges N] [--campus-nodes N] [--verify]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+import numpy as np  # noqa: E402
+
+from campus_generator import generate_campus  # noqa: E402
+from navigation_system import DepartmentGraph, RouteTable, ZoneOverlay  # noqa: E402
+from run_benchmarks import summarize  # noqa: E402
+
+
+def warm_cache(graph, rng, queries):
+    doors = graph.destination_names()
+    for _ in range(queries):
+        graph.find_shortest_path(rng.choice(doors), rng.choice(doors), "table")
+
+
+def bench_graph(label, graph, num_edges, verify, seed=0):
+    rng = random.Random(seed)
+    graph.prepare_route_table(path=None)
+    graph.zone_overlay()
+    warm_cache(graph, rng, graph.route_cache.max_size)
+
+    rebuild = []
+    for _ in range(3):
+        started = time.perf_counter()
+        RouteTable.build(graph)
+        ZoneOverlay(graph)
+        rebuild.append(time.perf_counter() - started)
+
+    edges = rng.sample(range(len(graph.edge_u)), min(num_edges, len(graph.edge_u)))
+    timings = {"close": [], "reopen": []}
+    rows = {"close": [], "reopen": []}
+    for edge_id in edges:
+        u = graph.node_names[graph.edge_u[edge_id]]
+        v = graph.node_names[graph.edge_v[edge_id]]
+        for action, change in (("close", graph.close_edge), ("reopen", graph.reopen_edge)):
+            started = time.perf_counter()
+            change(u, v)
+            timings[action].append(time.perf_counter() - started)
+            rows[action].append(graph.last_repaired_rows)
+            if verify:
+                # Where routes tie the repaired trees may pick a different
+                # one, so only the distances have to match
+                full = RouteTable.build(graph)
+                assert np.allclose(full.distances, graph.route_table.distances,
+                                   rtol=1e-12, atol=1e-9)
+            warm_cache(graph, rng, 20)
+
+    rebuild_ms = summarize(rebuild)["p50_ms"]
+    print(f"{label}: {len(graph.node_names)} nodes, {len(graph.edge_u)} edges")
+    print(f"  full rebuild      p50 {rebuild_ms:9.2f} ms")
+    for action in ("close", "reopen"):
+        summary = summarize(timings[action])
+        print(f"  {action + '_edge':<17} p50 {summary['p50_ms']:9.2f} ms   "
+              f"p95 {summary['p95_ms']:9.2f} ms   "
+              f"{np.mean(rows[action]):7.1f} of {len(graph.node_names)} rows repaired   "
+              f"{rebuild_ms / summary['p50_ms']:6.1f}x faster than a rebuild")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare incremental repair after edge closures with a full rebuild.")
+    parser.add_argument("--edges", type=int, default=50,
+                        help="edges closed and reopened per graph (default: 50)")
+    parser.add_argument("--campus-nodes", type=int, default=1000,
+                        help="approximate size of the generated campus (default: 1000)")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the distances of every repaired table against a full rebuild")
+    args = parser.parse_args()
+
+    bench_graph("Department", DepartmentGraph(), args.edges, args.verify)
+    bench_graph("Campus", generate_campus(args.campus_nodes), args.edges, args.verify)
+
+
+if __name__ == "__main__":
+    main()
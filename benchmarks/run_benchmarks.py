@@ -0,0 +1,265 @@
+"""
+Benchmark suite for graph construction, routing and rendering.
+
+Times every stage of DepartmentGraph construction separately, routes every
+ordered pair of rooms with each search method, renders routes with the Agg
+backend and with RasterRenderer, and repeats the routing benchmark on
+synthetic campus graphs (see campus_generator.py) that are larger than the
+department. Latencies are reported as p50/p95/p99 in milliseconds, memory
+as the peak traced allocation of each stage, and the results are written
+to a JSON file so runs can be compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--output FILE] [--quick]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np  # noqa: E402
+
+import navigation_system  # noqa: E402
+from campus_generator import generate_campus  # noqa: E402
+from navigation_system import DepartmentGraph  # noqa: E402
+from raster_renderer import RasterRenderer  # noqa: E402
+
+METHODS = ["dijkstra", "astar", "bidirectional", "table", "ch"]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    if len(values) == 0:
+        return {"count": 0}
+    return {
+        "count": int(len(values)),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def time_calls(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def peak_memory(func):
+    """Peak traced allocation in bytes while func runs (measured in a
+    separate run, since tracing slows the code down)."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_construction(repeat):
+    def load_image():
+        graph = DepartmentGraph(None)
+        graph.load_background_image()
+
+    def load_definition():
+        navigation_system.load_building_definition()
+
+    def create_nodes():
+        graph = DepartmentGraph(None)
+        graph.definition_file = navigation_system.BUILDING_FILE
+        graph.create_nodes()
+        return graph
+
+    def create_edges():
+        graph = create_nodes()
+        graph.create_edges()
+
+    def load_snapshot():
+        DepartmentGraph()
+
+    # Make sure the snapshot exists before timing loads of it
+    DepartmentGraph()
+
+    stages = {
+        "load_background_image": load_image,
+        "load_definition": load_definition,
+        "create_nodes": create_nodes,
+        "create_nodes+create_edges": create_edges,
+        "full_build_without_snapshot": lambda: DepartmentGraph(snapshot_file=None),
+        "load_snapshot": load_snapshot,
+    }
+    results = {}
+    for name, func in stages.items():
+        results[name] = summarize(time_calls(func, repeat))
+        results[name]["peak_memory_bytes"] = peak_memory(func)
+        print(f"  {name:<30} p50 {results[name]['p50_ms']:8.2f} ms   "
+              f"peak {results[name]['peak_memory_bytes'] / 1024:8.0f} KiB")
+    return results
+
+
+def bench_routing(graph, pairs, methods):
+    # Every query has to run its own search
+    graph.route_cache = None
+    if "table" in methods:
+        graph.prepare_route_table(path=None)
+    if "ch" in methods:
+        graph.prepare_contraction_hierarchy(path=None)
+
+    results = {}
+    for method in methods:
+        samples = []
+        for start, end in pairs:
+            started = time.perf_counter()
+            graph.find_shortest_path(start, end, method)
+            samples.append(time.perf_counter() - started)
+        results[method] = summarize(samples)
+
+        def run_all():
+            for start, end in pairs[:200]:
+                graph.find_shortest_path(start, end, method)
+        results[method]["peak_memory_bytes"] = peak_memory(run_all)
+        print(f"  {method:<14} p50 {results[method]['p50_ms']:7.3f} ms   "
+              f"p95 {results[method]['p95_ms']:7.3f} ms   "
+              f"p99 {results[method]['p99_ms']:7.3f} ms")
+    return results
+
+
+def bench_rendering(graph, pairs, limit):
+    import matplotlib.pyplot as plt
+
+    def render(path):
+        graph.visualize(path)
+        figure = plt.gcf()
+        figure.canvas.draw()
+        plt.close(figure)
+
+    routes = []
+    for start, end in pairs[:limit]:
+        path, _ = graph.find_shortest_path(start, end)
+        routes.append(path)
+
+    # The first render pays for decoding the image and warming caches
+    render(None)
+    samples = []
+    for path in routes:
+        started = time.perf_counter()
+        render(path)
+        samples.append(time.perf_counter() - started)
+    result = summarize(samples)
+    result["peak_memory_bytes"] = peak_memory(lambda: render(routes[0]))
+    print(f"  visualize      p50 {result['p50_ms']:7.1f} ms   "
+          f"p95 {result['p95_ms']:7.1f} ms   ({len(samples)} routes)")
+    return result
+
+
+def bench_raster(graph, pairs, limit):
+    # The same routes drawn by RasterRenderer and encoded as PNG files
+    renderer = RasterRenderer(graph)
+    routes = [graph.find_shortest_path(start, end)[0] for start, end in pairs[:limit]]
+
+    # The first render draws the marker and label sprites
+    renderer.render_png(routes[0])
+    samples = []
+    for path in routes:
+        started = time.perf_counter()
+        renderer.render_png(path)
+        samples.append(time.perf_counter() - started)
+    result = summarize(samples)
+    result["peak_memory_bytes"] = peak_memory(lambda: renderer.render_png(routes[0]))
+    print(f"  raster png     p50 {result['p50_ms']:7.1f} ms   "
+          f"p95 {result['p95_ms']:7.1f} ms   ({len(samples)} routes)")
+    return result
+
+
+def bench_synthetic(sizes, queries, methods):
+    results = {}
+    for size in sizes:
+        started = time.perf_counter()
+        graph = generate_campus(size)
+        build_seconds = time.perf_counter() - started
+        rng = random.Random(size)
+        names = graph.node_names
+        doors = graph.destination_names()
+        pairs = [(rng.choice(doors), rng.choice(doors)) for _ in range(queries)]
+        print(f" {len(names)} nodes, {len(graph.edge_u)} edges "
+              f"(built in {build_seconds:.2f} s)")
+        # The all-pairs table is quadratic in memory, so skip it on big graphs
+        size_methods = [method for method in methods
+                        if method != "table" or len(names) <= 2000]
+        results[str(len(names))] = {
+            "nodes": len(names),
+            "edges": int(len(graph.edge_u)),
+            "build_seconds": build_seconds,
+            "routing": bench_routing(graph, pairs, size_methods),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark graph construction, routing and rendering.")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="JSON file for the results "
+                             "(default: benchmark_results.json)")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="repetitions of each construction stage")
+    parser.add_argument("--render-limit", type=int, default=30,
+                        help="number of routes to render")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="approximate node counts of the synthetic campus graphs")
+    parser.add_argument("--queries", type=int, default=500,
+                        help="random queries per synthetic graph")
+    parser.add_argument("--quick", action="store_true",
+                        help="small run for smoke testing")
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat, args.render_limit = 3, 3
+        args.sizes, args.queries = [1000], 50
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+    }
+
+    print("Graph construction:")
+    results["construction"] = bench_construction(args.repeat)
+
+    graph = DepartmentGraph()
+    rooms = graph.destination_names()
+    pairs = [(start, end) for start in rooms for end in rooms if start != end]
+    print(f"Routing, {len(pairs)} ordered room pairs:")
+    results["routing"] = bench_routing(graph, pairs, METHODS)
+
+    print("Rendering (Agg):")
+    rng = random.Random(0)
+    render_pairs = rng.sample(pairs, min(args.render_limit, len(pairs)))
+    results["rendering"] = bench_rendering(graph, render_pairs, args.render_limit)
+    results["raster"] = bench_raster(graph, render_pairs, args.render_limit)
+
+    print("Synthetic graphs:")
+    results["synthetic"] = bench_synthetic(args.sizes, args.queries, METHODS)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Scaling benchmark on synthetic campus graphs.
+
+Generates campus graphs from 10^3 up to 10^6 nodes with campus_generator
+and records, for every size, the build time, the memory held by the graph
+and the p50/p95/p99 latency of random door-to-door queries with each search
+method, including the contraction hierarchy (with its preprocessing time
+and size) and the zone overlay, plus the k_shortest_paths alternatives
+query. The same queries also run on a dict-of-dicts adjacency with the
+plain Dijkstra the navigation system used to have, so the point where that
+representation stops being usable shows up next to the array-based one.
+The results are written to a JSON file.
+
+Usage:
+    python benchmarks/scaling.py [--sizes 1000 10000 100000 1000000]
+"""
+import argparse
+import heapq
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from campus_generator import generate_campus  # noqa: E402
+from run_benchmarks import summarize  # noqa: E402
+
+METHODS = ["dijkstra", "astar", "bidirectional", "ch", "zones"]
+
+
+def dict_adjacency(graph):
+    """The graph as {name: {neighbour name: weight}}."""
+    adjacency = {name: {} for name in graph.node_names}
+    names = graph.node_names
+    for u, v, weight in zip(graph.edge_u.tolist(), graph.edge_v.tolist(),
+                            graph.edge_weight.tolist()):
+        adjacency[names[u]][names[v]] = weight
+        adjacency[names[v]][names[u]] = weight
+    return adjacency
+
+
+def dict_dijkstra(adjacency, start, end):
+    """Dijkstra over a dict-of-dicts adjacency, as the original code did it."""
+    distances = {node: float('inf') for node in adjacency}
+    distances[start] = 0
+    previous = {node: None for node in adjacency}
+    queue = [(0, start)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if node == end:
+            break
+        if distance > distances[node]:
+            continue
+        for neighbor, weight in adjacency[node].items():
+            candidate = distance + weight
+            if candidate < distances[neighbor]:
+                distances[neighbor] = candidate
+                previous[neighbor] = node
+                heapq.heappush(queue, (candidate, neighbor))
+    path = []
+    node = end
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return path[::-1], distances[end]
+
+
+def graph_bytes(graph):
+    """Bytes held by the graph's arrays."""
+    arrays = (graph.node_x, graph.node_y, graph.node_is_room, graph.edge_u,
+              graph.edge_v, graph.edge_weight, graph.offsets,
+              graph.targets, graph.weights, graph.arc_edge)
+    return int(sum(array.nbytes for array in arrays))
+
+
+def time_queries(run, pairs):
+    samples = []
+    for start, end in pairs:
+        started = time.perf_counter()
+        run(start, end)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_size(size, queries, dict_limit, trace_memory):
+    result = {"target_nodes": size}
+
+    started = time.perf_counter()
+    graph = generate_campus(size)
+    result["build_seconds"] = time.perf_counter() - started
+    result["nodes"] = len(graph.node_names)
+    result["edges"] = int(len(graph.edge_u))
+    result["array_bytes"] = graph_bytes(graph)
+    if trace_memory:
+        # Generate again under tracemalloc: what stays allocated is the graph
+        tracemalloc.start()
+        traced = generate_campus(size)
+        result["traced_bytes"], result["traced_peak_bytes"] = \
+            tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced
+    print(f" {result['nodes']} nodes, {result['edges']} edges, "
+          f"built in {result['build_seconds']:.2f} s, "
+          f"arrays {result['array_bytes'] / 1e6:.1f} MB")
+
+    rng = random.Random(size)
+    doors = graph.destination_names()
+    pairs = [(rng.choice(doors), rng.choice(doors)) for _ in range(queries)]
+    # Every query has to run its own search
+    graph.route_cache = None
+
+    started = time.perf_counter()
+    hierarchy = graph.prepare_contraction_hierarchy(path=None)
+    result["ch_build_seconds"] = time.perf_counter() - started
+    result["ch_shortcuts"] = hierarchy.num_shortcuts
+    result["ch_bytes"] = int(sum(array.nbytes for array in (
+        hierarchy.rank, hierarchy.offsets, hierarchy.targets,
+        hierarchy.weights, hierarchy.middles)))
+    print(f"  contraction hierarchy built in {result['ch_build_seconds']:.2f} s, "
+          f"{result['ch_shortcuts']} shortcuts, {result['ch_bytes'] / 1e6:.1f} MB")
+
+    started = time.perf_counter()
+    overlay = graph.zone_overlay()
+    result["zone_overlay_build_seconds"] = time.perf_counter() - started
+    result["zone_overlay_boundary_nodes"] = overlay.num_boundary_nodes
+    print(f"  zone overlay built in {result['zone_overlay_build_seconds']:.2f} s, "
+          f"{overlay.num_zones} zones, {overlay.num_boundary_nodes} boundary nodes")
+
+    result["routing"] = {}
+    for method in METHODS:
+        expanded = []
+
+        def run(start, end):
+            graph.find_shortest_path(start, end, method)
+            expanded.append(graph.last_expanded)
+        summary = summarize(time_queries(run, pairs))
+        summary["mean_expanded"] = float(np.mean(expanded))
+        result["routing"][method] = summary
+        print(f"  {method:<14} p50 {summary['p50_ms']:8.3f} ms   "
+              f"p95 {summary['p95_ms']:8.3f} ms   "
+              f"expanded {summary['mean_expanded']:9.0f}")
+
+    expanded = []
+
+    def run_alternatives(start, end):
+        graph.k_shortest_paths(start, end)
+        expanded.append(graph.last_expanded)
+    summary = summarize(time_queries(run_alternatives, pairs))
+    summary["mean_expanded"] = float(np.mean(expanded))
+    result["routing"]["k_shortest"] = summary
+    print(f"  {'k_shortest':<14} p50 {summary['p50_ms']:8.3f} ms   "
+          f"p95 {summary['p95_ms']:8.3f} ms   "
+          f"expanded {summary['mean_expanded']:9.0f}")
+
+    if result["nodes"] <= dict_limit:
+        started = time.perf_counter()
+        adjacency = dict_adjacency(graph)
+        dict_result = {"build_seconds": time.perf_counter() - started}
+        if trace_memory:
+            tracemalloc.start()
+            traced = dict_adjacency(graph)
+            dict_result["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del traced
+        dict_result.update(summarize(time_queries(
+            lambda start, end: dict_dijkstra(adjacency, start, end), pairs)))
+        result["routing"]["dict_dijkstra"] = dict_result
+        print(f"  {'dict_dijkstra':<14} p50 {dict_result['p50_ms']:8.3f} ms   "
+              f"p95 {dict_result['p95_ms']:8.3f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark graph build, memory and routing on campus graphs.")
+    parser.add_argument("--sizes", type=int, nargs="*",
+                        default=[1000, 10000, 100000],
+                        help="approximate node counts (default: 1000 10000 100000)")
+    parser.add_argument("--queries", type=int, default=100,
+                        help="random door-to-door queries per size (default: 100)")
+    parser.add_argument("--dict-limit", type=int, default=200000,
+                        help="largest graph to also route with the dict-based "
+                             "Dijkstra (default: 200000)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc measurements")
+    parser.add_argument("--output", default="scaling_results.json",
+                        help="JSON file for the results (default: scaling_results.json)")
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "sizes": [],
+    }
+    for size in args.sizes:
+        print(f"Campus of ~{size} nodes:")
+        results["sizes"].append(bench_size(size, args.queries, args.dict_limit,
+                                           not args.no_memory))
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures the cold-start time of a single distance query.
+
+Each run starts a fresh Python process. "headless" uses the route
+subcommand, which never imports matplotlib or decodes Map.png. "eager" does
+what every start did before: import pyplot and animation, build the graph,
+decode the floor plan and then answer the same query.
+
+Usage:
+    python benchmarks/startup_time.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERY = ("Library", "Room 106")
+
+COMMANDS = {
+    "headless": [sys.executable, "navigation_system.py", "route", *QUERY],
+    "eager": [sys.executable, "-c",
+              "import matplotlib.pyplot, matplotlib.animation\n"
+              "import navigation_system as ns\n"
+              "nav = ns.NavigationSystem()\n"
+              "nav.graph.bg_img\n"
+              f"nav.route({QUERY[0]!r}, {QUERY[1]!r})\n"],
+}
+
+
+def time_command(command, runs):
+    env = dict(os.environ, MPLBACKEND="Agg")
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare headless and eager cold-start query times.")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="processes started per mode (default: 10)")
+    args = parser.parse_args()
+
+    # One untimed run of each so the route table and OS caches are warm
+    for command in COMMANDS.values():
+        time_command(command, 1)
+
+    medians = {}
+    for mode, command in COMMANDS.items():
+        timings = time_command(command, args.runs)
+        medians[mode] = statistics.median(timings)
+        print(f"{mode:<9} median {medians[mode] * 1000:7.1f} ms   "
+              f"min {min(timings) * 1000:7.1f} ms")
+
+    print(f"Headless start is {medians['eager'] / medians['headless']:.1f}x "
+          f"faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Synthetic campus-scale graphs for testing and benchmarking.
+
+A campus is a grid of buildings. Every building has several floors, and
+every floor is a corridor loop of junction nodes with room doors on both
+sides of the corridor. Stairs connect the same two junctions on adjacent
+floors, each building's entrance door leads from its ground floor to an
+outdoor junction in front of it, and outdoor walkways connect neighbouring
+buildings.
+
+The graphs use the same conventions as building.json. Names follow the
+department map ("..._door" for doors, "Junction_..." for corridor nodes).
+Each edge weighs its straight-line length times a factor: most are 1,
+some corridors carry the 5x penalty, and preferred corridors and covered
+walkways get the 0.5 discount. Like on the department map, every floor is
+drawn in its own area, so stairs have a real length. Every floor is its
+own zone ("B<building>_F<floor>"); the entrance and the outdoor junction
+in front of it belong to the ground floor.
+
+Of the two vertical connections of every floor, the one at junction 0 is
+flagged as stairs and the other is left unflagged as a lift, so every
+floor stays reachable without stairs. A few doors are flagged staff only.
+The building entrances are the evacuation exits.
+
+Usage:
+    python campus_generator.py 100000 [--floors 4] [--output campus.graph]
+"""
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from navigation_system import EDGE_STAFF_ONLY, EDGE_STAIRS, DepartmentGraph
+
+# Layout of one building in map units
+BUILDING_WIDTH = 400.0
+FLOOR_HEIGHT = 120.0
+CORRIDOR_LEFT = 50.0
+CORRIDOR_RIGHT = 350.0
+CORRIDOR_BOTTOM = 20.0
+CORRIDOR_TOP = 100.0
+DOOR_OFFSET = 8.0
+GROUND_MARGIN = 60.0  # Room below the ground floor for the entrance and walkway
+
+# Edge factors, matching the penalty and discount used in building.json
+PENALTY_FACTOR = 5.0
+PREFERRED_FACTOR = 0.5
+PENALTY_PROBABILITY = 0.05
+PREFERRED_PROBABILITY = 0.05
+COVERED_WALKWAY_PROBABILITY = 0.2
+STAFF_ONLY_PROBABILITY = 0.05  # Doors that are flagged staff only
+
+
+def _corridor_loop(num_junctions):
+    """
+    Evenly spaced points around the rectangular corridor of one floor, with
+    the outward unit normal of the side each point lies on. Point 0 is the
+    bottom-left corner.
+    """
+    width = CORRIDOR_RIGHT - CORRIDOR_LEFT
+    height = CORRIDOR_TOP - CORRIDOR_BOTTOM
+    perimeter = 2 * (width + height)
+    position = np.arange(num_junctions) * perimeter / num_junctions
+
+    xs = np.empty(num_junctions)
+    ys = np.empty(num_junctions)
+    normal_x = np.zeros(num_junctions)
+    normal_y = np.zeros(num_junctions)
+
+    bottom = position < width
+    right = (position >= width) & (position < width + height)
+    top = (position >= width + height) & (position < 2 * width + height)
+    left = position >= 2 * width + height
+
+    xs[bottom] = CORRIDOR_LEFT + position[bottom]
+    ys[bottom] = CORRIDOR_BOTTOM
+    normal_y[bottom] = -1.0
+    xs[right] = CORRIDOR_RIGHT
+    ys[right] = CORRIDOR_BOTTOM + position[right] - width
+    normal_x[right] = 1.0
+    xs[top] = CORRIDOR_RIGHT - (position[top] - width - height)
+    ys[top] = CORRIDOR_TOP
+    normal_y[top] = 1.0
+    xs[left] = CORRIDOR_LEFT
+    ys[left] = CORRIDOR_TOP - (position[left] - 2 * width - height)
+    normal_x[left] = -1.0
+    return xs, ys, normal_x, normal_y
+
+
+def _random_factors(rng, count, penalty_probability, preferred_probability):
+    draws = rng.random(count)
+    factors = np.ones(count)
+    factors[draws < penalty_probability] = PENALTY_FACTOR
+    factors[(draws >= penalty_probability)
+            & (draws < penalty_probability + preferred_probability)] = PREFERRED_FACTOR
+    return factors
+
+
+def generate_campus(target_nodes=10000, floors=4, junctions_per_floor=40,
+                    doors_per_junction=2, seed=0):
+    """
+    Generates a campus graph with roughly target_nodes nodes.
+
+    Parameters:
+    - target_nodes: Approximate number of nodes; buildings are added until
+      it is reached
+    - floors: Floors per building
+    - junctions_per_floor: Corridor junctions around each floor
+    - doors_per_junction: Doors at each junction (1 or 2: outer and inner side)
+    - seed: Seed for the random penalty/discount factors and staff-only doors
+
+    Returns a frozen DepartmentGraph.
+    """
+    if doors_per_junction not in (1, 2):
+        raise ValueError("doors_per_junction must be 1 or 2")
+    if junctions_per_floor < 4:
+        raise ValueError("junctions_per_floor must be at least 4")
+
+    rng = np.random.default_rng(seed)
+    num_floors = floors
+    num_junctions = junctions_per_floor
+    num_doors = doors_per_junction
+    per_building = num_floors * num_junctions * (1 + num_doors) + 2
+    num_buildings = max(1, math.ceil(target_nodes / per_building))
+    columns = math.ceil(math.sqrt(num_buildings))
+    building_height = GROUND_MARGIN + num_floors * FLOOR_HEIGHT
+
+    # Node ids: all junctions, then all doors, then the entrance doors,
+    # then the outdoor junctions in front of the entrances
+    junction_count = num_buildings * num_floors * num_junctions
+    junction_ids = np.arange(junction_count).reshape(
+        num_buildings, num_floors, num_junctions)
+    door_ids = junction_count + np.arange(junction_count * num_doors).reshape(
+        num_buildings, num_floors, num_junctions, num_doors)
+    entrance_ids = junction_count * (1 + num_doors) + np.arange(num_buildings)
+    outdoor_ids = entrance_ids[-1] + 1 + np.arange(num_buildings)
+
+    # Coordinates
+    building_x = (np.arange(num_buildings) % columns) * BUILDING_WIDTH
+    building_y = (np.arange(num_buildings) // columns) * building_height
+    loop_x, loop_y, normal_x, normal_y = _corridor_loop(num_junctions)
+    floor_y = GROUND_MARGIN + np.arange(num_floors) * FLOOR_HEIGHT
+
+    junction_x = np.broadcast_to(building_x[:, None, None] + loop_x,
+                                 junction_ids.shape)
+    junction_y = (building_y[:, None, None] + floor_y[None, :, None]
+                  + loop_y[None, None, :])
+    # The first door of a junction faces out of the corridor, the second in
+    side = np.array([1.0, -1.0])[:num_doors]
+    door_x = (junction_x[..., None]
+              + DOOR_OFFSET * normal_x[None, None, :, None] * side)
+    door_y = (junction_y[..., None]
+              + DOOR_OFFSET * normal_y[None, None, :, None] * side)
+    entrance_x = building_x + loop_x[0]
+    entrance_y = building_y + GROUND_MARGIN * 2 / 3
+    outdoor_x = entrance_x
+    outdoor_y = building_y + GROUND_MARGIN / 6
+
+    xs = np.concatenate([junction_x.ravel(), door_x.ravel(), entrance_x, outdoor_x])
+    ys = np.concatenate([junction_y.ravel(), door_y.ravel(), entrance_y, outdoor_y])
+
+    # Names
+    names = []
+    for building in range(num_buildings):
+        for floor in range(num_floors):
+            names.extend(f"Junction_B{building}_F{floor}_{junction}"
+                         for junction in range(num_junctions))
+    for building in range(num_buildings):
+        for floor in range(num_floors):
+            names.extend(f"B{building}_F{floor}_Room_{room}_door"
+                         for room in range(num_junctions * num_doors))
+    names.extend(f"B{building}_Entrance_door" for building in range(num_buildings))
+    names.extend(f"Campus_Junction_{building}" for building in range(num_buildings))
+
+    # Zones: one per floor, numbered building by building
+    zone_names = [f"B{building}_F{floor}" for building in range(num_buildings)
+                  for floor in range(num_floors)]
+    floor_zones = np.arange(num_buildings * num_floors).reshape(num_buildings, num_floors)
+    ground_zones = floor_zones[:, 0]
+    node_zone = np.concatenate([
+        np.repeat(floor_zones.ravel(), num_junctions),
+        np.repeat(floor_zones.ravel(), num_junctions * num_doors),
+        ground_zones, ground_zones])
+
+    # Edges, each with its factor and EDGE_* flags
+    edges_u = []
+    edges_v = []
+    factors = []
+    flags = []
+
+    def connect(u, v, factor, flag=0):
+        edges_u.append(np.ravel(u))
+        edges_v.append(np.ravel(v))
+        factors.append(np.broadcast_to(factor, np.ravel(u).shape))
+        flags.append(np.broadcast_to(flag, np.ravel(u).shape))
+
+    # Corridor loops, with some penalised and some preferred segments
+    loop_next = np.roll(junction_ids, -1, axis=2)
+    connect(junction_ids, loop_next, _random_factors(
+        rng, junction_ids.size, PENALTY_PROBABILITY, PREFERRED_PROBABILITY))
+    # Doors
+    staff_only = rng.random(door_ids.size) < STAFF_ONLY_PROBABILITY
+    connect(np.broadcast_to(junction_ids[..., None], door_ids.shape), door_ids, 1.0,
+            np.where(staff_only, EDGE_STAFF_ONLY, 0))
+    # Stairs and a lift at two opposite junctions of every floor
+    if num_floors > 1:
+        for junction, flag in ((0, EDGE_STAIRS), (num_junctions // 2, 0)):
+            connect(junction_ids[:, :-1, junction], junction_ids[:, 1:, junction],
+                    1.0, flag)
+    # Entrances and the walkways between neighbouring buildings
+    connect(entrance_ids, junction_ids[:, 0, 0], 1.0)
+    connect(entrance_ids, outdoor_ids, 1.0)
+    buildings = np.arange(num_buildings)
+    east = buildings[(buildings % columns < columns - 1) & (buildings + 1 < num_buildings)]
+    north = buildings[buildings + columns < num_buildings]
+    for first, second in ((east, east + 1), (north, north + columns)):
+        connect(outdoor_ids[first], outdoor_ids[second], _random_factors(
+            rng, len(first), 0.0, COVERED_WALKWAY_PROBABILITY))
+
+    edge_u = np.concatenate(edges_u)
+    edge_v = np.concatenate(edges_v)
+    factor = np.concatenate(factors)
+    edge_flags = np.concatenate(flags)
+    weights = np.hypot(xs[edge_u] - xs[edge_v], ys[edge_u] - ys[edge_v]) * factor
+
+    return DepartmentGraph.from_arrays(names, xs, ys, edge_u, edge_v, weights,
+                                       node_zone=node_zone, zone_names=zone_names,
+                                       edge_flags=edge_flags,
+                                       exit_names=[names[node] for node in entrance_ids])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic campus graph.")
+    parser.add_argument("nodes", type=int, help="approximate number of nodes")
+    parser.add_argument("--floors", type=int, default=4)
+    parser.add_argument("--junctions", type=int, default=40,
+                        help="corridor junctions per floor (default: 40)")
+    parser.add_argument("--doors", type=int, default=2, choices=[1, 2],
+                        help="doors per junction (default: 2)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="write a binary graph snapshot to this file")
+    args = parser.parse_args()
+
+    graph = generate_campus(args.nodes, args.floors, args.junctions,
+                            args.doors, args.seed)
+    print(f"Generated {len(graph.node_names)} nodes and {len(graph.edge_u)} edges")
+    if args.output:
+        graph.save_snapshot(args.output)
+        print(f"Snapshot written to {args.output} "
+              f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
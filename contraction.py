@@ -0,0 +1,337 @@
+"""
+Contraction hierarchies for fast shortest path queries on large graphs.
+
+Preprocessing contracts the nodes one at a time, least important first.
+Contracting a node takes it out of the remaining graph and adds a shortcut
+edge between two of its neighbours whenever the route through it is the
+only shortest connection between them. Each node keeps the edges to the
+neighbours it had when it was contracted; all of them lead to nodes that
+are contracted later, i.e. higher up in the hierarchy.
+
+A query runs a bidirectional Dijkstra that only follows these upward
+edges, so it settles a few hundred nodes even on campus-sized graphs, and
+then unpacks the shortcuts on the route back into the original edges.
+distances_to gives the exact distance to a destination from any node,
+which lets the navigation system pick the same route as Dijkstra among
+equally short ones.
+
+The hierarchy belongs to one graph version: like the route table it is
+saved with the graph_hash it was built for.
+"""
+import heapq
+import os
+
+import numpy as np
+
+# Nodes settled by a witness search before it gives up. A witness search
+# that gives up early only costs an unnecessary shortcut, never a wrong route.
+WITNESS_SETTLE_LIMIT = 64
+
+
+def _witness_search(adjacency, source, excluded, targets, limit, settle_limit):
+    # Dijkstra from source in the remaining graph without the node being
+    # contracted. Every distance it returns is the length of a real path,
+    # so it is a valid witness even if the search stopped early.
+    distances = {source: 0.0}
+    queue = [(0.0, source)]
+    remaining = len(targets)
+    settled = 0
+
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        if distance > limit:
+            break
+        if node in targets:
+            remaining -= 1
+            if not remaining:
+                break
+        settled += 1
+        if settled > settle_limit:
+            break
+
+        for neighbor, (weight, _) in adjacency[node].items():
+            if neighbor == excluded:
+                continue
+            candidate = distance + weight
+            if candidate < distances.get(neighbor, float('inf')):
+                distances[neighbor] = candidate
+                heapq.heappush(queue, (candidate, neighbor))
+
+    return distances
+
+
+class ContractionHierarchy:
+    """
+    Upward graph of a contraction hierarchy, in compressed sparse row form.
+
+    rank[n] is the position of node n in the contraction order. The upward
+    arcs of node n are targets[offsets[n]:offsets[n + 1]] with their
+    weights; middles holds the node a shortcut arc bypasses, or -1 for an
+    original edge of the graph.
+    """
+
+    def __init__(self, graph_hash, rank, offsets, targets, weights, middles):
+        self.graph_hash = graph_hash
+        self.rank = rank
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.middles = middles
+        self.last_counters = (0, 0, 0, 0, 0)
+
+    @property
+    def num_shortcuts(self):
+        return int(np.count_nonzero(self.middles >= 0))
+
+    @classmethod
+    def build(cls, graph, settle_limit=WITNESS_SETTLE_LIMIT):
+        """
+        Contracts every node of a DepartmentGraph.
+
+        Nodes are ordered by edge difference (shortcuts added minus edges
+        removed) plus the number of already contracted neighbours, which
+        spreads the contraction evenly over the graph. Priorities are
+        updated lazily: a node is only contracted if its priority is still
+        the smallest after being recomputed.
+        """
+        graph_hash = graph.graph_hash()
+        num_nodes = len(graph.node_names)
+
+        # Remaining graph: adjacency[u][v] = (weight, middle node or -1)
+        adjacency = [{} for _ in range(num_nodes)]
+        for u, v, weight in zip(graph.edge_u.tolist(), graph.edge_v.tolist(),
+                                graph.edge_weight.tolist()):
+            adjacency[u][v] = (weight, -1)
+            adjacency[v][u] = (weight, -1)
+        contracted_neighbors = [0] * num_nodes
+        rank = np.full(num_nodes, -1, dtype=np.int32)
+        upward = [None] * num_nodes
+
+        def shortcuts(node):
+            # The shortcuts contracting node would need, as (u, w, weight)
+            neighbors = list(adjacency[node].items())
+            needed = []
+            for index, (u, (weight_u, _)) in enumerate(neighbors[:-1]):
+                via = {w: weight_u + weight_w
+                       for w, (weight_w, _) in neighbors[index + 1:]}
+                witness = _witness_search(adjacency, u, node, via,
+                                          max(via.values()), settle_limit)
+                for w, distance in via.items():
+                    if witness.get(w, float('inf')) > distance:
+                        needed.append((u, w, distance))
+            return needed
+
+        def priority(needed, node):
+            return len(needed) - len(adjacency[node]) + contracted_neighbors[node]
+
+        queue = [(priority(shortcuts(node), node), node) for node in range(num_nodes)]
+        heapq.heapify(queue)
+        order = 0
+
+        while queue:
+            _, node = heapq.heappop(queue)
+            needed = shortcuts(node)
+            current = priority(needed, node)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, node))
+                continue
+
+            rank[node] = order
+            order += 1
+            for u, w, distance in needed:
+                existing = adjacency[u].get(w)
+                if existing is None or distance < existing[0]:
+                    adjacency[u][w] = (distance, node)
+                    adjacency[w][u] = (distance, node)
+
+            upward[node] = adjacency[node]
+            for neighbor in upward[node]:
+                del adjacency[neighbor][node]
+                contracted_neighbors[neighbor] += 1
+            adjacency[node] = {}
+
+        degrees = np.fromiter((len(arcs) for arcs in upward), dtype=np.int64,
+                              count=num_nodes)
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        num_arcs = int(offsets[-1])
+        targets = np.fromiter((v for arcs in upward for v in arcs),
+                              dtype=np.int32, count=num_arcs)
+        weights = np.fromiter((weight for arcs in upward
+                               for weight, _ in arcs.values()),
+                              dtype=np.float64, count=num_arcs)
+        middles = np.fromiter((middle for arcs in upward
+                               for _, middle in arcs.values()),
+                              dtype=np.int32, count=num_arcs)
+        return cls(graph_hash, rank, offsets, targets, weights, middles)
+
+    def save(self, path):
+        # Written next to the target and renamed over it, so an interrupted
+        # or concurrent save never leaves a truncated file behind
+        temporary_path = f"{path}.tmp{os.getpid()}"
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, graph_hash=np.array(self.graph_hash), rank=self.rank,
+                     offsets=self.offsets, targets=self.targets,
+                     weights=self.weights, middles=self.middles)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data['graph_hash']), data['rank'], data['offsets'],
+                       data['targets'], data['weights'], data['middles'])
+
+    def route(self, start, end):
+        """Returns (list of node ids, distance), or (None, inf) if unreachable."""
+        if start == end:
+            self.last_counters = (0, 0, 0, 0, 0)
+            return [start], 0.0
+
+        offsets = self.offsets.data
+        targets = self.targets.data
+        weights = self.weights.data
+
+        # Bidirectional Dijkstra over the upward arcs. Edges are undirected,
+        # so both searches use the same arcs. The shortest route climbs
+        # from start to its highest node and descends to end, so the two
+        # searches meet at that node.
+        distances = ({start: 0.0}, {end: 0.0})
+        previous = ({start: -1}, {end: -1})
+        queues = ([(0.0, start)], [(0.0, end)])
+        best = float('inf')
+        meeting = -1
+        expanded = stale = relaxed = 0
+        peak_queue = 2
+
+        while queues[0] or queues[1]:
+            if not queues[1] or (queues[0] and queues[0][0][0] <= queues[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            current_distance, current = heapq.heappop(queues[side])
+            side_distances = distances[side]
+
+            if current_distance > side_distances[current]:
+                stale += 1
+                continue
+            # Nothing left on this side can lead to a shorter route
+            if current_distance >= best:
+                queues[side].clear()
+                continue
+
+            expanded += 1
+            other = distances[1 - side].get(current)
+            if other is not None and current_distance + other < best:
+                best = current_distance + other
+                meeting = current
+
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                distance = current_distance + weight
+                if distance < side_distances.get(neighbor, float('inf')):
+                    side_distances[neighbor] = distance
+                    previous[side][neighbor] = current
+                    heapq.heappush(queues[side], (distance, neighbor))
+
+            relaxed += last - first
+            if len(queues[0]) + len(queues[1]) > peak_queue:
+                peak_queue = len(queues[0]) + len(queues[1])
+
+        self.last_counters = (expanded + stale, stale, expanded, relaxed, peak_queue)
+        if meeting == -1:
+            return None, float('inf')
+
+        # Chain of hierarchy nodes from start up to the meeting node and
+        # back down to end
+        chain = []
+        current = meeting
+        while current != -1:
+            chain.append(current)
+            current = previous[0][current]
+        chain.reverse()
+        current = previous[1][meeting]
+        while current != -1:
+            chain.append(current)
+            current = previous[1][current]
+
+        path = [start]
+        for u, v in zip(chain, chain[1:]):
+            self._unpack(u, v, path)
+        return path, best
+
+    def distances_to(self, end):
+        """
+        Returns a function giving the distance from any node to end.
+
+        One upward search from end, run to completion, gives the distance
+        down to end from every node it reaches. A route from another node
+        either descends from that node straight away or first climbs one
+        of its upward arcs, so its distance follows from those of the
+        nodes above it. They are computed from the top of the hierarchy
+        down and remembered, so nodes close to each other share most of
+        the work.
+        """
+        offsets = self.offsets.data
+        targets = self.targets.data
+        weights = self.weights.data
+
+        down = {end: 0.0}
+        queue = [(0.0, end)]
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > down[current]:
+                continue
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                distance = current_distance + weight
+                if distance < down.get(neighbor, float('inf')):
+                    down[neighbor] = distance
+                    heapq.heappush(queue, (distance, neighbor))
+
+        known = {}
+
+        def distance_to(node):
+            stack = [node]
+            while stack:
+                current = stack[-1]
+                if current in known:
+                    stack.pop()
+                    continue
+                first, last = offsets[current], offsets[current + 1]
+                missing = [above for above in targets[first:last] if above not in known]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                best = down.get(current, float('inf'))
+                for above, weight in zip(targets[first:last], weights[first:last]):
+                    distance = weight + known[above]
+                    if distance < best:
+                        best = distance
+                known[current] = best
+                stack.pop()
+            return known[node]
+
+        return distance_to
+
+    def _unpack(self, u, v, path):
+        # Appends the original nodes after u up to and including v
+        rank = self.rank.data
+        offsets = self.offsets.data
+        targets = self.targets.data
+        middles = self.middles.data
+        stack = [(u, v)]
+        while stack:
+            u, v = stack.pop()
+            # The arc between u and v is stored with the lower ranked node
+            low, high = (u, v) if rank[u] < rank[v] else (v, u)
+            for arc in range(offsets[low], offsets[low + 1]):
+                if targets[arc] == high:
+                    middle = middles[arc]
+                    break
+            if middle == -1:
+                path.append(v)
+            else:
+                stack.append((middle, v))
+                stack.append((u, middle))
@@ -1,445 +1,1960 @@
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
-from matplotlib.patches import Rectangle
-from matplotlib.lines import Line2D
-import matplotlib.animation as animation
 import numpy as np
+import argparse
+import hashlib
 import heapq
+import json
+import math
+import os
+import sys
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+# Floor plan drawn behind the graph; the precomputed route table is stored
+# next to it
+MAP_IMAGE = 'Map.png'
+ROUTE_TABLE_FILE = os.path.splitext(MAP_IMAGE)[0] + '.routes.npz'
+
+# Declarative description of the building and its compiled binary snapshot
+BUILDING_FILE = 'building.json'
+SNAPSHOT_FILE = os.path.splitext(BUILDING_FILE)[0] + '.graph'
+SNAPSHOT_MAGIC = b'DGRAPH\x00\x01'
+SNAPSHOT_FORMAT_VERSION = 3
+# Contraction hierarchy built from the graph for the "ch" search method
+CONTRACTION_FILE = os.path.splitext(BUILDING_FILE)[0] + '.ch.npz'
+
+# Compact nearest-exit table for signage controllers, see EvacuationTable.save
+EVACUATION_FILE = 'evacuation.bin'
+EVACUATION_MAGIC = b'DEVAC\x00\x00\x01'
+
+# Clicks and hovers pick the nearest node within this many map units; the
+# spatial index uses cells of the same size
+CLICK_RADIUS = 30
+SPATIAL_CELL_SIZE = CLICK_RADIUS
+
+# Number of routes kept by the in-memory route cache
+ROUTE_CACHE_SIZE = 256
+# Key under which routes over the plain edge weights are cached
+DEFAULT_PROFILE = 'default'
+# Methods find_shortest_path accepts
+SEARCH_METHODS = ("table", "dijkstra", "astar", "bidirectional", "ch", "zones")
+
+# Alternative routes: how many k_shortest_paths returns by default, how
+# much longer than the shortest route they may be, and how many nodes a
+# single spur search may settle before it gives up
+ALTERNATIVE_ROUTES = 3
+ALTERNATIVE_MAX_STRETCH = 1.2
+SPUR_SETTLE_LIMIT = 2000
+# Milliseconds between checks of the interactive map for a finished route
+ROUTE_POLL_INTERVAL = 30
+# Nodes a cancellable search expands between checks of its cancel event
+CANCEL_CHECK_INTERVAL = 256
+# Line colours of the alternative routes on the interactive map
+ALTERNATIVE_COLORS = ['#4361ee', '#7209b7', '#2a9d8f']
+# Route animation: milliseconds between frames, map units the route grows
+# by per frame, and a frame limit so long routes still finish quickly
+ANIMATION_INTERVAL = 40
+ANIMATION_STEP = 15.0
+ANIMATION_MAX_FRAMES = 150
+
+# Zone of nodes whose definition does not name one
+DEFAULT_ZONE = 'default'
+
+# Edge attribute flags, combined bitwise in DepartmentGraph.edge_flags
+EDGE_STAIRS = 1
+EDGE_STAFF_ONLY = 2
+EDGE_FLAGS = {'stairs': EDGE_STAIRS, 'staff_only': EDGE_STAFF_ONLY}
+
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def load_building_definition(path=BUILDING_FILE):
+    """
+    Reads and validates a building definition file.
+
+    The file holds a "nodes" list ({"name", "x", "y", optional "is_room"
+    and "zone"}), an "edges" list ({"from", "to", optional "factor"
+    and "flags", a list of EDGE_FLAGS names}) and an optional "exits" list
+    of the node names people are evacuated to. Edges and exits must refer
+    to defined nodes, and each pair of nodes may only be connected once,
+    so no connection can silently overwrite another.
+    """
+    with open(path, encoding='utf-8') as file:
+        definition = json.load(file)
+
+    names = set()
+    for node in definition.get("nodes", []):
+        if node["name"] in names:
+            raise ValueError(f"{path}: node {node['name']} is defined twice")
+        names.add(node["name"])
+
+    pairs = set()
+    for edge in definition.get("edges", []):
+        for end in (edge["from"], edge["to"]):
+            if end not in names:
+                raise ValueError(f"{path}: edge {edge['from']} - {edge['to']} "
+                                 f"refers to unknown node {end}")
+        if edge["from"] == edge["to"]:
+            raise ValueError(f"{path}: node {edge['from']} is connected to itself")
+        pair = frozenset((edge["from"], edge["to"]))
+        if pair in pairs:
+            raise ValueError(f"{path}: {edge['from']} and {edge['to']} "
+                             f"are connected more than once")
+        if edge.get("factor", 1.0) <= 0:
+            raise ValueError(f"{path}: edge {edge['from']} - {edge['to']} "
+                             f"needs a positive factor")
+        for flag in edge.get("flags", []):
+            if flag not in EDGE_FLAGS:
+                raise ValueError(f"{path}: edge {edge['from']} - {edge['to']} "
+                                 f"has unknown flag {flag}")
+        pairs.add(pair)
+
+    for exit_name in definition.get("exits", []):
+        if exit_name not in names:
+            raise ValueError(f"{path}: exit {exit_name} is not a defined node")
+
+    definition.setdefault("nodes", [])
+    definition.setdefault("edges", [])
+    definition.setdefault("exits", [])
+    return definition
+
+
+def compile_building(definition_file=BUILDING_FILE, snapshot_file=SNAPSHOT_FILE):
+    """Compiles a building definition into a binary graph snapshot."""
+    graph = DepartmentGraph(definition_file, snapshot_file=None)
+    graph.save_snapshot(snapshot_file, file_hash(definition_file))
+    return graph
 
 
 class Node:
-    def __init__(self, name, x, y, is_room=True):
-        self.name = name
-        self.x = x
-        self.y = y
-        self.is_room = is_room
-        self.neighbors = {}  # neighbor_node: distance
+    """
+    Lightweight view of a single node stored in a DepartmentGraph.
+
+    All node data lives in the graph's arrays; a view only keeps the graph
+    and the integer node id, so views are cheap to create and two views of
+    the same node compare equal.
+    """
+    __slots__ = ('graph', 'id')
+
+    def __init__(self, graph, node_id):
+        self.graph = graph
+        self.id = node_id
+
+    @property
+    def name(self):
+        return self.graph.node_names[self.id]
+
+    @property
+    def x(self):
+        return float(self.graph.node_x[self.id])
+
+    @property
+    def y(self):
+        return float(self.graph.node_y[self.id])
+
+    @property
+    def is_room(self):
+        return bool(self.graph.node_is_room[self.id])
+
+    @property
+    def zone(self):
+        return self.graph.zone_names[self.graph.node_zone[self.id]]
+
+    @property
+    def neighbors(self):
+        # neighbor_node: distance
+        return {Node(self.graph, target): weight
+                for target, weight in self.graph.neighbor_ids(self.id)}
+
+    def __eq__(self, other):
+        return (isinstance(other, Node) and other.graph is self.graph
+                and other.id == self.id)
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Node({self.name!r})"
 
-    def add_neighbor(self, node, distance):
-        self.neighbors[node] = distance
 
-    def __lt__(self, other):
-        # For priority queue in Dijkstra's algorithm
-        return False
+class NodeTable(Mapping):
+    """Read-only name -> Node mapping that creates node views on demand."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        return Node(self.graph, self.graph.node_ids[name])
+
+    def __contains__(self, name):
+        return name in self.graph.node_ids
+
+    def __iter__(self):
+        return iter(self.graph.node_names)
+
+    def __len__(self):
+        return len(self.graph.node_names)
 
 
 class DepartmentGraph:
-    def __init__(self):
-        self.nodes = {}  # name: Node
-        self.load_background_image()
+    def __init__(self, definition_file=BUILDING_FILE, snapshot_file=SNAPSHOT_FILE):
+        """
+        Parameters:
+        - definition_file: Declarative building definition (JSON) to load,
+          or None for an empty graph
+        - snapshot_file: Compiled binary snapshot of the definition. It is
+          memory-mapped when it matches the definition, and (re)written
+          otherwise; None always builds from the definition.
+        """
+        # Node data, indexed by integer node id
+        self.node_names = []
+        self.node_x = []
+        self.node_y = []
+        self.node_is_room = []
+        self.node_zone = []  # Zone id of each node
+        self.node_ids = {}  # name: node id
+        self.zone_names = []  # Indexed by zone id
+        self.zone_ids = {}  # zone name: zone id
+        self.exit_names = []  # Nodes people are evacuated to
+        self.nodes = NodeTable(self)  # name: Node
+
+        # Undirected edge list, indexed by edge id
+        self.edge_u = []
+        self.edge_v = []
+        self.edge_weight = []
+        self.edge_flags = []  # EDGE_* bits of each edge
+        self._edge_ids = {}  # (smaller node id, larger node id): edge id
+
+        # Compressed sparse row adjacency, built by freeze(). The arcs of
+        # node i are targets[offsets[i]:offsets[i + 1]], each one pointing
+        # back to its undirected edge through arc_edge.
+        self.frozen = False
+        self.offsets = None
+        self.targets = None
+        self.weights = None
+        self.arc_edge = None
+        self.heuristic_scale = 0.0
+        self.last_expanded = 0
+        self.last_counters = (0, 0, 0, 0, 0)
+        # Spare (distances, previous) lists for the searches, see _buffers
+        self._search_buffers = []
+
+        # Optional search instrumentation, see find_shortest_path
+        self.instrumentation = False
+        self.search_hooks = []
+        self.last_stats = None
+        self._last_cache_hit = False
+
+        self.route_table = None
+        self._route_table_path = ROUTE_TABLE_FILE
+        self._route_table_version = None
+
+        self.contraction = None
+        self._contraction_path = CONTRACTION_FILE
+        self._contraction_version = None
+
+        self._zone_overlay = None
+        self._zone_overlay_version = None
+
+        # Incremented on every change to the nodes or edges, so caches and
+        # tables built for an older graph can tell they are stale
+        self.version = 0
+        self.route_cache = RouteCache(ROUTE_CACHE_SIZE)
+        self._spatial_index = None
+        self._spatial_index_version = None
+        self._edge_grid = None
+        self._edge_grid_version = None
+
+        # Weights of closed edges (edge id: weight), restored on reopening.
+        # A closed edge stays in the graph with an infinite weight.
+        self.closed_edges = {}
+        self.last_repaired_rows = 0
+
+        # Named weight profiles. Each one gets its own weight arrays over
+        # the shared CSR topology, built on first use: profile name:
+        # (version, edge weights, arc weights, A* heuristic scale)
+        self.profiles = dict(WEIGHT_PROFILES)
+        self._profile_weights = {}
+        self._profile_tables = {}  # profile name: (version, RouteTable)
+
+        # The floor plan is only decoded when something is drawn
+        self._bg_img = None
+
+        self.definition_file = definition_file
+        self.definition = None
+        if definition_file is None:
+            return
+
+        source_hash = file_hash(definition_file)
+        if snapshot_file is not None and self.load_snapshot(snapshot_file, source_hash):
+            return
+
         self.create_nodes()
         self.create_edges()
+        if snapshot_file is not None:
+            try:
+                self.save_snapshot(snapshot_file, source_hash)
+            except OSError as error:
+                print(f"Could not save graph snapshot to {snapshot_file}: {error}")
 
     def load_background_image(self):
-        self.bg_img = mpimg.imread('Map.png')
+        import matplotlib.image as mpimg
+        self._bg_img = mpimg.imread(MAP_IMAGE)
+
+    @property
+    def bg_img(self):
+        if self._bg_img is None:
+            self.load_background_image()
+        return self._bg_img
+
+    def add_node(self, name, x, y, is_room=True, zone=DEFAULT_ZONE):
+        self._thaw()
+        self.version += 1
+        zone_id = self._zone_id(zone)
+        if name in self.node_ids:
+            node_id = self.node_ids[name]
+            self.node_x[node_id] = x
+            self.node_y[node_id] = y
+            self.node_is_room[node_id] = is_room
+            self.node_zone[node_id] = zone_id
+            return node_id
+        node_id = len(self.node_names)
+        self.node_ids[name] = node_id
+        self.node_names.append(name)
+        self.node_x.append(x)
+        self.node_y.append(y)
+        self.node_is_room.append(is_room)
+        self.node_zone.append(zone_id)
+        return node_id
+
+    def _zone_id(self, zone):
+        if zone not in self.zone_ids:
+            self.zone_ids[zone] = len(self.zone_names)
+            self.zone_names.append(zone)
+        return self.zone_ids[zone]
+
+    def add_edge(self, node1_name, node2_name, weight, flags=0):
+        """
+        Adds an undirected edge, or overwrites the weight and flags of an
+        existing one. flags combines EDGE_* bits such as EDGE_STAIRS.
+
+        Returns the edge id, or None if either node does not exist.
+        """
+        if node1_name not in self.node_ids or node2_name not in self.node_ids:
+            return None
+        edge_ids = self._edge_index()
+        self._thaw()
+        self.version += 1
+        u = self.node_ids[node1_name]
+        v = self.node_ids[node2_name]
+        key = (u, v) if u < v else (v, u)
+        edge_id = edge_ids.get(key)
+        if edge_id is None:
+            edge_id = len(self.edge_u)
+            edge_ids[key] = edge_id
+            self.edge_u.append(u)
+            self.edge_v.append(v)
+            self.edge_weight.append(weight)
+            self.edge_flags.append(flags)
+        else:
+            self.edge_weight[edge_id] = weight
+            self.edge_flags[edge_id] = flags
+        return edge_id
+
+    def clear_edges(self):
+        self._thaw()
+        self.version += 1
+        self.edge_u = []
+        self.edge_v = []
+        self.edge_weight = []
+        self.edge_flags = []
+        self._edge_ids = {}
+        self.closed_edges = {}
+
+    def edge_id(self, node1_name, node2_name):
+        """Returns the id of the edge between two named nodes, or None."""
+        u = self.node_ids.get(node1_name)
+        v = self.node_ids.get(node2_name)
+        if u is None or v is None:
+            return None
+        return self._edge_index().get((u, v) if u < v else (v, u))
+
+    def _existing_edge_id(self, node1_name, node2_name):
+        edge_id = self.edge_id(node1_name, node2_name)
+        if edge_id is None:
+            raise ValueError(f"No edge between {node1_name} and {node2_name}")
+        return edge_id
+
+    def close_edge(self, node1_name, node2_name):
+        """
+        Closes the connection between two nodes, e.g. a corridor that is
+        being cleaned. Routes avoid it until reopen_edge is called.
+        """
+        edge_id = self._existing_edge_id(node1_name, node2_name)
+        if edge_id in self.closed_edges:
+            return
+        self.freeze()
+        self.closed_edges[edge_id] = float(self.edge_weight[edge_id])
+        self._change_edge_weight(edge_id, float('inf'))
+
+    def reopen_edge(self, node1_name, node2_name):
+        """Reopens a closed connection with the weight it had before."""
+        edge_id = self._existing_edge_id(node1_name, node2_name)
+        if edge_id not in self.closed_edges:
+            return
+        self._change_edge_weight(edge_id, self.closed_edges.pop(edge_id))
+
+    def set_edge_weight(self, node1_name, node2_name, weight):
+        """
+        Changes the weight of an existing connection at runtime. A closed
+        connection keeps the new weight for when it is reopened.
+        """
+        if weight <= 0:
+            raise ValueError("Edge weights must be positive")
+        edge_id = self._existing_edge_id(node1_name, node2_name)
+        if edge_id in self.closed_edges:
+            self.closed_edges[edge_id] = float(weight)
+            return
+        self._change_edge_weight(edge_id, float(weight))
+
+    def _change_edge_weight(self, edge_id, weight):
+        # Unlike add_edge this leaves the arrays frozen and repairs the
+        # route table, route cache and zone overlay in place instead of
+        # letting the new version invalidate them
+        self.freeze()
+        old_weight = float(self.edge_weight[edge_id])
+        if weight == old_weight:
+            return
+        if not self.edge_weight.flags.writeable:
+            # Arrays memory-mapped from a snapshot are read-only
+            self.edge_weight = np.array(self.edge_weight)
+            self.weights = np.array(self.weights)
+
+        u = int(self.edge_u[edge_id])
+        v = int(self.edge_v[edge_id])
+        arcs = np.concatenate([
+            first + np.flatnonzero(self.arc_edge[first:last] == edge_id)
+            for first, last in ((self.offsets[u], self.offsets[u + 1]),
+                                (self.offsets[v], self.offsets[v + 1]))])
+        self.edge_weight[edge_id] = weight
+        self.weights[arcs] = weight
+
+        # A lower weight may need a smaller A* scale; a higher one leaves
+        # the old scale admissible
+        length = math.hypot(self.node_x[u] - self.node_x[v], self.node_y[u] - self.node_y[v])
+        if length > 0:
+            self.heuristic_scale = min(self.heuristic_scale, weight / length)
+
+        old_version = self.version
+        self.version += 1
+        self._repair_after_weight_change(old_version, edge_id, arcs, old_weight, weight)
+
+    def _repair_after_weight_change(self, old_version, edge_id, arcs, old_weight, new_weight):
+        u = int(self.edge_u[edge_id])
+        v = int(self.edge_v[edge_id])
+
+        # The spatial indexes do not depend on weights
+        if self._spatial_index_version == old_version:
+            self._spatial_index_version = self.version
+        if self._edge_grid_version == old_version:
+            self._edge_grid_version = self.version
+
+        self.last_repaired_rows = 0
+        if self.route_table is not None and self._route_table_version == old_version:
+            self.last_repaired_rows = self.route_table.repair(
+                self, u, v, old_weight, new_weight)
+            self._route_table_version = self.version
+
+        # Every profile derives its weight for the edge from the new base
+        # weight; its arrays and table are patched the same way
+        length = math.hypot(self.node_x[u] - self.node_x[v], self.node_y[u] - self.node_y[v])
+        for profile, cached in list(self._profile_weights.items()):
+            version, edge_weights, arc_weights, scale = cached
+            if version != old_version:
+                continue
+            old_profile_weight = float(edge_weights[edge_id])
+            new_profile_weight = float(self.profiles[profile].edge_weights(
+                [new_weight], self.edge_flags[edge_id:edge_id + 1])[0])
+            edge_weights[edge_id] = new_profile_weight
+            arc_weights[arcs] = new_profile_weight
+            if length > 0:
+                scale = min(scale, new_profile_weight / length)
+            self._profile_weights[profile] = (self.version, edge_weights, arc_weights, scale)
+
+            table_entry = self._profile_tables.get(profile)
+            if table_entry is not None and table_entry[0] == old_version:
+                table = table_entry[1]
+                if new_profile_weight != old_profile_weight:
+                    table.repair(self, u, v, old_profile_weight, new_profile_weight)
+                self._profile_tables[profile] = (self.version, table)
+
+        if self._zone_overlay is not None and self._zone_overlay_version == old_version:
+            self._zone_overlay.repair(u, v)
+            self._zone_overlay_version = self.version
+
+        cache = self.route_cache
+        if cache is not None and cache.version == old_version and len(cache):
+            if new_weight > old_weight:
+                # Only routes over the edge can have become longer, in
+                # any profile
+                def affected(profile, path, distance):
+                    return path is not None and any(
+                        (a == u and b == v) or (a == v and b == u)
+                        for a, b in zip(path, path[1:]))
+            else:
+                # A route got shorter only if going over the edge now beats it
+                from_u, _ = self._dijkstra(u)
+                from_v, _ = self._dijkstra(v)
+
+                def affected(profile, path, distance):
+                    # The other profiles' routes are simply recomputed
+                    if path is None or profile != DEFAULT_PROFILE:
+                        return True
+                    start, end = path[0], path[-1]
+                    inf = float('inf')
+                    through = min(
+                        from_u.get(start, inf) + new_weight + from_v.get(end, inf),
+                        from_v.get(start, inf) + new_weight + from_u.get(end, inf))
+                    return through <= distance * (1 + 1e-9) + 1e-9
+            cache.repair(old_version, self.version, affected)
+
+    def _edge_index(self):
+        # A graph loaded from a snapshot only builds the pair -> edge id
+        # dictionary once something needs it
+        if self._edge_ids is None:
+            self._edge_ids = {
+                (u, v) if u < v else (v, u): edge_id
+                for edge_id, (u, v) in enumerate(zip(np.asarray(self.edge_u).tolist(),
+                                                     np.asarray(self.edge_v).tolist()))}
+        return self._edge_ids
+
+    def freeze(self):
+        """
+        Packs the node and edge lists into flat NumPy arrays and builds the
+        CSR adjacency that all queries run on.
+        """
+        if self.frozen:
+            return
+        num_nodes = len(self.node_names)
+        self.node_x = np.asarray(self.node_x, dtype=np.float64)
+        self.node_y = np.asarray(self.node_y, dtype=np.float64)
+        self.node_is_room = np.asarray(self.node_is_room, dtype=bool)
+        self.node_zone = np.asarray(self.node_zone, dtype=np.int32)
+        self.edge_u = np.asarray(self.edge_u, dtype=np.int32)
+        self.edge_v = np.asarray(self.edge_v, dtype=np.int32)
+        self.edge_weight = np.asarray(self.edge_weight, dtype=np.float64)
+        self.edge_flags = np.asarray(self.edge_flags, dtype=np.uint8)
+
+        # Each undirected edge becomes two arcs. Sorting by source node (and
+        # by edge id within a node) keeps every node's arcs in the order its
+        # edges were first defined.
+        num_edges = len(self.edge_u)
+        edge_ids = np.arange(num_edges, dtype=np.int32)
+        sources = np.concatenate([self.edge_u, self.edge_v])
+        arc_targets = np.concatenate([self.edge_v, self.edge_u])
+        arc_edge = np.concatenate([edge_ids, edge_ids])
+        order = np.lexsort((arc_edge, sources))
+
+        self.offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes),
+                  out=self.offsets[1:])
+        self.targets = arc_targets[order]
+        self.arc_edge = arc_edge[order]
+        self.weights = self.edge_weight[self.arc_edge]
+
+        # Scale for the A* heuristic: the smallest ratio of edge weight to
+        # straight-line length. Discounted edges (connect_nodes_preferred)
+        # make this less than 1, and using it keeps the heuristic admissible.
+        lengths = np.hypot(self.node_x[self.edge_u] - self.node_x[self.edge_v],
+                           self.node_y[self.edge_u] - self.node_y[self.edge_v])
+        positive = lengths > 0
+        if positive.any():
+            self.heuristic_scale = float(
+                np.min(self.edge_weight[positive] / lengths[positive]))
+        else:
+            self.heuristic_scale = 0.0
+        self.frozen = True
 
-    def add_node(self, name, x, y, is_room=True):
-        self.nodes[name] = Node(name, x, y, is_room)
+    @classmethod
+    def from_arrays(cls, names, xs, ys, edge_u, edge_v, edge_weight, is_room=None,
+                    node_zone=None, zone_names=None, edge_flags=None, exit_names=None):
+        """
+        Builds a frozen graph straight from node and edge arrays, without
+        one add_node/add_edge call per element. Used for generated graphs.
+
+        Parameters:
+        - names: Node names, indexed by node id
+        - xs, ys: Node coordinates
+        - edge_u, edge_v, edge_weight: Undirected edges as node id pairs with
+          their weights; each pair must appear only once
+        - is_room: Optional per-node flags (default all False)
+        - node_zone, zone_names: Optional zone id of every node and the
+          names of the zone ids (default: all nodes in DEFAULT_ZONE)
+        - edge_flags: Optional EDGE_* bits of every edge (default none)
+        - exit_names: Optional names of the evacuation exits
+
+        The graph's route table and contraction hierarchy are not stored
+        anywhere until prepare_route_table or prepare_contraction_hierarchy
+        is called with a path.
+        """
+        graph = cls(None)
+        graph.node_names = list(names)
+        graph.node_ids = {name: node_id for node_id, name in enumerate(graph.node_names)}
+        if len(graph.node_ids) != len(graph.node_names):
+            raise ValueError("Node names must be unique")
+
+        # freeze() packs these into the CSR adjacency as they are
+        graph.node_x = np.asarray(xs, dtype=np.float64)
+        graph.node_y = np.asarray(ys, dtype=np.float64)
+        if is_room is None:
+            graph.node_is_room = np.zeros(len(graph.node_names), dtype=bool)
+        else:
+            graph.node_is_room = np.asarray(is_room, dtype=bool)
+        if node_zone is None:
+            graph.zone_names = [DEFAULT_ZONE]
+            graph.node_zone = np.zeros(len(graph.node_names), dtype=np.int32)
+        else:
+            graph.zone_names = list(zone_names)
+            graph.node_zone = np.asarray(node_zone, dtype=np.int32)
+        graph.zone_ids = {zone: zone_id for zone_id, zone in enumerate(graph.zone_names)}
+        graph.edge_u = np.asarray(edge_u, dtype=np.int32)
+        graph.edge_v = np.asarray(edge_v, dtype=np.int32)
+        graph.edge_weight = np.asarray(edge_weight, dtype=np.float64)
+        if edge_flags is None:
+            graph.edge_flags = np.zeros(len(graph.edge_u), dtype=np.uint8)
+        else:
+            graph.edge_flags = np.asarray(edge_flags, dtype=np.uint8)
+        graph.exit_names = list(exit_names or [])
+        graph._edge_ids = None
+        # A generated graph has no files of its own, and an all-pairs table
+        # of a large one would not fit in memory: "table" and "ch" queries
+        # need an explicit prepare_route_table/prepare_contraction_hierarchy
+        graph._route_table_path = None
+        graph._contraction_path = None
+        graph.version += 1
+        graph.freeze()
+        return graph
+
+    def _thaw(self):
+        # Turn the arrays back into growable lists before the graph changes
+        if not self.frozen:
+            return
+        self.node_x = self.node_x.tolist()
+        self.node_y = self.node_y.tolist()
+        self.node_is_room = self.node_is_room.tolist()
+        self.node_zone = self.node_zone.tolist()
+        self.edge_u = self.edge_u.tolist()
+        self.edge_v = self.edge_v.tolist()
+        self.edge_weight = self.edge_weight.tolist()
+        self.edge_flags = self.edge_flags.tolist()
+        self.offsets = self.targets = self.weights = self.arc_edge = None
+        self.frozen = False
+
+    def _adjacency(self, profile=DEFAULT_PROFILE):
+        # Memoryviews over the CSR arrays; slicing and iterating them yields
+        # plain Python numbers, which keeps the search loops fast
+        self.freeze()
+        if profile == DEFAULT_PROFILE:
+            weights = self.weights
+        else:
+            weights = self._profile_arrays(profile)[1]
+        return self.offsets.data, self.targets.data, weights.data
+
+    def add_profile(self, profile):
+        """Registers a WeightProfile, replacing any profile of the same name."""
+        self.profiles[profile.name] = profile
+        self._profile_weights.pop(profile.name, None)
+        self._profile_tables.pop(profile.name, None)
+        if self.route_cache is not None:
+            self.route_cache.clear()
+
+    def _profile_arrays(self, profile):
+        # (edge weights, arc weights, heuristic scale) of a weight profile,
+        # evaluated over all edges at once and kept until the graph changes
+        self.freeze()
+        if profile == DEFAULT_PROFILE:
+            return self.edge_weight, self.weights, self.heuristic_scale
+        if profile not in self.profiles:
+            raise ValueError(f"Unknown weight profile: {profile}")
+        cached = self._profile_weights.get(profile)
+        if cached is None or cached[0] != self.version:
+            weight_profile = self.profiles[profile]
+            edge_weights = weight_profile.edge_weights(self.edge_weight, self.edge_flags)
+            # Factors below 1 make edges cheaper than the default scale allows for
+            scale = self.heuristic_scale * weight_profile.min_factor
+            cached = (self.version, edge_weights, edge_weights[self.arc_edge], scale)
+            self._profile_weights[profile] = cached
+        return cached[1:]
+
+    def neighbor_ids(self, node_id):
+        """Yields (neighbor id, weight) pairs for a node id."""
+        offsets, targets, weights = self._adjacency()
+        first, last = offsets[node_id], offsets[node_id + 1]
+        return zip(targets[first:last], weights[first:last])
+
+    def path_nodes(self, path_ids):
+        return [Node(self, node_id) for node_id in path_ids]
 
     def create_nodes(self):
-        # Door nodes with coordinates copied from the room nodes
-        self.add_node("Library_door", 292, 253, False)
-        self.add_node("Exam_Office_door", 482, 137, False)
-        self.add_node("Bath_3_door", 547.3, 121, False)
-        self.add_node("Room_9_door", 557.3, 117, False)
-        self.add_node("Room_8_door", 561.5, 100, False)
-        self.add_node("Room_7_door", 561.5, 72, False)
-        self.add_node("Faculty_Lounge_door", 561.5, 50, False)
-        self.add_node("Room_6_door", 538, 41.5, False)
-        self.add_node("Room_5_door", 511, 41.5, False)
-        self.add_node("Conference_Room_door", 385, 41, False)
-        self.add_node("Bath_2_door", 364.5, 41, False)
-        self.add_node("Principal_Office_door", 350, 50, False)
-        self.add_node("Room_3_door", 350, 94, False)
-        self.add_node("Room_2_door", 350, 133, False)
-        self.add_node("Room_1_door", 363, 133, False)
-        self.add_node("Bath_1_door", 363, 107, False)
-        self.add_node("Treasure_Office_door", 385, 61, False)
-        self.add_node("Admission_Office_door", 439.5, 137, False)
-
-        # Additional 30 door nodes for the larger map
-        self.add_node("Geology_Lab_door", 301, 407, False)
-        self.add_node("1st_Floor_Stairs_door", 301, 483, False)
-        self.add_node("Experiment_Lab_door", 229, 392, False)
-        self.add_node("Water_Test_Lab_door", 229, 538, False)
-        self.add_node("Seminar_Hall_door", 139, 392, False)
-        self.add_node("Toxicology_Lab_door", 139, 538, False)
-        self.add_node("Biology_Lab_door", 96, 399.5, False)
-        self.add_node("Chemistry_Lab_door", 96, 531, False)
-        self.add_node("Male_Common_Room_door", 90, 415, False)
-        self.add_node("Female_Common_Room_door", 90, 435, False)
-        self.add_node("AAS_Lab_door", 90, 481, False)
-        self.add_node("Photocopy_Shop_door", 631, 420, False)
-        self.add_node("Reception_door", 631, 512, False)
-        self.add_node("Room_101_door", 639, 396, False)
-        self.add_node("Room_110_door", 639, 534, False)
-        self.add_node("Room_102_door", 683, 390, False)
-        self.add_node("Culinary_Lab_door", 683, 538, False)
-        self.add_node("Room_103_door", 770, 390, False)
-        self.add_node("Room_108_door", 770, 538, False)
-        self.add_node("Room_104_door", 813, 396.7, False)
-        self.add_node("Room_107_door", 813, 533.6, False)
-        self.add_node("Room_105_door", 819, 428, False)
-        self.add_node("Room_106_door", 819, 499.5, False)
-        self.add_node("Computer_Lab_door", 271.5, 530, False)
-
-        # Special corridor nodes
-        # Corridor node for main building entry
-        self.add_node("1st_Corridor_Main", 461, 227, False)
-        # Corridor node for library path
-        self.add_node("1st_Corridor_Library", 425, 253, False)
-        self.add_node("1st_Corridor_Top", 461, 279, False)
-        self.add_node("Main_Entrance", 461, 50, False)  # Main entrance
-        self.add_node("2nd_Corridor_Main", 461, 446.5, False)
-        self.add_node("2nd_Corridor_Left", 442, 466, False)
-        self.add_node("2nd_Corridor_Right", 479, 466, False)
-
-        # 16 Junction nodes to be positioned (not connected yet)
-        self.add_node("Junction_1", 356.4, 133, False)  # Placeholder position
-        self.add_node("Junction_2", 356.4, 107, False)  # Placeholder position
-        self.add_node("Junction_3", 356.4, 94, False)  # Placeholder position
-        self.add_node("Junction_4", 356.4, 50, False)  # Placeholder position
-        self.add_node("Junction_5", 364.5, 50, False)  # Placeholder position
-        self.add_node("Junction_6", 385, 50, False)  # Placeholder position
-        self.add_node("Junction_7", 461, 137, False)  # Placeholder position
-        self.add_node("Junction_9", 511, 50, False)  # Placeholder position
-        self.add_node("Junction_10", 538, 50, False)  # Placeholder position
-        self.add_node("Junction_11", 552, 50, False)  # Placeholder position
-        self.add_node("Junction_12", 552, 72, False)  # Placeholder position
-        self.add_node("Junction_13", 552, 100, False)  # Placeholder position
-        self.add_node("Junction_14", 552, 109, False)  # Placeholder position
-        self.add_node("Junction_15", 547.3, 109, False)  # Placeholder position
-        self.add_node("Junction_16", 461, 109, False)  # Placeholder position
-
-        # Additional junction nodes for the new doors
-        self.add_node("Junction_17", 461, 253, False)
-        self.add_node("Junction_18", 461, 466, False)
-        self.add_node("Junction_19", 301, 466, False)
-        self.add_node("Junction_20", 261, 466, False)
-        self.add_node("Junction_21", 229, 403, False)
-        self.add_node("Junction_22", 139, 403, False)
-        self.add_node("Junction_23", 103, 403, False)
-        self.add_node("Junction_24", 103, 415, False)
-        self.add_node("Junction_25", 103, 435, False)
-        self.add_node("Junction_26", 103, 481, False)
-        self.add_node("Junction_27", 103, 528, False)
-        self.add_node("Junction_28", 139, 528, False)
-        self.add_node("Junction_29", 229, 528, False)
-        self.add_node("Junction_30", 261, 528, False)
-        self.add_node("Junction_31", 643, 466, False)
-
-        # Horizontal corridor for upper left
-        self.add_node("Junction_32", 643, 530, False)
-        # Vertical corridor for left
-        self.add_node("Junction_33", 643, 512, False)
-        # Vertical corridor for right
-        self.add_node("Junction_34", 643, 420, False)
-        self.add_node("Junction_35", 643, 400, False)
-
-        self.add_node("Junction_36", 683, 400, False)
-        self.add_node("Junction_37", 770, 400, False)
-        self.add_node("Junction_38", 806, 400, False)
-        self.add_node("Junction_39", 806, 428, False)
-        self.add_node("Junction_40", 806, 499.5, False)
-        self.add_node("Junction_41", 806, 530, False)
-        self.add_node("Junction_42", 683, 530, False)
-        self.add_node("Junction_43", 770, 530, False)
-        self.add_node("Junction_44", 261, 403, False)
-        self.add_node("Junction_45", 301, 415, False)
+        # Nodes come from the declarative building definition
+        if self.definition is None:
+            self.definition = load_building_definition(self.definition_file)
+        for node in self.definition["nodes"]:
+            self.add_node(node["name"], node["x"], node["y"],
+                          node.get("is_room", False), node.get("zone", DEFAULT_ZONE))
+        self.exit_names = list(self.definition.get("exits", []))
+
+    def connect_nodes(self, node1_name, node2_name, factor=1.0, flags=0):
+        """
+        Connects two nodes with their straight-line distance times factor.
+        A factor above 1 penalises the connection, below 1 makes it preferred.
+        flags marks what the connection is (EDGE_STAIRS, ...) so weight
+        profiles can avoid it.
+        """
+        if node1_name in self.nodes and node2_name in self.nodes:
+            node1 = self.nodes[node1_name]
+            node2 = self.nodes[node2_name]
+            distance = np.sqrt((node1.x - node2.x)**2 + (node1.y - node2.y)**2)
+            if factor != 1.0:
+                distance = distance * factor
+            # Bidirectional connection
+            self.add_edge(node1_name, node2_name, distance, flags)
 
     def create_edges(self):
-        # Function to calculate Euclidean distance between two nodes
-        def calculate_distance(node1, node2):
-            return np.sqrt((node1.x - node2.x)**2 + (node1.y - node2.y)**2)
-
-        # Helper function to connect two nodes
-        def connect_nodes(node1_name, node2_name):
-            if node1_name in self.nodes and node2_name in self.nodes:
-                node1 = self.nodes[node1_name]
-                node2 = self.nodes[node2_name]
-                distance = calculate_distance(node1, node2)
-                node1.add_neighbor(node2, distance)
-                node2.add_neighbor(node1, distance)  # Bidirectional connection
-
-        # Manually set a very high distance to force the algorithm to take a different path
-        def connect_nodes_with_penalty(node1_name, node2_name, penalty=10.0):
-            if node1_name in self.nodes and node2_name in self.nodes:
-                node1 = self.nodes[node1_name]
-                node2 = self.nodes[node2_name]
-                # Add a penalty factor to make this path less desirable
-                distance = calculate_distance(node1, node2) * penalty
-                node1.add_neighbor(node2, distance)
-                node2.add_neighbor(node1, distance)
-
-        # Create a preferred path with reduced distance to make it more attractive
-        def connect_nodes_preferred(node1_name, node2_name, discount_factor=0.5):
-            if node1_name in self.nodes and node2_name in self.nodes:
-                node1 = self.nodes[node1_name]
-                node2 = self.nodes[node2_name]
-                # Apply a discount factor to make this path more desirable
-                distance = calculate_distance(node1, node2) * discount_factor
-                node1.add_neighbor(node2, distance)
-                node2.add_neighbor(node1, distance)  # Bidirectional connection
+        if self.definition is None:
+            self.definition = load_building_definition(self.definition_file)
 
         # Clear any existing connections to rebuild them
-        for node_name in self.nodes:
-            self.nodes[node_name].neighbors = {}
-
-        # First floor connections
-        connect_nodes("Main_Entrance", "Junction_7")
-        connect_nodes("Junction_7", "Exam_Office_door")
-        connect_nodes("Junction_7", "Admission_Office_door")
-
-        # Create a preferred direct path from Main_Entrance to Room 5 area
-        connect_nodes_preferred("Main_Entrance", "Junction_9", 0.5)
-
-        # Create a reasonable path from Main_Entrance through proper corridor structure
-        # Main_Entrance to corridor junction
-        connect_nodes("Main_Entrance", "Junction_6")
-        connect_nodes("Junction_6", "Junction_5")  # Follow corridor path
-        connect_nodes("Junction_5", "Junction_4")  # Follow corridor path
-        connect_nodes("Junction_4", "Junction_3")  # Connect to Room 3 junction
-        connect_nodes("Junction_3", "Junction_2")  # Connect to Bath 1 junction
-
-        # First floor horizontal corridor
-        connect_nodes("Conference_Room_door", "Junction_6")
-        connect_nodes("1st_Corridor_Main", "Junction_7")
-
-        # Connect other doors on first floor
-        connect_nodes("Bath_2_door", "Junction_5")
-        connect_nodes("Junction_5", "Junction_6")
-
-        connect_nodes("Principal_Office_door", "Junction_4")
-        connect_nodes("Junction_4", "Junction_5")
-
-        connect_nodes("Room_3_door", "Junction_3")
-        connect_nodes("Junction_3", "Junction_4")
-
-        connect_nodes("Bath_1_door", "Junction_2")
-        connect_nodes("Junction_2", "Junction_3")
-
-        # Only connect Junction_1 to Room_1_door, Room_2_door, and Junction_2
-        connect_nodes("Room_1_door", "Junction_1")
-        connect_nodes("Room_2_door", "Junction_1")
-        # Direct connection to Junction_2 only
-        connect_nodes("Junction_1", "Junction_2")
-
-        # Remove the direct connection between Junction_4 and Junction_1
-        # This forces the path to go through Junction_2
-
-        # Right side corridor
-        connect_nodes("Bath_3_door", "Junction_15")
-        connect_nodes("Junction_15", "Junction_14")
-        connect_nodes("Junction_15", "Junction_16")
-        connect_nodes("Room_9_door", "Junction_14")
-        connect_nodes("Junction_14", "Junction_13")
-        connect_nodes("Room_8_door", "Junction_13")
-        connect_nodes("Junction_13", "Junction_12")
-        connect_nodes("Room_7_door", "Junction_12")
-        connect_nodes("Junction_12", "Junction_11")
-        connect_nodes("Faculty_Lounge_door", "Junction_11")
-
-        # Add direct connections between Faculty Lounge area and Principal Office area
-        connect_nodes("Junction_11", "Junction_4")
-
-        connect_nodes("Junction_11", "Junction_10")
-        connect_nodes("Room_6_door", "Junction_10")
-        connect_nodes("Junction_10", "Junction_9")
-        connect_nodes("Room_5_door", "Junction_9")
-
-        # Add direct connections from Room 5, 6 junctions to the main corridor
-        connect_nodes("Junction_9", "Junction_6")  # Room 5 to main corridor
-        connect_nodes("Junction_10", "Junction_6")  # Room 6 to main corridor
-
-        # Connect Room 7, 8, 9 doors to their respective junction nodes
-        # Room 7 door to its junction
-        connect_nodes("Room_7_door", "Junction_12")
-        # Room 8 door to its junction
-        connect_nodes("Room_8_door", "Junction_13")
-        # Room 9 door to its junction
-        connect_nodes("Room_9_door", "Junction_14")
-
-        # Add penalties to undesired paths
-        connect_nodes_with_penalty("Junction_9", "Junction_10", 5.0)
-        connect_nodes_with_penalty("Junction_10", "Junction_11", 5.0)
-        connect_nodes_with_penalty("Junction_11", "Junction_12", 5.0)
-        connect_nodes_with_penalty("Junction_12", "Junction_13", 5.0)
-        connect_nodes_with_penalty("Junction_13", "Junction_14", 5.0)
-
-        # Treasure office connection
-        connect_nodes("Junction_16", "Treasure_Office_door")
-        connect_nodes("Main_Entrance", "Junction_16")
-        connect_nodes("Junction_16", "Junction_7")
-
-        # Library connections
-        connect_nodes("1st_Corridor_Library", "Library_door")
-        connect_nodes("1st_Corridor_Main", "1st_Corridor_Library")
-        connect_nodes("Junction_17", "Library_door")
-        connect_nodes("Junction_17", "Junction_7")
-
-        # Add direct preferred path from Library to Top Corridor
-        connect_nodes_preferred("1st_Corridor_Library",
-                                "1st_Corridor_Top", 0.5)
-
-        # Vertical connections to second floor
-        connect_nodes("1st_Corridor_Main", "Junction_17")
-        connect_nodes("Junction_17", "1st_Corridor_Top")
-        connect_nodes("1st_Corridor_Top", "2nd_Corridor_Main")
-
-        # Second floor connections
-        connect_nodes("2nd_Corridor_Main", "Junction_18")
-        connect_nodes("Junction_18", "2nd_Corridor_Left")
-        connect_nodes("Junction_18", "2nd_Corridor_Right")
-
-        # Connect Junction_19 to Junction_18 for proper second floor routing
-        # Connection through second floor corridor
-        connect_nodes("Junction_19", "Junction_18")
-
-        # Left side connections
-        # Create preferred path through Junction_20 and Junction_19
-        connect_nodes_preferred("Junction_44", "Junction_20", 0.5)
-        connect_nodes_preferred("Junction_20", "Junction_19", 0.5)
-        connect_nodes("Junction_44", "Junction_21")
-
-        # Add penalty to the path through Junction_45
-        connect_nodes_with_penalty("Junction_44", "Junction_45", 5.0)
-        connect_nodes_with_penalty("Junction_45", "Geology_Lab_door", 5.0)
-        connect_nodes("Junction_21", "Junction_22")
-        connect_nodes("Junction_22", "Junction_23")
-        connect_nodes("Junction_23", "Junction_24")
-        connect_nodes("Junction_24", "Junction_25")
-        connect_nodes("Junction_25", "Junction_26")
-        connect_nodes("Junction_26", "Junction_27")
-        connect_nodes("Junction_27", "Junction_28")
-        connect_nodes("Junction_28", "Junction_29")
-        connect_nodes("Junction_29", "Junction_30")
-
-        # Door connections on left side
-        connect_nodes("Junction_19", "Geology_Lab_door")
-        connect_nodes("Junction_17", "Junction_18")
-        connect_nodes("Junction_44", "Junction_45")
-        connect_nodes("Junction_19", "1st_Floor_Stairs_door")
-        connect_nodes("Junction_44", "Experiment_Lab_door")
-        connect_nodes("Junction_22", "Seminar_Hall_door")
-        connect_nodes("Junction_23", "Biology_Lab_door")
-        connect_nodes("Junction_24", "Male_Common_Room_door")
-        connect_nodes("Junction_25", "Female_Common_Room_door")
-        connect_nodes("Junction_26", "AAS_Lab_door")
-        connect_nodes("Junction_27", "Chemistry_Lab_door")
-        connect_nodes("Junction_28", "Toxicology_Lab_door")
-        connect_nodes("Junction_29", "Water_Test_Lab_door")
-        connect_nodes("Junction_30", "Computer_Lab_door")
-
-        # Right side - completely redesigned for proper routing
-        # Right side connections with penalties to prevent unwanted routing
-        connect_nodes_with_penalty(
-            "2nd_Corridor_Right", "Junction_31", 5.0)  # Add high penalty
-        connect_nodes("Junction_31", "Junction_32")
-        connect_nodes("Junction_32", "Junction_33")
-        connect_nodes("Junction_33", "Junction_34")
-        connect_nodes("Junction_34", "Junction_35")
-        connect_nodes("Junction_35", "Junction_36")
-        connect_nodes("Junction_36", "Junction_37")
-        connect_nodes("Junction_37", "Junction_38")
-        connect_nodes("Junction_38", "Junction_39")
-        connect_nodes("Junction_39", "Junction_40")
-        connect_nodes("Junction_40", "Junction_41")
-        connect_nodes("Junction_41", "Junction_43")
-        connect_nodes("Junction_43", "Junction_42")
-
-        connect_nodes("Junction_32", "Room_110_door")
-        connect_nodes("Junction_33", "Reception_door")
-        connect_nodes("Junction_34", "Photocopy_Shop_door")
-        connect_nodes("Junction_35", "Room_101_door")
-        connect_nodes("Junction_36", "Room_102_door")
-        connect_nodes("Junction_37", "Room_103_door")
-        connect_nodes("Junction_38", "Room_104_door")
-        connect_nodes("Junction_39", "Room_105_door")
-        connect_nodes("Junction_40", "Room_106_door")
-        connect_nodes("Junction_41", "Room_107_door")
-        connect_nodes("Junction_43", "Room_108_door")
-        connect_nodes("Junction_42", "Culinary_Lab_door")
-
-        connect_nodes("Junction_42", "Junction_32")
-
-        # Remove direct connection between Junction_19 and Junction_31 to prevent unwanted routing
-        connect_nodes("Junction_20", "Junction_30")
-
-        # Add direct connection between Principal Office area and Room 2 area
-        # This fixes the navigation from Faculty Lounge to Room 2
-        connect_nodes("Junction_4", "Junction_1")
-
-        # Increase penalties for paths through Junction_31
-        connect_nodes_with_penalty("Junction_35", "2nd_Corridor_Right", 10.0)
-        connect_nodes_with_penalty("Junction_36", "2nd_Corridor_Right", 10.0)
-        connect_nodes_with_penalty(
-            "2nd_Corridor_Right", "Junction_31", 20.0)  # Increased penalty
-
-        connect_nodes("Junction_37", "Junction_36")
-        connect_nodes("Junction_36", "Junction_35")
-        connect_nodes("Junction_35", "Junction_34")
-        connect_nodes("Junction_34", "Junction_31")
-        connect_nodes("Junction_31", "2nd_Corridor_Right")
-
-        connect_nodes("Room_103_door", "Junction_36")
-
-        connect_nodes("Junction_38", "Junction_37")
-        connect_nodes("Junction_39", "Junction_38")
-
-        connect_nodes_with_penalty("Room_103_door", "2nd_Corridor_Right", 50.0)
-        connect_nodes_with_penalty("Room_103_door", "2nd_Corridor_Main", 50.0)
-        connect_nodes_with_penalty("Junction_37", "2nd_Corridor_Right", 50.0)
-        connect_nodes_with_penalty("Junction_37", "2nd_Corridor_Main", 50.0)
-        connect_nodes_with_penalty("Junction_38", "2nd_Corridor_Right", 50.0)
-        connect_nodes_with_penalty("Junction_38", "2nd_Corridor_Main", 50.0)
-        connect_nodes_with_penalty("Junction_39", "2nd_Corridor_Right", 50.0)
-        connect_nodes_with_penalty("Junction_39", "2nd_Corridor_Main", 50.0)
-
-        # Create preferred path from 2nd_Corridor_Right to 2nd_Corridor_Main
-        connect_nodes_preferred("2nd_Corridor_Right", "2nd_Corridor_Main", 0.5)
-
-    def find_shortest_path(self, start_name, end_name):
+        self.clear_edges()
+
+        for edge in self.definition["edges"]:
+            flags = 0
+            for flag in edge.get("flags", []):
+                flags |= EDGE_FLAGS[flag]
+            self.connect_nodes(edge["from"], edge["to"], edge.get("factor", 1.0), flags)
+
+        # Pack the finished graph into its compact array form
+        self.freeze()
+
+    def save_snapshot(self, path, source_hash=""):
+        """
+        Writes the frozen graph to a binary snapshot that load_snapshot can
+        memory-map. The file is a JSON header followed by the raw arrays.
+        """
+        self.freeze()
+        encoded = [name.encode("utf-8") for name in self.node_names]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        arrays = {
+            "node_x": self.node_x,
+            "node_y": self.node_y,
+            "node_is_room": self.node_is_room,
+            "node_zone": self.node_zone,
+            "edge_u": self.edge_u,
+            "edge_v": self.edge_v,
+            "edge_weight": self.edge_weight,
+            "edge_flags": self.edge_flags,
+            "offsets": self.offsets,
+            "targets": self.targets,
+            "arc_edge": self.arc_edge,
+            "weights": self.weights,
+            "name_offsets": name_offsets,
+            "name_bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+
+        # Lay the arrays out one after another, each aligned to 64 bytes
+        layout = {}
+        position = 0
+        for key, array in arrays.items():
+            position = -(-position // 64) * 64
+            layout[key] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                           "offset": position}
+            position += array.nbytes
+        header = json.dumps({
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "source_hash": source_hash,
+            "heuristic_scale": self.heuristic_scale,
+            "zones": self.zone_names,
+            "exits": self.exit_names,
+            "arrays": layout,
+        }).encode("utf-8")
+        data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header)) // 64) * 64
+
+        temporary_path = f"{path}.tmp{os.getpid()}"
+        with open(temporary_path, "wb") as file:
+            file.write(SNAPSHOT_MAGIC)
+            file.write(len(header).to_bytes(8, "little"))
+            file.write(header)
+            for key, array in arrays.items():
+                file.seek(data_start + layout[key]["offset"])
+                file.write(np.ascontiguousarray(array).tobytes())
+        os.replace(temporary_path, path)
+
+    def load_snapshot(self, path, source_hash=None):
+        """
+        Memory-maps a snapshot written by save_snapshot. The arrays stay
+        read-only views of the file, so every process that loads the same
+        snapshot shares one copy in the page cache.
+
+        Returns False without changing the graph if the file is missing,
+        unreadable, or was compiled from a different definition.
+        """
+        try:
+            with open(path, "rb") as file:
+                if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    return False
+                header_length = int.from_bytes(file.read(8), "little")
+                header = json.loads(file.read(header_length))
+        except (OSError, ValueError):
+            return False
+        if header.get("version") != SNAPSHOT_FORMAT_VERSION:
+            return False
+        if source_hash is not None and header.get("source_hash") != source_hash:
+            return False
+
+        data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + header_length) // 64) * 64
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        arrays = {}
+        for key, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            first = data_start + spec["offset"]
+            arrays[key] = raw[first:first + count * dtype.itemsize].view(
+                dtype).reshape(spec["shape"])
+
+        name_bytes = arrays.pop("name_bytes").tobytes()
+        name_offsets = arrays.pop("name_offsets").tolist()
+        self.node_names = [name_bytes[name_offsets[i]:name_offsets[i + 1]].decode("utf-8")
+                           for i in range(len(name_offsets) - 1)]
+        self.node_ids = {name: node_id for node_id, name in enumerate(self.node_names)}
+        self.zone_names = header["zones"]
+        self.zone_ids = {zone: zone_id for zone_id, zone in enumerate(self.zone_names)}
+        self.exit_names = header.get("exits", [])
+        for key, array in arrays.items():
+            setattr(self, key, array)
+        self._edge_ids = None
+        self.heuristic_scale = header["heuristic_scale"]
+        self.frozen = True
+        self.version += 1
+        return True
+
+    def graph_hash(self):
+        """Hash of the graph definition: node names, coordinates and edges."""
+        self.freeze()
+        digest = hashlib.sha256()
+        digest.update("\n".join(self.node_names).encode("utf-8"))
+        for array in (self.node_x, self.node_y, self.node_is_room,
+                      self.edge_u, self.edge_v, self.edge_weight):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def prepare_route_table(self, path=ROUTE_TABLE_FILE):
+        """
+        Loads the all-pairs route table from disk, or builds and saves it if
+        the file is missing or was built for a different graph.
+
+        Parameters:
+        - path: File to load from and save to (None keeps the table in memory)
+        """
+        graph_hash = self.graph_hash()
+        table = None
+        if path is not None and os.path.exists(path):
+            try:
+                table = RouteTable.load(path)
+            except Exception:
+                # A file that cannot be read, e.g. truncated by an
+                # interrupted save, is treated like a stale one
+                table = None
+            if table is not None and table.graph_hash != graph_hash:
+                table = None
+
+        if table is None:
+            table = RouteTable.build(self)
+            if path is not None:
+                try:
+                    table.save(path)
+                except OSError as error:
+                    print(f"Could not save route table to {path}: {error}")
+
+        self.route_table = table
+        self._route_table_path = path
+        self._route_table_version = self.version
+        return table
+
+    def prepare_contraction_hierarchy(self, path=CONTRACTION_FILE):
+        """
+        Loads the contraction hierarchy from disk, or builds and saves it if
+        the file is missing or was built for a different graph. The
+        hierarchy answers "ch" queries on large graphs, where the all-pairs
+        route table would not fit in memory.
+
+        Parameters:
+        - path: File to load from and save to (None keeps it in memory)
+        """
+        from contraction import ContractionHierarchy
+
+        graph_hash = self.graph_hash()
+        hierarchy = None
+        if path is not None and os.path.exists(path):
+            try:
+                hierarchy = ContractionHierarchy.load(path)
+            except Exception:
+                # An unreadable file, e.g. truncated by an interrupted
+                # save, is rebuilt like a stale one
+                hierarchy = None
+            if hierarchy is not None and hierarchy.graph_hash != graph_hash:
+                hierarchy = None
+
+        if hierarchy is None:
+            hierarchy = ContractionHierarchy.build(self)
+            if path is not None:
+                try:
+                    hierarchy.save(path)
+                except OSError as error:
+                    print(f"Could not save contraction hierarchy to {path}: {error}")
+
+        self.contraction = hierarchy
+        self._contraction_path = path
+        self._contraction_version = self.version
+        return hierarchy
+
+    def zone_overlay(self):
+        """Overlay graph between the zones, rebuilt when the graph changes."""
+        if self._zone_overlay is None or self._zone_overlay_version != self.version:
+            self._zone_overlay = ZoneOverlay(self)
+            self._zone_overlay_version = self.version
+        return self._zone_overlay
+
+    def evacuation_table(self, exit_names=None, profile=DEFAULT_PROFILE):
+        """
+        Builds the nearest-exit table of every node (see EvacuationTable).
+
+        Parameters:
+        - exit_names: Names of the exits (default: the exits of the building
+          definition)
+        - profile: Name of the weight profile, e.g. "accessible"
+        """
+        if exit_names is None:
+            exit_names = self.exit_names
+        return EvacuationTable.build(self, exit_names, profile)
+
+    @staticmethod
+    def is_clickable(name):
+        """Doors, the Main Entrance and corridor nodes can be picked on the map."""
+        return "door" in name or name == "Main_Entrance" or "Corridor" in name
+
+    def door_marker_ids(self):
+        """
+        Ids of the nodes drawn as door markers on the map: the clickable
+        nodes, without junctions.
+        """
+        self.freeze()
+        return [node_id for node_id, name in enumerate(self.node_names)
+                if "Junction" not in name and self.is_clickable(name)]
+
+    def spatial_index(self):
+        """
+        Grid index over the clickable nodes, rebuilt when the graph changes.
+        """
+        if self._spatial_index is None or self._spatial_index_version != self.version:
+            self.freeze()
+            ids = [node_id for node_id, name in enumerate(self.node_names)
+                   if self.is_clickable(name)]
+            self._spatial_index = SpatialGrid(
+                self.node_x[ids], self.node_y[ids], ids, SPATIAL_CELL_SIZE)
+            self._spatial_index_version = self.version
+        return self._spatial_index
+
+    def nearest_node(self, x, y, radius=CLICK_RADIUS):
+        """Name of the clickable node closest to (x, y) within radius, or None."""
+        node_id = self.spatial_index().nearest(x, y, radius)
+        return None if node_id is None else self.node_names[node_id]
+
+    def nodes_in_box(self, x0, y0, x1, y1):
+        """Names of the clickable nodes inside the given box."""
+        return [self.node_names[node_id]
+                for node_id in self.spatial_index().in_box(x0, y0, x1, y1)]
+
+    def edge_index(self):
+        """Grid index over the edge segments, rebuilt when the graph changes."""
+        if self._edge_grid is None or self._edge_grid_version != self.version:
+            self.freeze()
+            lengths = np.hypot(self.node_x[self.edge_u] - self.node_x[self.edge_v],
+                               self.node_y[self.edge_u] - self.node_y[self.edge_v])
+            cell_size = float(np.median(lengths)) if len(lengths) else 1.0
+            self._edge_grid = SegmentGrid(
+                self.node_x[self.edge_u], self.node_y[self.edge_u],
+                self.node_x[self.edge_v], self.node_y[self.edge_v],
+                np.arange(len(self.edge_u)), max(cell_size, 1.0))
+            self._edge_grid_version = self.version
+        return self._edge_grid
+
+    def snap_to_edge(self, x, y, max_distance=float('inf')):
+        """
+        Projects a map position onto the nearest edge.
+
+        Returns (edge id, t, snapped x, snapped y, distance), with t running
+        from 0 at edge_u to 1 at edge_v, or None if no edge is in reach.
+        """
+        return self.edge_index().nearest(x, y, max_distance)
+
+    def find_path_from_point(self, x, y, end_name, max_distance=float('inf')):
+        """
+        Finds the shortest path from an arbitrary map position, e.g. a user
+        standing in the middle of a corridor, to a named node.
+
+        The position is snapped onto the nearest edge and the search starts
+        from both ends of that edge, each seeded with the part of the edge
+        weight that is still to be walked. No node is added to the graph.
+
+        Returns (list of Nodes, distance, snap) where the path starts at the
+        first node reached from the snapped point and snap is the result of
+        snap_to_edge, or (None, inf, snap) if there is no path.
+        """
+        snap = self.snap_to_edge(x, y, max_distance)
+        if snap is None or end_name not in self.nodes:
+            return None, float('inf'), snap
+
+        edge, t, _, _, _ = snap
+        weight = float(self.edge_weight[edge])
+        seeds = [(int(self.edge_u[edge]), t * weight),
+                 (int(self.edge_v[edge]), (1.0 - t) * weight)]
+        end = self.node_ids[end_name]
+        path, distance = self._dijkstra(None, end, seeds, unroll=True)
+        if path is None:
+            return None, float('inf'), snap
+        return self.path_nodes(path), distance, snap
+
+    @staticmethod
+    def is_destination(name):
+        """Doors and the Main Entrance are destinations."""
+        return "door" in name or name == "Main_Entrance"
+
+    def destination_names(self):
+        """Names of every selectable destination: all doors plus the Main Entrance."""
+        return [name for name in self.node_names if self.is_destination(name)]
+
+    def find_shortest_path(self, start_name, end_name, method="dijkstra", stats=None,
+                           profile=DEFAULT_PROFILE, cancel=None):
+        """
+        Finds the shortest path between two named nodes.
+
+        Results are memoized in self.route_cache (set it to None to disable
+        caching); the cache is emptied whenever the graph version changes.
+
+        Parameters:
+        - start_name, end_name: Names of the start and destination nodes
+        - method: "dijkstra"; "astar" to guide the search towards the
+          destination with the straight-line distance heuristic;
+          "bidirectional" to search from both ends at once; "table" to
+          look the route up in the precomputed route table; "ch" to
+          search the contraction hierarchy (built on first use, see
+          prepare_contraction_hierarchy; graphs built by from_arrays
+          need both prepared first); or "zones" to search only the
+          zones of the two nodes plus the overlay between zones (see
+          ZoneOverlay). "ch" and "zones" return a route of the same
+          length, but where several routes are equally short they may
+          pick a different one than the other methods
+        - stats: Optional SearchStats to fill in with the work the query did
+        - profile: Name of the weight profile to route with (see
+          WEIGHT_PROFILES); "ch" and "zones" only support the default one
+        - cancel: Optional threading.Event. The "dijkstra", "astar" and
+          "bidirectional" searches check it every CANCEL_CHECK_INTERVAL
+          expanded nodes and give up once it is set, returning (None, inf)
+          without caching it. The other methods are lookups or bounded
+          searches that run to the end.
+
+        Returns (list of Nodes, distance), or (None, inf) if there is no path.
+        The number of nodes the search expanded is kept in self.last_expanded.
+        With self.instrumentation switched on, or any search hook
+        registered, every query also leaves its SearchStats in
+        self.last_stats.
+        """
         if start_name not in self.nodes or end_name not in self.nodes:
             return None, float('inf')
 
-        # Dijkstra's algorithm
-        distances = {node: float('inf') for node in self.nodes.values()}
-        distances[self.nodes[start_name]] = 0
-        previous = {node: None for node in self.nodes.values()}
-        queue = [(0, self.nodes[start_name])]
+        start = self.node_ids[start_name]
+        end = self.node_ids[end_name]
 
-        while queue:
-            current_distance, current_node = heapq.heappop(queue)
+        # Instrumentation off: no timing, no hooks, no stats object
+        if stats is None and not self.instrumentation and not self.search_hooks:
+            path, distance = self._cached_path_ids(start, end, method, profile, cancel)
+        else:
+            if stats is None:
+                stats = SearchStats()
+            stats.method = method
+            stats.profile = profile
+            stats.start = start_name
+            stats.end = end_name
+            for hook in self.search_hooks:
+                hook("start", stats)
+            started = time.perf_counter()
+            path, distance = self._cached_path_ids(start, end, method, profile, cancel)
+            stats.wall_time = time.perf_counter() - started
+            stats.cache_hit = self._last_cache_hit
+            (stats.popped, stats.stale, stats.expanded, stats.relaxed,
+             stats.peak_queue) = self.last_counters
+            stats.distance = distance
+            self.last_stats = stats
+            for hook in self.search_hooks:
+                hook("end", stats)
 
-            if current_node == self.nodes[end_name]:
-                break
+        if path is None:
+            return None, float('inf')
+        return self.path_nodes(path), distance
+
+    def _cached_path_ids(self, start, end, method, profile=DEFAULT_PROFILE, cancel=None):
+        # Checked before the cache, so an unsupported query fails whether or
+        # not another method already cached the route
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method: {method}")
+        if profile != DEFAULT_PROFILE and method in ("ch", "zones"):
+            raise ValueError(f"Search method {method} only supports the "
+                             f"{DEFAULT_PROFILE} weight profile")
+
+        cache = self.route_cache
+        if cache is not None:
+            cached = cache.get(self.version, start, end, profile)
+            if cached is not None:
+                self._record_counters(0, 0, 0, 0, 0)
+                self._last_cache_hit = True
+                return cached
+
+        self._last_cache_hit = False
+        path, distance = self._find_path_ids(start, end, method, profile, cancel)
+        # A cancelled search did not finish, so its result is not kept
+        if cache is not None and (cancel is None or not cancel.is_set()):
+            cache.put(self.version, start, end, profile, path, distance)
+        return path, distance
+
+    def _node_id_list(self, names):
+        unknown = [name for name in names if name not in self.node_ids]
+        if unknown:
+            raise ValueError(f"Unknown nodes: {', '.join(map(str, unknown))}")
+        return [self.node_ids[name] for name in names]
+
+    def route_matrix(self, origins, destinations, return_paths=False,
+                     profile=DEFAULT_PROFILE):
+        """
+        Computes the shortest distances from every origin to every
+        destination, growing one shortest path tree per distinct origin.
+
+        Parameters:
+        - origins, destinations: Lists of node names
+        - return_paths: Also return the paths, as a list of rows of Node
+          lists (None where a destination is unreachable)
+        - profile: Name of the weight profile to route with
+
+        Returns (distances, paths): distances is a len(origins) x
+        len(destinations) NumPy array with inf for unreachable pairs, and
+        paths is None unless return_paths is set.
+        """
+        origin_ids = self._node_id_list(origins)
+        destination_ids = self._node_id_list(destinations)
+        wanted = set(destination_ids)
+
+        distances = np.full((len(origin_ids), len(destination_ids)), np.inf)
+        paths = [None] * len(origin_ids) if return_paths else None
+        rows_by_origin = {}
+        for row, origin in enumerate(origin_ids):
+            rows_by_origin.setdefault(origin, []).append(row)
+
+        for origin, rows in rows_by_origin.items():
+            tree_distances, tree_previous = self._dijkstra(origin, wanted=wanted,
+                                                           profile=profile)
+            row_distances = [tree_distances.get(node, float('inf'))
+                             for node in destination_ids]
+            distances[rows] = row_distances
+
+            if return_paths:
+                row_paths = [self.path_nodes(self._unroll(tree_previous, node))
+                             if node in tree_distances else None
+                             for node in destination_ids]
+                for row in rows:
+                    paths[row] = list(row_paths)
+
+        return distances, paths
+
+    def route_pairs(self, pairs, return_paths=False, profile=DEFAULT_PROFILE):
+        """
+        Batch version of find_shortest_path for a list of (start, end) name
+        pairs. Pairs are grouped by start so each start is searched once.
+
+        Returns (distances, paths): a NumPy array aligned with pairs, and a
+        list of Node lists (None if unreachable) when return_paths is set.
+        """
+        starts = self._node_id_list([start for start, _ in pairs])
+        ends = self._node_id_list([end for _, end in pairs])
+
+        wanted_by_start = {}
+        for index, (start, end) in enumerate(zip(starts, ends)):
+            wanted_by_start.setdefault(start, []).append((index, end))
+
+        distances = np.full(len(pairs), np.inf)
+        paths = [None] * len(pairs) if return_paths else None
+        for start, requests in wanted_by_start.items():
+            tree_distances, tree_previous = self._dijkstra(
+                start, wanted={end for _, end in requests}, profile=profile)
+            for index, end in requests:
+                if end in tree_distances:
+                    distances[index] = tree_distances[end]
+                    if return_paths:
+                        paths[index] = self.path_nodes(self._unroll(tree_previous, end))
+
+        return distances, paths
+
+    def door_distance_matrix(self, profile=DEFAULT_PROFILE):
+        """Distances between every pair of destinations (doors and the Main
+        Entrance), in the order of destination_names()."""
+        names = self.destination_names()
+        distances, _ = self.route_matrix(names, names, profile=profile)
+        return names, distances
+
+    def distances_within(self, source_name, max_distance, profile=DEFAULT_PROFILE):
+        """
+        Distances from a named node to every node at most max_distance
+        away, with a single search that stops at the threshold.
+
+        Returns {node id: distance}.
+        """
+        source = self._node_id_list([source_name])[0]
+        distances, _ = self._dijkstra(source, profile=profile, limit=max_distance)
+        return {node: distance for node, distance in distances.items()
+                if distance <= max_distance}
 
-            if current_distance > distances[current_node]:
+    def doors_within(self, source_name, max_distance, profile=DEFAULT_PROFILE):
+        """
+        Every destination (door or the Main Entrance) within max_distance of
+        a named node.
+
+        Returns a list of (name, distance) pairs, nearest first. The source
+        itself is included when it is a destination.
+        """
+        names = self.node_names
+        return sorted(((names[node], distance) for node, distance
+                       in self.distances_within(source_name, max_distance, profile).items()
+                       if self.is_destination(names[node])),
+                      key=lambda item: item[1])
+
+    def doors_within_many(self, source_names, max_distance, profile=DEFAULT_PROFILE,
+                          matrix=None):
+        """
+        Vectorized doors_within for many sources at once, answered from a
+        precomputed distance matrix instead of by searching.
+
+        Parameters:
+        - source_names: List of node names
+        - max_distance: One budget for all sources, or one per source
+        - profile: Name of the weight profile; its route table supplies the
+          distances
+        - matrix: Optional (names, distances) pair from door_distance_matrix
+          to use instead of the route table; the sources must then be
+          destinations themselves
+
+        Returns (names, within, distances): the destination names, a
+        len(source_names) x len(names) boolean array that is true where a
+        destination is within budget, and the distances themselves.
+        """
+        budgets = np.asarray(max_distance, dtype=np.float64)
+        if budgets.ndim == 1:
+            budgets = budgets[:, None]
+        if matrix is None:
+            names = self.destination_names()
+            table = self._route_table_for(profile)
+            distances = table.distances[np.ix_(self._node_id_list(source_names),
+                                               self._node_id_list(names))]
+        else:
+            names, all_distances = matrix
+            rows = {name: row for row, name in enumerate(names)}
+            unknown = [name for name in source_names if name not in rows]
+            if unknown:
+                raise ValueError(f"Not in the distance matrix: {', '.join(unknown)}")
+            distances = all_distances[[rows[name] for name in source_names]]
+        return names, distances <= budgets, distances
+
+    def k_shortest_paths(self, start_name, end_name, k=ALTERNATIVE_ROUTES,
+                         max_stretch=ALTERNATIVE_MAX_STRETCH, profile=DEFAULT_PROFILE,
+                         settle_limit=SPUR_SETTLE_LIMIT, cancel=None):
+        """
+        Finds up to k loopless routes between two named nodes, shortest
+        first, with Yen's algorithm.
+
+        Every alternative branches off an earlier route at a spur node.
+        All spur searches share one shortest path tree grown from the
+        destination: it is an exact A* heuristic for them, and wherever
+        the tree's own route from the spur node is still allowed it is
+        used without any search.
+
+        Parameters:
+        - start_name, end_name: Names of the start and destination nodes
+        - k: Largest number of routes to return
+        - max_stretch: Routes longer than max_stretch times the shortest
+          one are not considered; this also bounds the tree and every
+          spur search
+        - profile: Name of the weight profile to route with
+        - settle_limit: Nodes a single spur search may settle before it
+          gives up, which keeps queries on large graphs bounded at the
+          price of possibly missing an alternative
+        - cancel: Optional threading.Event; once it is set the search stops
+          and returns the routes found so far
+
+        Returns a list of (list of Nodes, distance) pairs, empty if there is
+        no path. The work done by all searches together is kept in
+        self.last_counters.
+        """
+        if start_name not in self.nodes or end_name not in self.nodes:
+            return []
+        start = self.node_ids[start_name]
+        end = self.node_ids[end_name]
+        adjacency = self._adjacency(profile)
+        offsets, targets, weights = adjacency
+
+        node_x = self.node_x.data
+        node_y = self.node_y.data
+        start_x, start_y = node_x[start], node_y[start]
+        scale = self._profile_arrays(profile)[2]
+
+        # Shortest path tree towards end, grown as an A* search towards
+        # start. Its heuristic is consistent, so every settled node has its
+        # exact distance to end. The search goes on past start until it
+        # holds every node that can lie on a route within max_stretch of
+        # the shortest one.
+        to_end = {}
+        next_hop = {}
+        tentative = {end: 0.0}
+        hops = {end: -1}
+        queue = [(0.0, end)]
+        limit = float('inf')
+        popped = relaxed = 0
+        while queue:
+            estimate, node = heapq.heappop(queue)
+            popped += 1
+            if node in to_end:
                 continue
+            if estimate > limit:
+                break
+            if (cancel is not None and popped % CANCEL_CHECK_INTERVAL == 0
+                    and cancel.is_set()):
+                break
+            distance = tentative[node]
+            to_end[node] = distance
+            next_hop[node] = hops[node]
+            if node == start:
+                # Slack for rounding, so equally long routes are kept
+                limit = distance * max_stretch + 1e-9
+            first, last = offsets[node], offsets[node + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                candidate = distance + weight
+                if candidate < tentative.get(neighbor, float('inf')):
+                    tentative[neighbor] = candidate
+                    hops[neighbor] = node
+                    heuristic = scale * math.hypot(node_x[neighbor] - start_x,
+                                                   node_y[neighbor] - start_y)
+                    heapq.heappush(queue, (candidate + heuristic, neighbor))
+            relaxed += last - first
+        expanded = len(to_end)
+        if start not in to_end:
+            self._record_counters(popped, popped - expanded, expanded, relaxed, 0)
+            return []
+
+        path = [start]
+        while path[-1] != end:
+            path.append(next_hop[path[-1]])
+        routes = [path]
+        candidates = []
+        seen = {tuple(path)}
+
+        while len(routes) < k:
+            last_route = routes[-1]
+            root_cost = 0.0
+            for index, spur in enumerate(last_route[:-1]):
+                if cancel is not None and cancel.is_set():
+                    break
+                root = last_route[:index + 1]
+                # Edges out of the spur node already taken by a route with
+                # the same root, and the root nodes themselves (loopless)
+                banned_next = {route[index + 1] for route in routes
+                               if route[:index + 1] == root}
+                banned_nodes = set(root[:-1])
+                spur_path, spur_distance, counters = self._spur_path(
+                    spur, end, limit - root_cost, banned_nodes, banned_next,
+                    to_end, next_hop, adjacency, settle_limit)
+                popped += counters[0]
+                expanded += counters[1]
+                relaxed += counters[2]
+                if spur_path is not None:
+                    candidate = tuple(root[:-1] + spur_path)
+                    if candidate not in seen:
+                        seen.add(candidate)
+                        heapq.heappush(candidates, (root_cost + spur_distance, candidate))
+                root_cost += self._arc_weight(spur, last_route[index + 1], adjacency)
+            if not candidates or (cancel is not None and cancel.is_set()):
+                break
+            routes.append(list(heapq.heappop(candidates)[1]))
+
+        self._record_counters(popped, popped - expanded, expanded, relaxed, 0)
+        results = []
+        for route in routes:
+            distance = 0.0
+            for u, v in zip(route, route[1:]):
+                distance += self._arc_weight(u, v, adjacency)
+            results.append((self.path_nodes(route), distance))
+        return results
+
+    @staticmethod
+    def _arc_weight(u, v, adjacency):
+        offsets, targets, weights = adjacency
+        for arc in range(offsets[u], offsets[u + 1]):
+            if targets[arc] == v:
+                return weights[arc]
+        raise ValueError(f"No edge between node ids {u} and {v}")
+
+    @staticmethod
+    def _spur_path(spur, end, budget, banned_nodes, banned_next, to_end, next_hop,
+                   adjacency, settle_limit):
+        # Shortest route from spur to end of at most budget that avoids the
+        # banned nodes and does not leave spur towards a banned neighbour.
+        # Returns (node ids, distance, (popped, expanded, relaxed)).
+        hop = next_hop[spur]
+        if hop not in banned_next:
+            path = [spur]
+            while hop != -1 and hop not in banned_nodes:
+                path.append(hop)
+                hop = next_hop[hop]
+            if path[-1] == end:
+                return path, to_end[spur], (0, 0, 0)
+
+        # A* with the exact distances of the unrestricted tree. Nodes
+        # outside the tree cannot be on any route within the limit, so
+        # they are never queued.
+        offsets, targets, weights = adjacency
+        distances = {spur: 0.0}
+        previous = {spur: -1}
+        queue = [(to_end[spur], spur)]
+        popped = expanded = relaxed = 0
+        while queue:
+            estimate, node = heapq.heappop(queue)
+            popped += 1
+            if estimate > budget:
+                break
+            distance = distances[node]
+            if distance + to_end[node] < estimate:
+                continue
+            if node == end:
+                path = []
+                while node != -1:
+                    path.append(node)
+                    node = previous[node]
+                path.reverse()
+                return path, distance, (popped, expanded, relaxed)
+            expanded += 1
+            if expanded > settle_limit:
+                break
 
-            for neighbor, weight in current_node.neighbors.items():
-                distance = current_distance + weight
+            first, last = offsets[node], offsets[node + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                if neighbor in banned_nodes or (node == spur and neighbor in banned_next):
+                    continue
+                remaining = to_end.get(neighbor)
+                if remaining is None:
+                    continue
+                candidate = distance + weight
+                if candidate < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = candidate
+                    previous[neighbor] = node
+                    heapq.heappush(queue, (candidate + remaining, neighbor))
+            relaxed += last - first
+        return None, float('inf'), (popped, expanded, relaxed)
+
+    def _find_path_ids(self, start, end, method, profile=DEFAULT_PROFILE, cancel=None):
+        if method == "dijkstra":
+            return self._dijkstra(start, end, profile=profile, unroll=True, cancel=cancel)
+        elif method == "astar":
+            return self._astar(start, end, profile, cancel)
+        elif method == "table":
+            table = self._route_table_for(profile)
+            self._record_counters(0, 0, 0, 0, 0)
+            return table.route(start, end)
+        elif method == "bidirectional":
+            return self._bidirectional(start, end, profile, cancel)
+        elif method == "zones":
+            path, distance, counters = self.zone_overlay().route(start, end)
+            self._record_counters(*counters)
+            return path, distance
+        elif method == "ch":
+            if self.contraction is None and self._contraction_path is None:
+                raise ValueError("This graph has no contraction hierarchy; "
+                                 "call prepare_contraction_hierarchy first")
+            if (self.contraction is None
+                    or self._contraction_version != self.version):
+                self.prepare_contraction_hierarchy(self._contraction_path)
+            path, distance = self.contraction.route(start, end)
+            counters = self.contraction.last_counters
+            if path is not None and len(path) > 2:
+                # The hierarchy may pick another of several equally short
+                # routes; take the one Dijkstra returns
+                path, distance, resolved = self._resolve_ties(
+                    start, end, distance, self.contraction.distances_to(end))
+                counters = tuple(map(sum, zip(counters[:4], resolved[:4]))) + (
+                    max(counters[4], resolved[4]),)
+            self._record_counters(*counters)
+            return path, distance
+        else:
+            raise ValueError(f"Unknown search method: {method}")
+
+    def _route_table_for(self, profile):
+        # The default profile's table is kept on disk (prepare_route_table);
+        # the other profiles each get one in memory on first use
+        if self.route_table is None and self._route_table_path is None:
+            raise ValueError("This graph has no route table; "
+                             "call prepare_route_table first")
+        if profile == DEFAULT_PROFILE:
+            if (self.route_table is None
+                    or self._route_table_version != self.version):
+                self.prepare_route_table(self._route_table_path)
+            return self.route_table
+        cached = self._profile_tables.get(profile)
+        if cached is None or cached[0] != self.version:
+            cached = (self.version, RouteTable.build(self, profile))
+            self._profile_tables[profile] = cached
+        return cached[1]
+
+    def _record_counters(self, popped, stale, expanded, relaxed, peak_queue):
+        # Work counters of the last search; they are cheap local integers in
+        # the search loops and only turned into SearchStats on request
+        self.last_expanded = expanded
+        self.last_counters = (popped, stale, expanded, relaxed, peak_queue)
+
+    def add_search_hook(self, hook):
+        """
+        Registers a callback for external profilers. It is called as
+        hook("start", stats) before and hook("end", stats) after every
+        find_shortest_path query, with the SearchStats of that query.
+        """
+        self.search_hooks.append(hook)
 
-                if distance < distances[neighbor]:
-                    distances[neighbor] = distance
-                    previous[neighbor] = current_node
-                    heapq.heappush(queue, (distance, neighbor))
+    def remove_search_hook(self, hook):
+        self.search_hooks.remove(hook)
 
+    def _unroll(self, previous, end):
         # Reconstruct path
         path = []
-        current = self.nodes[end_name]
+        current = end
 
-        while current is not None:
+        while current != -1:
             path.append(current)
             current = previous[current]
 
         path.reverse()
+        return path
+
+    def _buffers(self):
+        # A (distances, previous) pair of lists with an entry for every
+        # node, all distances infinite. The searches work in these instead
+        # of dictionaries and hand them back through _release, which only
+        # resets the entries a search touched, so a query still costs in
+        # proportion to the nodes it reaches. Every search takes its own
+        # pair, which keeps nested searches and the interactive map's worker
+        # thread apart.
+        num_nodes = len(self.node_names)
+        try:
+            distances, previous = self._search_buffers.pop()
+        except IndexError:
+            distances = previous = None
+        if distances is None or len(distances) != num_nodes:
+            distances = [float('inf')] * num_nodes
+            previous = [-1] * num_nodes
+        return distances, previous
+
+    def _release(self, buffers, touched, end=None):
+        # Returns the search results for the touched nodes as
+        # {node id: distance} and {node id: previous node id}, or with an
+        # end node just (path ids to it or None, its distance), and hands
+        # the buffers back for the next search
+        distances, previous = buffers
+        inf = float('inf')
+        if end is None:
+            result = ({node: distances[node] for node in touched},
+                      {node: previous[node] for node in touched})
+        elif distances[end] == inf:
+            result = (None, inf)
+        else:
+            result = (self._unroll(previous, end), distances[end])
+        for node in touched:
+            distances[node] = inf
+        self._search_buffers.append(buffers)
+        return result
+
+    def _dijkstra(self, start, end=None, seeds=None, wanted=None,
+                  profile=DEFAULT_PROFILE, limit=float('inf'), unroll=False, cancel=None):
+        offsets, targets, weights = self._adjacency(profile)
+
+        # Dijkstra's algorithm over integer node ids. Only nodes that are
+        # reached get an entry in the result, so a query never touches the
+        # whole graph. Seeds, a list of (node id, initial distance), start
+        # the search from several nodes at once instead of from start alone.
+        # With a set of wanted nodes the search stops once all of them are
+        # settled. The search also stops at nodes farther than limit; the
+        # entries beyond it are not final. With unroll the search returns
+        # (path ids, distance) to end instead of the search tree. Once the
+        # cancel event is set the search gives up and returns nothing:
+        # (None, inf) or empty dictionaries.
+        remaining = set(wanted) if wanted is not None else None
+        if seeds is None:
+            seeds = [(start, 0.0)]
+        buffers = self._buffers()
+        distances, previous = buffers
+        inf = float('inf')
+        touched = []
+        for node, distance in seeds:
+            if distances[node] == inf:
+                touched.append(node)
+            if distance < distances[node]:
+                distances[node] = distance
+                previous[node] = -1
+        queue = [(distances[node], node) for node in touched]
+        heapq.heapify(queue)
+        expanded = stale = relaxed = 0
+        peak_queue = len(queue)
+        cancelled = False
+
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+
+            if current_distance > distances[current]:
+                stale += 1
+                continue
+            if current_distance > limit:
+                break
+
+            expanded += 1
+            if current == end:
+                break
+            if (cancel is not None and expanded % CANCEL_CHECK_INTERVAL == 0
+                    and cancel.is_set()):
+                cancelled = True
+                break
+            if remaining is not None and current in remaining:
+                remaining.discard(current)
+                if not remaining:
+                    break
+
+            first, last = offsets[current], offsets[current + 1]
+            for arc in range(first, last):
+                neighbor = targets[arc]
+                distance = current_distance + weights[arc]
+
+                if distance < distances[neighbor]:
+                    if distances[neighbor] == inf:
+                        touched.append(neighbor)
+                    distances[neighbor] = distance
+                    previous[neighbor] = current
+                    heapq.heappush(queue, (distance, neighbor))
+
+            # The queue only grows while a node is relaxed, so checking
+            # its size once per node finds the true peak
+            relaxed += last - first
+            if len(queue) > peak_queue:
+                peak_queue = len(queue)
+
+        self._record_counters(expanded + stale, stale, expanded, relaxed, peak_queue)
+        if cancelled:
+            self._release(buffers, touched)
+            return (None, float('inf')) if unroll else ({}, {})
+        return self._release(buffers, touched, end if unroll else None)
+
+    def _astar(self, start, end, profile=DEFAULT_PROFILE, cancel=None):
+        offsets, targets, weights = self._adjacency(profile)
+        node_x = self.node_x.data
+        node_y = self.node_y.data
+        end_x, end_y = node_x[end], node_y[end]
+        scale = self._profile_arrays(profile)[2]
+
+        # A* search. The heuristic is the straight-line distance to the
+        # destination scaled by the smallest weight/length ratio of any edge,
+        # so it never overestimates even across discounted corridors. It is
+        # also consistent, which means a node's distance is final the first
+        # time it is expanded, exactly like in Dijkstra. The heuristic of a
+        # node is computed when it is first reached. Returns (path ids,
+        # distance), or (None, inf) when end cannot be reached or the
+        # cancel event was set before the search finished.
+        buffers = self._buffers()
+        distances, previous = buffers
+        inf = float('inf')
+        distances[start] = 0.0
+        previous[start] = -1
+        touched = [start]
+        estimates = {}
+        queue = [(0.0, 0.0, start)]
+        expanded = stale = relaxed = 0
+        peak_queue = 1
+        cancelled = False
+
+        while queue:
+            _, current_distance, current = heapq.heappop(queue)
+
+            if current_distance > distances[current]:
+                stale += 1
+                continue
+
+            expanded += 1
+            if current == end:
+                break
+            if (cancel is not None and expanded % CANCEL_CHECK_INTERVAL == 0
+                    and cancel.is_set()):
+                cancelled = True
+                break
 
-        if path[0] != self.nodes[start_name]:
+            first, last = offsets[current], offsets[current + 1]
+            for arc in range(first, last):
+                neighbor = targets[arc]
+                distance = current_distance + weights[arc]
+
+                if distance < distances[neighbor]:
+                    if distances[neighbor] == inf:
+                        touched.append(neighbor)
+                        estimate = scale * math.hypot(node_x[neighbor] - end_x,
+                                                      node_y[neighbor] - end_y)
+                        estimates[neighbor] = estimate
+                    else:
+                        estimate = estimates[neighbor]
+                    distances[neighbor] = distance
+                    previous[neighbor] = current
+                    heapq.heappush(queue, (distance + estimate, distance, neighbor))
+
+            relaxed += last - first
+            if len(queue) > peak_queue:
+                peak_queue = len(queue)
+
+        self._record_counters(expanded + stale, stale, expanded, relaxed, peak_queue)
+        if cancelled:
+            self._release(buffers, touched)
             return None, float('inf')
+        return self._release(buffers, touched, end)
+
+    def _bidirectional(self, start, end, profile=DEFAULT_PROFILE, cancel=None):
+        offsets, targets, weights = self._adjacency(profile)
+
+        # Bidirectional Dijkstra. Edges are undirected, so the backward
+        # search from the destination uses the same adjacency. Index 0 is
+        # the forward search and index 1 the backward one. Once the cancel
+        # event is set the search gives up and returns (None, inf).
+        distances = ({start: 0.0}, {end: 0.0})
+        previous = ({start: -1}, {end: -1})
+        settled = (set(), set())
+        queues = ([(0.0, start)], [(0.0, end)])
+        best = 0.0 if start == end else float('inf')
+        # Node where the best connection between the two trees was found
+        meeting = start
+        expanded = stale = pruned = relaxed = 0
+        peak_queue = 2
+
+        while queues[0] and queues[1]:
+            # Once the two frontiers together are at least as far as the
+            # best connection found, no shorter path can exist
+            forward_top = queues[0][0][0]
+            backward_top = queues[1][0][0]
+            if forward_top + backward_top >= best:
+                break
+
+            # Grow the side whose frontier is closer to its origin
+            side = 0 if forward_top <= backward_top else 1
+            current_distance, current = heapq.heappop(queues[side])
+            side_distances = distances[side]
+            other_distances = distances[1 - side]
+
+            if current_distance > side_distances[current]:
+                stale += 1
+                continue
 
-        return path, distances[self.nodes[end_name]]
+            expanded += 1
+            if (cancel is not None and expanded % CANCEL_CHECK_INTERVAL == 0
+                    and cancel.is_set()):
+                best = float('inf')
+                break
+            settled[side].add(current)
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                distance = current_distance + weight
+
+                if distance < side_distances.get(neighbor, float('inf')):
+                    side_distances[neighbor] = distance
+                    previous[side][neighbor] = current
+                    heapq.heappush(queues[side], (distance, neighbor))
+
+                    # Check whether this connects to the other search tree
+                    if neighbor in other_distances:
+                        connection = distance + other_distances[neighbor]
+                        if connection < best:
+                            best = connection
+                            meeting = neighbor
+
+            relaxed += last - first
+            if len(queues[0]) + len(queues[1]) > peak_queue:
+                peak_queue = len(queues[0]) + len(queues[1])
+
+        if best == float('inf'):
+            self._record_counters(expanded + stale, stale, expanded, relaxed, peak_queue)
+            return None, float('inf')
+
+        forward_distances, backward_distances = distances
+        forward_previous = previous[0]
+        forward_queue = queues[0]
+        forward_top = forward_queue[0][0] if forward_queue else float('inf')
+        backward_top = queues[1][0][0] if queues[1] else float('inf')
+        bound = best * (1 + 1e-9) + 1e-9
+
+        # The frontiers met. Rebuild the route through the meeting point the
+        # way Dijkstra would: its predecessor of a node is the neighbour
+        # giving the lowest distance and, among equal ones, the one it
+        # popped first, i.e. the lower (distance, node id) since all weights
+        # are positive. The forward search has that exact distance for the
+        # nodes it settled, so walk from the last settled node on the route
+        # towards the destination and pick each predecessor with that rule.
+        # A neighbour that is not settled is at least forward_top from the
+        # start and backward_top from the destination, and its backward
+        # label bounds how much closer than best it can be to the start.
+        # Only when one of them could still tie is the tie left to the
+        # resumed search below.
+        if meeting in settled[0] or meeting == start:
+            node, following = meeting, previous[1][meeting]
+        else:
+            node, following = forward_previous[meeting], meeting
+        path = self._unroll(forward_previous, node)
+        distance = forward_distances[node]
+        tied = False
+        while following != -1:
+            first, last = offsets[following], offsets[following + 1]
+            arcs = list(zip(targets[first:last], weights[first:last]))
+            limit = (min(distance + weight for neighbor, weight in arcs if neighbor == node)
+                     * (1 + 1e-9) + 1e-9)
+            choice = None
+            for neighbor, weight in arcs:
+                if neighbor == node:
+                    known = distance
+                elif neighbor in settled[0]:
+                    known = forward_distances[neighbor]
+                else:
+                    to_start = forward_top
+                    if neighbor in settled[1]:
+                        to_end = backward_distances[neighbor]
+                    else:
+                        to_end = backward_top
+                    to_start = max(to_start, best - backward_distances.get(neighbor, best))
+                    if to_start + to_end > bound or to_start + weight > limit:
+                        continue
+                    tied = True
+                    break
+                candidate = (known + weight, known, neighbor)
+                if choice is None or candidate < choice:
+                    choice = candidate
+            if tied:
+                break
+            distance, _, chosen = choice
+            if chosen != node:
+                path = self._unroll(forward_previous, chosen)
+            path.append(following)
+            node = following
+            following = previous[1][following]
+
+        if not tied:
+            self._record_counters(expanded + stale, stale, expanded, relaxed, peak_queue)
+            return path, distance
+
+        # Several routes may be equally short, and the meeting point need
+        # not lie on the one Dijkstra would pick. To return exactly the same
+        # path, resume the forward search (so ties are broken in the same
+        # pop order) and only expand nodes that the backward labels show can
+        # still lie on a shortest route.
+        backward_settled = settled[1]
+
+        if end not in settled[0]:
+            while forward_queue:
+                current_distance, current = heapq.heappop(forward_queue)
+
+                if current_distance > forward_distances[current]:
+                    stale += 1
+                    continue
+
+                if current in backward_settled:
+                    remaining = backward_distances[current]
+                else:
+                    remaining = backward_top
+                if current_distance + remaining > bound:
+                    pruned += 1
+                    continue
+
+                expanded += 1
+                if current == end:
+                    break
+                if (cancel is not None and expanded % CANCEL_CHECK_INTERVAL == 0
+                        and cancel.is_set()):
+                    self._record_counters(expanded + stale + pruned, stale, expanded,
+                                          relaxed, peak_queue)
+                    return None, float('inf')
+
+                first, last = offsets[current], offsets[current + 1]
+                for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                    distance = current_distance + weight
+
+                    if distance < forward_distances.get(neighbor, float('inf')):
+                        forward_distances[neighbor] = distance
+                        forward_previous[neighbor] = current
+                        heapq.heappush(forward_queue, (distance, neighbor))
+
+                relaxed += last - first
+
+        self._record_counters(expanded + stale + pruned, stale, expanded,
+                              relaxed, peak_queue)
+        return self._unroll(forward_previous, end), forward_distances[end]
+
+    def _resolve_ties(self, start, end, distance, remaining):
+        offsets, targets, weights = self._adjacency()
+
+        # Dijkstra from start that only expands nodes on a route of the given
+        # length to end, remaining(node) being the distance from node to
+        # end. It pops those nodes in the same order as _dijkstra, so where
+        # several routes are equally short it returns the same one, with the
+        # same distance. Returns (path ids, distance, search counters).
+        bound = distance * (1 + 1e-9) + 1e-9
+        distances = {start: 0.0}
+        previous = {start: -1}
+        queue = [(0.0, start)]
+        expanded = stale = pruned = relaxed = 0
+        peak_queue = 1
+
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > distances[current]:
+                stale += 1
+                continue
+            if current_distance + remaining(current) > bound:
+                pruned += 1
+                continue
+
+            expanded += 1
+            if current == end:
+                break
+
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                candidate = current_distance + weight
+                if candidate < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = candidate
+                    previous[neighbor] = current
+                    heapq.heappush(queue, (candidate, neighbor))
+
+            relaxed += last - first
+            if len(queue) > peak_queue:
+                peak_queue = len(queue)
+
+        counters = (expanded + stale + pruned, stale, expanded, relaxed, peak_queue)
+        return self._unroll(previous, end), distances[end], counters
 
     def visualize(self, path=None, ax=None, animate=False):
         """
@@ -452,6 +1967,8 @@ class DepartmentGraph:
         - ax: Matplotlib axis to draw on (if None, creates a new figure)
         - animate: Whether to animate the path drawing
         """
+        import matplotlib.pyplot as plt
+
         if ax is None:
             fig, ax = plt.subplots(figsize=(14, 12), facecolor='#f0f0f8')
             standalone = True
@@ -476,22 +1993,19 @@ class DepartmentGraph:
         ax.add_patch(title_bg)
 
         # Plot only door nodes and special nodes (not junctions)
-        for name, node in self.nodes.items():
-            # Skip all junction nodes
-            if "Junction" in name:
-                continue
+        for node_id in self.door_marker_ids():
+            name = self.node_names[node_id]
+            node = self.nodes[name]
 
             # Skip nodes that are part of the path (they'll be drawn later)
             if path and node in path:
                 continue
 
-            # Only draw door nodes, Main_Entrance, and Corridor nodes
-            if "door" in name or name == "Main_Entrance" or "Corridor" in name:
-                # Door nodes and special corridor nodes in yellow
-                ax.scatter(node.x, node.y, c='#ff9e00', edgecolor='white', linewidth=1,
-                           s=40, alpha=0.9, zorder=10)
-                # No text labels - show only the nodes
-                clickable_nodes[(node.x, node.y)] = name
+            # Door nodes and special corridor nodes in yellow
+            ax.scatter(node.x, node.y, c='#ff9e00', edgecolor='white', linewidth=1,
+                       s=40, alpha=0.9, zorder=10)
+            # No text labels - show only the nodes
+            clickable_nodes[(node.x, node.y)] = name
 
         # If a path is provided, highlight it
         if path:
@@ -577,6 +2091,1074 @@ class DepartmentGraph:
         plt.tight_layout()
         plt.show()
 
+    def visualize_reachable(self, source_name, max_distance, ax=None,
+                            profile=DEFAULT_PROFILE):
+        """
+        Shades the part of the map within max_distance of a named node:
+        every corridor is filled as far as the budget reaches along it, and
+        the doors within budget are highlighted.
+
+        Parameters:
+        - source_name: Name of the node to measure from
+        - max_distance: Distance budget
+        - ax: Matplotlib axis to draw on (if None, creates a new figure)
+        - profile: Name of the weight profile
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+
+        reached = self.distances_within(source_name, max_distance, profile)
+        if ax is None:
+            fig, ax = plt.subplots(figsize=(14, 12), facecolor='#f0f0f8')
+            standalone = True
+        else:
+            standalone = False
+
+        ax.set_facecolor('#f0f0f8')
+        ax.set_xticks([])
+        ax.set_yticks([])
+        ax.imshow(self.bg_img, extent=[0, 900, 0, 600], zorder=0)
+        title_bg = plt.Rectangle(
+            (0, 580), 900, 40, facecolor='#3a506b', alpha=0.7, zorder=30)
+        ax.add_patch(title_bg)
+
+        # Remaining budget at both ends of every edge, and how far along
+        # the edge it reaches from each end
+        edge_weights = self._profile_arrays(profile)[0]
+        distance = np.full(len(self.node_names), np.inf)
+        distance[list(reached)] = list(reached.values())
+        x0 = self.node_x[self.edge_u]
+        y0 = self.node_y[self.edge_u]
+        x1 = self.node_x[self.edge_v]
+        y1 = self.node_y[self.edge_v]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            from_u = np.clip((max_distance - distance[self.edge_u]) / edge_weights, 0, 1)
+            from_v = np.clip((max_distance - distance[self.edge_v]) / edge_weights, 0, 1)
+        from_u = np.nan_to_num(from_u)
+        from_v = np.nan_to_num(from_v)
+        segments = []
+        for fraction, (ax0, ay0, bx, by) in ((from_u, (x0, y0, x1, y1)),
+                                             (from_v, (x1, y1, x0, y0))):
+            shaded = fraction > 0
+            segments.append(np.stack([
+                np.column_stack([ax0[shaded], ay0[shaded]]),
+                np.column_stack([ax0[shaded] + (bx[shaded] - ax0[shaded]) * fraction[shaded],
+                                 ay0[shaded] + (by[shaded] - ay0[shaded]) * fraction[shaded]]),
+            ], axis=1))
+        ax.add_collection(LineCollection(np.concatenate(segments), colors='#06d6a0',
+                                         linewidths=14, alpha=0.35, capstyle='round',
+                                         zorder=5))
+
+        # Doors in budget in green, the others in the usual yellow
+        for name, node in self.nodes.items():
+            if "Junction" in name or not self.is_clickable(name):
+                continue
+            inside = self.node_ids[name] in reached
+            ax.scatter(node.x, node.y, c='#06d6a0' if inside else '#ff9e00',
+                       edgecolor='white', linewidth=1, s=60 if inside else 40,
+                       alpha=0.9, zorder=10)
+
+        source = self.nodes[source_name]
+        ax.scatter(source.x, source.y, c='#7209b7', edgecolor='white', linewidth=1.5,
+                   s=250, marker='*', zorder=30)
+        ax.set_title(f"Within {max_distance:.0f} of "
+                     f"{source_name.replace('_door', '').replace('_', ' ')}",
+                     fontsize=18, color='white', fontweight='bold', pad=10)
+
+        if standalone:
+            ax.grid(False)
+            plt.tight_layout()
+            plt.show()
+
+
+def _cell_range(cells):
+    # Smallest and largest occupied cell coordinates, used to clip queries
+    if not cells:
+        return 0, 0, -1, -1
+    cells_x = [cell[0] for cell in cells]
+    cells_y = [cell[1] for cell in cells]
+    return min(cells_x), min(cells_y), max(cells_x), max(cells_y)
+
+
+class SearchStats:
+    """Work done by a single find_shortest_path query."""
+
+    def __init__(self):
+        self.method = None
+        self.start = None
+        self.end = None
+        self.distance = float('inf')
+        self.cache_hit = False
+        self.popped = 0  # Queue entries popped
+        self.stale = 0  # Popped entries skipped because a shorter distance was known
+        self.expanded = 0  # Nodes whose edges were relaxed
+        self.relaxed = 0  # Edges looked at while expanding nodes
+        self.peak_queue = 0  # Largest priority queue size
+        self.wall_time = 0.0  # Seconds
+        self.profile = DEFAULT_PROFILE
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        if self.cache_hit:
+            return f"{self.method}: cache hit in {self.wall_time * 1000:.3f} ms"
+        return (f"{self.method}: {self.expanded} nodes expanded, "
+                f"{self.relaxed} edges relaxed, {self.stale} stale entries, "
+                f"peak queue {self.peak_queue}, {self.wall_time * 1000:.3f} ms")
+
+
+class WeightProfile:
+    """
+    A named way to weight the edges, e.g. for visitors who cannot use
+    stairs.
+
+    Profile weights are derived from the base edge weights (straight-line
+    length times the connection factor) and the edge flags: edges with any
+    of the closed flags are left out, and the weight of an edge with a flag
+    in factors is multiplied by that factor.
+    """
+
+    def __init__(self, name, closed=0, factors=None):
+        self.name = name
+        self.closed = closed
+        self.factors = dict(factors or {})  # EDGE_* flag: multiplier
+
+    @property
+    def min_factor(self):
+        return min([1.0, *self.factors.values()])
+
+    def edge_weights(self, base, flags):
+        """Profile weights for arrays of base weights and edge flags."""
+        weights = np.array(base, dtype=np.float64)
+        flags = np.asarray(flags)
+        for flag, factor in self.factors.items():
+            weights[(flags & flag) != 0] *= factor
+        weights[(flags & self.closed) != 0] = np.inf
+        return weights
+
+    def __repr__(self):
+        return f"WeightProfile({self.name!r})"
+
+
+WEIGHT_PROFILES = {
+    DEFAULT_PROFILE: WeightProfile(DEFAULT_PROFILE),
+    'no_stairs': WeightProfile('no_stairs', closed=EDGE_STAIRS),
+    'visitor': WeightProfile('visitor', closed=EDGE_STAFF_ONLY),
+    'accessible': WeightProfile('accessible', closed=EDGE_STAIRS | EDGE_STAFF_ONLY),
+}
+
+
+class SpatialGrid:
+    """
+    Uniform grid over a set of points for nearest-point and box queries.
+
+    Points are bucketed by grid cell and stored sorted by cell, so a query
+    only looks at the cells that overlap its search area instead of
+    scanning every point.
+    """
+
+    def __init__(self, xs, ys, ids, cell_size):
+        self.cell_size = float(cell_size)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        ids = np.asarray(ids, dtype=np.int64)
+
+        cells_x = np.floor(xs / self.cell_size).astype(np.int64)
+        cells_y = np.floor(ys / self.cell_size).astype(np.int64)
+        order = np.lexsort((cells_y, cells_x))
+        self.xs = xs[order]
+        self.ys = ys[order]
+        self.ids = ids[order]
+
+        # (cell x, cell y): (first, last) slice into the sorted points
+        cells = np.stack([cells_x[order], cells_y[order]], axis=1)
+        self.cells = {}
+        if len(cells):
+            starts = np.flatnonzero(np.any(np.diff(cells, axis=0), axis=1)) + 1
+            bounds = np.concatenate([[0], starts, [len(cells)]]).tolist()
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                key = (int(cells[first, 0]), int(cells[first, 1]))
+                self.cells[key] = (first, last)
+        self.cell_range = _cell_range(self.cells)
+
+    def _candidates(self, x0, y0, x1, y1):
+        # Indices of the sorted points in every cell that overlaps the box
+        size = self.cell_size
+        min_x, min_y, max_x, max_y = self.cell_range
+        slices = []
+        for cell_x in range(max(math.floor(x0 / size), min_x),
+                            min(math.floor(x1 / size), max_x) + 1):
+            for cell_y in range(max(math.floor(y0 / size), min_y),
+                                min(math.floor(y1 / size), max_y) + 1):
+                bounds = self.cells.get((cell_x, cell_y))
+                if bounds is not None:
+                    slices.append(np.arange(*bounds))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def nearest(self, x, y, radius):
+        """Returns the id of the closest point within radius, or None."""
+        candidates = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        if len(candidates) == 0:
+            return None
+        distances = np.hypot(self.xs[candidates] - x, self.ys[candidates] - y)
+        best = int(np.argmin(distances))
+        if distances[best] >= radius:
+            return None
+        return int(self.ids[candidates[best]])
+
+    def in_box(self, x0, y0, x1, y1):
+        """Returns the ids of all points inside the box, in no particular order."""
+        candidates = self._candidates(x0, y0, x1, y1)
+        xs = self.xs[candidates]
+        ys = self.ys[candidates]
+        inside = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+        return self.ids[candidates[inside]].tolist()
+
+
+class SegmentGrid:
+    """
+    Uniform grid over line segments (the graph's edges) for snapping an
+    arbitrary point onto the nearest one.
+
+    Each segment is listed in every cell its bounding box touches. A query
+    looks at the cells around the point, projects the point onto those
+    segments with NumPy, and widens the search only if nothing is close.
+    """
+
+    def __init__(self, x0, y0, x1, y1, ids, cell_size):
+        self.cell_size = float(cell_size)
+        self.x0 = np.asarray(x0, dtype=np.float64)
+        self.y0 = np.asarray(y0, dtype=np.float64)
+        self.x1 = np.asarray(x1, dtype=np.float64)
+        self.y1 = np.asarray(y1, dtype=np.float64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+        # Cell range covered by each segment's bounding box
+        size = self.cell_size
+        first_x = np.floor(np.minimum(self.x0, self.x1) / size).astype(np.int64)
+        last_x = np.floor(np.maximum(self.x0, self.x1) / size).astype(np.int64)
+        first_y = np.floor(np.minimum(self.y0, self.y1) / size).astype(np.int64)
+        last_y = np.floor(np.maximum(self.y0, self.y1) / size).astype(np.int64)
+        span_y = last_y - first_y + 1
+        counts = (last_x - first_x + 1) * span_y
+
+        # One (cell, segment) entry per covered cell, sorted by cell
+        segments = np.repeat(np.arange(len(self.ids)), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        local = np.arange(len(segments)) - starts
+        cells_x = first_x[segments] + local // span_y[segments]
+        cells_y = first_y[segments] + local % span_y[segments]
+        order = np.lexsort((cells_y, cells_x))
+        self.entries = segments[order]
+        cells_x = cells_x[order]
+        cells_y = cells_y[order]
+
+        self.cells = {}
+        if len(order):
+            changes = np.flatnonzero((np.diff(cells_x) != 0) | (np.diff(cells_y) != 0)) + 1
+            bounds = np.concatenate([[0], changes, [len(order)]]).tolist()
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                self.cells[(int(cells_x[first]), int(cells_y[first]))] = (first, last)
+        self.cell_range = _cell_range(self.cells)
+
+    def _candidates(self, x0, y0, x1, y1):
+        size = self.cell_size
+        min_x, min_y, max_x, max_y = self.cell_range
+        slices = []
+        for cell_x in range(max(math.floor(x0 / size), min_x),
+                            min(math.floor(x1 / size), max_x) + 1):
+            for cell_y in range(max(math.floor(y0 / size), min_y),
+                                min(math.floor(y1 / size), max_y) + 1):
+                bounds = self.cells.get((cell_x, cell_y))
+                if bounds is not None:
+                    slices.append(self.entries[bounds[0]:bounds[1]])
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(slices))
+
+    def nearest(self, x, y, max_distance=float('inf')):
+        """
+        Projects (x, y) onto the nearest segment.
+
+        Returns (segment id, t, snapped x, snapped y, distance), where t is
+        the position along the segment from 0 at (x0, y0) to 1 at (x1, y1),
+        or None if no segment is within max_distance.
+        """
+        radius = self.cell_size
+        while True:
+            reach = min(radius, max_distance)
+            candidates = self._candidates(x - reach, y - reach, x + reach, y + reach)
+            if len(candidates):
+                x0 = self.x0[candidates]
+                y0 = self.y0[candidates]
+                dx = self.x1[candidates] - x0
+                dy = self.y1[candidates] - y0
+                length_squared = dx * dx + dy * dy
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    t = ((x - x0) * dx + (y - y0) * dy) / length_squared
+                t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+                snapped_x = x0 + t * dx
+                snapped_y = y0 + t * dy
+                distances = np.hypot(snapped_x - x, snapped_y - y)
+                best = int(np.argmin(distances))
+
+                # Segments outside the searched cells are further away than
+                # reach, so a match within reach is the true nearest one
+                if distances[best] <= reach:
+                    return (int(self.ids[candidates[best]]), float(t[best]),
+                            float(snapped_x[best]), float(snapped_y[best]),
+                            float(distances[best]))
+            if reach >= max_distance or not self.cells:
+                return None
+            radius *= 2
+
+
+class RouteCache:
+    """
+    Bounded least-recently-used cache of routes keyed by
+    (start, end, weight profile).
+
+    Edges are undirected, so a route is stored once per unordered pair and
+    a cached A -> B route also answers B -> A. Entries are tagged with the
+    graph version they were computed for; a lookup with a newer version
+    empties the cache first.
+    """
+
+    def __init__(self, max_size=ROUTE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # (low id, high id, profile): (path, distance)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    def get(self, version, start, end, profile):
+        """Returns (path ids, distance) or None on a miss. A cached
+        unreachable pair is returned as (None, inf)."""
+        self._check_version(version)
+        key = (start, end, profile) if start <= end else (end, start, profile)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        path, distance = entry
+        if path is not None and path[0] != start:
+            path = path[::-1]
+        return path, distance
+
+    def put(self, version, start, end, profile, path, distance):
+        self._check_version(version)
+        if self.max_size <= 0:
+            return
+        key = (start, end, profile) if start <= end else (end, start, profile)
+        self.entries[key] = (path, distance)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def repair(self, old_version, new_version, affected):
+        """
+        Carries the cache over to a new graph version, dropping the entries
+        for which affected(profile, path ids, distance) is true.
+        """
+        if self.version != old_version:
+            return
+        for key in [key for key, (path, distance) in self.entries.items()
+                    if affected(key[2], path, distance)]:
+            del self.entries[key]
+        self.version = new_version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class RouteTable:
+    """
+    All-pairs shortest path distances and predecessors for a DepartmentGraph.
+
+    Row s holds the shortest path tree rooted at node s: distances[s, t] is
+    the length of the route from s to t, and predecessors[s, t] is the node
+    just before t on it (-1 for s itself and for unreachable nodes), so any
+    route is unrolled backwards from its destination without searching.
+    """
+
+    def __init__(self, graph_hash, distances, predecessors, profile=DEFAULT_PROFILE):
+        self.graph_hash = graph_hash
+        self.distances = distances
+        self.predecessors = predecessors
+        self.profile = profile
+
+    @classmethod
+    def build(cls, graph, profile=DEFAULT_PROFILE):
+        """Builds the table with one full Dijkstra tree per node, using the
+        weights of the named profile."""
+        graph_hash = graph.graph_hash()
+        num_nodes = len(graph.node_names)
+        distances = np.full((num_nodes, num_nodes), np.inf)
+        predecessors = np.full((num_nodes, num_nodes), -1, dtype=np.int32)
+
+        table = cls(graph_hash, distances, predecessors, profile)
+        for source in range(num_nodes):
+            table._fill_row(graph, source)
+        return table
+
+    def repair(self, graph, u, v, old_weight, new_weight):
+        """
+        Updates the table after the weight of edge u - v changed (the
+        weights given are the ones in the table's profile), touching
+        only the rows (shortest path trees) that the change can affect and,
+        within them, only the nodes whose route changes. Returns the number
+        of rows repaired.
+
+        A heavier edge only matters to the trees that use it: the subtree
+        below it is cut off and regrown from the rest of the tree. A
+        lighter edge only matters where a route over it is now shorter:
+        the improvement is pushed outwards from the edge.
+        """
+        offsets, targets, weights = graph._adjacency(self.profile)
+        if new_weight > old_weight:
+            predecessors = self.predecessors
+            uses_uv = predecessors[:, v] == u
+            rows = np.flatnonzero(uses_uv | (predecessors[:, u] == v))
+            # The end of the edge further from the source roots the
+            # subtree that has to be regrown
+            below = np.where(uses_uv[rows], v, u).tolist()
+            for source, root in zip(rows.tolist(), below):
+                self._regrow(source, root, offsets, targets, weights)
+        else:
+            to_u = self.distances[:, u]
+            to_v = self.distances[:, v]
+            rows = np.flatnonzero((to_u + new_weight < to_v) | (to_v + new_weight < to_u))
+            for source in rows.tolist():
+                distances = self.distances[source].data
+                if distances[u] + new_weight < distances[v]:
+                    self._improve(source, v, u, distances[u] + new_weight,
+                                  offsets, targets, weights)
+                else:
+                    self._improve(source, u, v, distances[v] + new_weight,
+                                  offsets, targets, weights)
+
+        self.graph_hash = graph.graph_hash()
+        return len(rows)
+
+    def _regrow(self, source, root, offsets, targets, weights):
+        # Dijkstra over the subtree below root, seeded from the neighbours
+        # of its nodes in the part of the tree that is still valid
+        distances = self.distances[source].data
+        predecessors = self.predecessors[source].data
+        nodes = [root]
+        for node in nodes:
+            first, last = offsets[node], offsets[node + 1]
+            nodes.extend(child for child in targets[first:last]
+                         if predecessors[child] == node)
+        members = set(nodes)
+        for node in nodes:
+            distances[node] = float('inf')
+            predecessors[node] = -1
+
+        queue = []
+        for node in nodes:
+            best, parent = float('inf'), -1
+            first, last = offsets[node], offsets[node + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                if neighbor not in members and distances[neighbor] + weight < best:
+                    best, parent = distances[neighbor] + weight, neighbor
+            if parent != -1:
+                distances[node] = best
+                predecessors[node] = parent
+                queue.append((best, node))
+        heapq.heapify(queue)
+
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > distances[current]:
+                continue
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                distance = current_distance + weight
+                if neighbor in members and distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    predecessors[neighbor] = current
+                    heapq.heappush(queue, (distance, neighbor))
+
+    def _improve(self, source, node, parent, distance, offsets, targets, weights):
+        # Dijkstra from node with its new, shorter distance, following only
+        # the nodes whose distance improves
+        distances = self.distances[source].data
+        predecessors = self.predecessors[source].data
+        distances[node] = distance
+        predecessors[node] = parent
+        queue = [(distance, node)]
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > distances[current]:
+                continue
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                distance = current_distance + weight
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    predecessors[neighbor] = current
+                    heapq.heappush(queue, (distance, neighbor))
+
+    def _fill_row(self, graph, source):
+        tree_distances, tree_previous = graph._dijkstra(source, profile=self.profile)
+        self.distances[source] = np.inf
+        self.predecessors[source] = -1
+        reached = np.fromiter(tree_distances.keys(), dtype=np.int64,
+                              count=len(tree_distances))
+        self.distances[source, reached] = np.fromiter(
+            tree_distances.values(), dtype=np.float64,
+            count=len(tree_distances))
+        self.predecessors[source, reached] = np.fromiter(
+            (tree_previous[node] for node in tree_distances),
+            dtype=np.int32, count=len(tree_distances))
+
+    def save(self, path):
+        # Written next to the target and renamed over it, so an interrupted
+        # or concurrent save never leaves a truncated table behind
+        temporary_path = f"{path}.tmp{os.getpid()}"
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, graph_hash=np.array(self.graph_hash),
+                     distances=self.distances, predecessors=self.predecessors)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data['graph_hash']), data['distances'],
+                       data['predecessors'])
+
+    def distance(self, start, end):
+        return float(self.distances[start, end])
+
+    def route(self, start, end):
+        """Returns (list of node ids, distance), or (None, inf) if unreachable."""
+        distance = float(self.distances[start, end])
+        if distance == float('inf'):
+            return None, distance
+
+        predecessors = self.predecessors[start]
+        path = [end]
+        current = end
+        while current != start:
+            current = int(predecessors[current])
+            path.append(current)
+        path.reverse()
+        return path, distance
+
+
+class ZoneOverlay:
+    """
+    Overlay graph for hierarchical routing between zones (floors, wings,
+    buildings).
+
+    A boundary node has an edge to a node in another zone. For every zone
+    the overlay holds the shortest distance inside the zone between each
+    pair of its boundary nodes, next to the edges that cross between
+    zones. A query searches the full graph only inside the zones of its
+    start and destination; everywhere else it moves over the overlay, so
+    its cost grows with the number of boundary nodes rather than with the
+    size of every floor on the way.
+    """
+
+    def __init__(self, graph):
+        graph.freeze()
+        self.graph = graph
+        self.version = graph.version
+        node_zone = graph.node_zone
+
+        sources = np.repeat(np.arange(len(graph.node_names)), np.diff(graph.offsets))
+        crossing = node_zone[sources] != node_zone[graph.targets]
+        boundary = np.unique(sources[crossing]).tolist()
+        self.boundary_by_zone = {}
+        for node in boundary:
+            self.boundary_by_zone.setdefault(int(node_zone[node]), []).append(node)
+
+        # overlay[b]: list of (neighbour, weight) leaving boundary node b;
+        # paths[(b, c)]: the route inside their zone between boundary nodes
+        self.overlay = {}
+        self.paths = {}
+        for zone in self.boundary_by_zone:
+            self._build_zone(zone)
+
+        self.num_boundary_nodes = len(boundary)
+        self.num_zones = len(graph.zone_names)
+
+    def _build_zone(self, zone):
+        offsets, targets, weights = self.graph._adjacency()
+        zone_of = self.graph.node_zone.data
+        nodes = self.boundary_by_zone[zone]
+        for node in nodes:
+            self.overlay[node] = []
+            first, last = offsets[node], offsets[node + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                if zone_of[neighbor] != zone:
+                    self.overlay[node].append((neighbor, weight))
+
+            distances, previous = self._zone_tree(node, zone, set(nodes))
+            for other in nodes:
+                self.paths.pop((node, other), None)
+                if other != node and other in distances:
+                    self.overlay[node].append((other, distances[other]))
+                    self.paths[node, other] = self.graph._unroll(previous, other)
+
+    def repair(self, u, v):
+        """Updates the overlay after the weight of edge u - v changed,
+        recomputing only the zones at its two ends."""
+        zone_of = self.graph.node_zone
+        for zone in {int(zone_of[u]), int(zone_of[v])}:
+            if zone in self.boundary_by_zone:
+                self._build_zone(zone)
+        self.version = self.graph.version
+
+    def _zone_tree(self, start, zone, wanted):
+        # Dijkstra from start that never leaves its zone
+        offsets, targets, weights = self.graph._adjacency()
+        zone_of = self.graph.node_zone.data
+        remaining = set(wanted)
+        distances = {start: 0.0}
+        previous = {start: -1}
+        queue = [(0.0, start)]
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > distances[current]:
+                continue
+            remaining.discard(current)
+            if not remaining:
+                break
+            first, last = offsets[current], offsets[current + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                if zone_of[neighbor] != zone:
+                    continue
+                distance = current_distance + weight
+                if distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = distance
+                    previous[neighbor] = current
+                    heapq.heappush(queue, (distance, neighbor))
+        return distances, previous
+
+    def route(self, start, end):
+        """
+        Returns (list of node ids, distance), or (None, inf) if unreachable,
+        followed by the search counters.
+        """
+        offsets, targets, weights = self.graph._adjacency()
+        zone_of = self.graph.node_zone.data
+        local = {zone_of[start], zone_of[end]}
+        overlay = self.overlay
+
+        # Dijkstra that uses the real edges inside the start and destination
+        # zones and the overlay edges in every other zone. Other zones are
+        # only ever entered at a boundary node, so the overlay covers them.
+        distances = {start: 0.0}
+        previous = {start: -1}
+        queue = [(0.0, start)]
+        expanded = stale = relaxed = 0
+        peak_queue = 1
+
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > distances[current]:
+                stale += 1
+                continue
+
+            expanded += 1
+            if current == end:
+                break
+
+            if zone_of[current] in local:
+                first, last = offsets[current], offsets[current + 1]
+                arcs = zip(targets[first:last], weights[first:last])
+            else:
+                arcs = overlay[current]
+            for neighbor, weight in arcs:
+                distance = current_distance + weight
+                relaxed += 1
+                if distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = distance
+                    previous[neighbor] = current
+                    heapq.heappush(queue, (distance, neighbor))
+
+            if len(queue) > peak_queue:
+                peak_queue = len(queue)
+
+        counters = (expanded + stale, stale, expanded, relaxed, peak_queue)
+        if end not in distances:
+            return None, float('inf'), counters
+
+        # Expand each overlay edge inside a zone into its route
+        path = [start]
+        hops = self.graph._unroll(previous, end)
+        for u, v in zip(hops, hops[1:]):
+            if zone_of[u] == zone_of[v] and zone_of[u] not in local:
+                path.extend(self.paths[u, v][1:])
+            else:
+                path.append(v)
+        return path, distances[end], counters
+
+
+class EvacuationTable:
+    """
+    Nearest exit of every node, from one multi-source Dijkstra that starts
+    from all exits at once.
+
+    For node n, exit_index[n] is the position in exits of its nearest open
+    exit (-1 if none can be reached), distances[n] the distance to it and
+    next_hop[n] the next node on the way there (-1 at the exit itself and
+    for unreachable nodes), so a sign at n only needs its own row.
+    Blocking or reopening an exit repairs only the nodes it changes.
+    """
+
+    def __init__(self, node_names, exits, exit_index, next_hop, distances,
+                 blocked=None, profile=DEFAULT_PROFILE):
+        self.node_names = node_names
+        self.exits = list(exits)  # Exit node ids
+        self.exit_index = exit_index
+        self.next_hop = next_hop
+        self.distances = distances
+        self.blocked = np.zeros(len(self.exits), dtype=bool) if blocked is None else blocked
+        self.profile = profile
+        self.version = None  # Graph version the table was computed for
+
+    @classmethod
+    def build(cls, graph, exit_names, profile=DEFAULT_PROFILE):
+        exits = graph._node_id_list(exit_names)
+        if not exits:
+            raise ValueError("An evacuation table needs at least one exit")
+        if len(exits) > np.iinfo(np.int16).max:
+            raise ValueError("Too many exits for an evacuation table")
+        num_nodes = len(graph.node_names)
+        table = cls(graph.node_names, exits,
+                    np.full(num_nodes, -1, dtype=np.int16),
+                    np.full(num_nodes, -1, dtype=np.int32),
+                    np.full(num_nodes, np.inf), profile=profile)
+        table._fill(graph)
+        return table
+
+    def _fill(self, graph):
+        # One Dijkstra seeded with every open exit. The tree's predecessor
+        # of a node is its next hop towards the exit, and every queue entry
+        # carries the exit it leads to, so a node takes its exit from the
+        # entry that settles it, however distances tie.
+        self.exit_index[:] = -1
+        self.next_hop[:] = -1
+        self.distances[:] = np.inf
+        self._settle(graph, [(0.0, exit, -1, index) for index, exit in enumerate(self.exits)
+                             if not self.blocked[index]])
+        self.version = graph.version
+
+    def _check_graph(self, graph):
+        # Recomputes the table if the graph changed since it was filled
+        if self.version != graph.version:
+            self.node_names = graph.node_names
+            num_nodes = len(graph.node_names)
+            if len(self.distances) != num_nodes:
+                self.exit_index = np.full(num_nodes, -1, dtype=np.int16)
+                self.next_hop = np.full(num_nodes, -1, dtype=np.int32)
+                self.distances = np.full(num_nodes, np.inf)
+            self._fill(graph)
+
+    def _exit_positions(self, graph, exit_name):
+        positions = [index for index, exit in enumerate(self.exits)
+                     if exit == graph.node_ids.get(exit_name)]
+        if not positions:
+            raise ValueError(f"Not an exit of this table: {exit_name}")
+        return positions
+
+    def block_exit(self, graph, exit_name):
+        """
+        Takes an exit out of use. Only the nodes that were led to it are
+        recomputed: they are regrown from their neighbours that keep their
+        exit. Returns the number of nodes whose entry changed.
+        """
+        self._check_graph(graph)
+        positions = [index for index in self._exit_positions(graph, exit_name)
+                     if not self.blocked[index]]
+        if not positions:
+            return 0
+        self.blocked[positions] = True
+        affected = np.flatnonzero(np.isin(self.exit_index, positions))
+        self.exit_index[affected] = -1
+        self.next_hop[affected] = -1
+        self.distances[affected] = np.inf
+
+        # The best way into the affected region from outside it; no other
+        # node's route went through it, as it would have led to the same exit
+        offsets, targets, weights = graph._adjacency(self.profile)
+        region = set(affected.tolist())
+        queue = []
+        for node in region:
+            first, last = offsets[node], offsets[node + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                if neighbor not in region and self.exit_index[neighbor] >= 0:
+                    queue.append((self.distances[neighbor] + weight, node, neighbor,
+                                  int(self.exit_index[neighbor])))
+        self._settle(graph, queue, region)
+        return len(region)
+
+    def unblock_exit(self, graph, exit_name):
+        """
+        Puts a blocked exit back in use, growing its region from the exit
+        over every node that is now closer to it than to its old exit.
+        Returns the number of nodes whose entry changed.
+        """
+        self._check_graph(graph)
+        positions = [index for index in self._exit_positions(graph, exit_name)
+                     if self.blocked[index]]
+        if not positions:
+            return 0
+        self.blocked[positions] = False
+        return self._settle(graph, [(0.0, self.exits[positions[0]], -1, positions[0])])
+
+    def _settle(self, graph, queue, region=None):
+        # Dijkstra from (distance, node, next hop, exit index) entries that
+        # only ever lowers distances, inside region if one is given
+        offsets, targets, weights = graph._adjacency(self.profile)
+        distances = self.distances
+        heapq.heapify(queue)
+        changed = 0
+        while queue:
+            distance, node, hop, exit = heapq.heappop(queue)
+            if distance >= distances[node]:
+                continue
+            distances[node] = distance
+            self.next_hop[node] = hop
+            self.exit_index[node] = exit
+            changed += 1
+            first, last = offsets[node], offsets[node + 1]
+            for neighbor, weight in zip(targets[first:last], weights[first:last]):
+                if region is not None and neighbor not in region:
+                    continue
+                candidate = distance + weight
+                if candidate < distances[neighbor]:
+                    heapq.heappush(queue, (candidate, neighbor, node, exit))
+        return changed
+
+    def nearest_exit(self, node):
+        """Node id of the nearest open exit of a node id, or None."""
+        index = self.exit_index[node]
+        return None if index < 0 else self.exits[index]
+
+    def route(self, node):
+        """Returns (list of node ids to the nearest exit, distance), or
+        (None, inf) if no exit can be reached."""
+        if self.exit_index[node] < 0:
+            return None, float('inf')
+        path = [node]
+        while self.next_hop[path[-1]] != -1:
+            path.append(int(self.next_hop[path[-1]]))
+        return path, float(self.distances[node])
+
+    def save(self, path):
+        """
+        Writes the compact table signage controllers load: EVACUATION_MAGIC,
+        then the number of nodes, exits and name bytes as little-endian
+        uint32, followed by the arrays in this order:
+
+        - exits: int32 node id per exit
+        - blocked: uint8 per exit
+        - exit_index: int16 per node (-1 if no exit can be reached)
+        - next_hop: int32 per node (-1 at exits and unreachable nodes)
+        - distance: float32 per node
+        - name_offsets: uint32 per node plus one, into the name bytes
+        - name bytes: the UTF-8 node names, concatenated
+        """
+        encoded = [name.encode("utf-8") for name in self.node_names]
+        name_offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        name_bytes = b"".join(encoded)
+        arrays = (
+            np.asarray(self.exits, dtype='<i4'),
+            self.blocked.astype(np.uint8),
+            self.exit_index.astype('<i2'),
+            self.next_hop.astype('<i4'),
+            self.distances.astype('<f4'),
+            name_offsets,
+        )
+        with open(path, "wb") as file:
+            file.write(EVACUATION_MAGIC)
+            file.write(np.array([len(encoded), len(self.exits), len(name_bytes)],
+                                dtype='<u4').tobytes())
+            for array in arrays:
+                file.write(array.tobytes())
+            file.write(name_bytes)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        if data[:len(EVACUATION_MAGIC)] != EVACUATION_MAGIC:
+            raise ValueError(f"{path} is not an evacuation table")
+        position = len(EVACUATION_MAGIC)
+        num_nodes, num_exits, num_name_bytes = np.frombuffer(
+            data, dtype='<u4', count=3, offset=position).tolist()
+        position += 12
+
+        def take(dtype, count):
+            nonlocal position
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+            position += array.nbytes
+            return array
+
+        exits = take('<i4', num_exits).tolist()
+        blocked = take(np.uint8, num_exits).astype(bool)
+        exit_index = take('<i2', num_nodes).astype(np.int16)
+        next_hop = take('<i4', num_nodes).astype(np.int32)
+        distances = take('<f4', num_nodes).astype(np.float64)
+        name_offsets = take('<u4', num_nodes + 1).tolist()
+        name_bytes = data[position:position + num_name_bytes]
+        node_names = [name_bytes[name_offsets[i]:name_offsets[i + 1]].decode("utf-8")
+                      for i in range(num_nodes)]
+        return cls(node_names, exits, exit_index, next_hop, distances, blocked)
+
+
+class RouteJob:
+    """A route being computed for the interactive map on the routing worker."""
+
+    def __init__(self, future, cancel):
+        self.future = future
+        self.cancel = cancel  # threading.Event, set to stop the search early
+        self.timer = None  # Canvas timer that polls for the result
+
+
+class BlitManager:
+    """
+    Redraws the dynamic artists of the interactive map over a cached copy
+    of its static layer.
+
+    Every full draw of the canvas saves the rendered figure without the
+    artists added here (the background image, door markers and panels),
+    then draws them on top. update() restores that copy and draws only the
+    dynamic artists, so a click or hover costs the same however large the
+    map is and however many doors it has.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.background = None
+        self.artists = []
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, artist):
+        """Draws artist with the dynamic layer from now on and returns it."""
+        artist.set_animated(True)
+        self.artists.append(artist)
+        return artist
+
+    def remove(self, *artists):
+        """Takes artists off the dynamic layer and out of their axes."""
+        for artist in artists:
+            self.artists.remove(artist)
+            artist.remove()
+
+    def update(self):
+        """Shows the current state of the dynamic artists."""
+        if self.background is None or not self.canvas.supports_blit:
+            # Nothing cached yet; the full draw saves the static layer
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def restore(self, bbox=None):
+        """Puts the cached static layer back on the canvas, within bbox or everywhere."""
+        if self.background is None or not self.canvas.supports_blit:
+            return
+        if bbox is None:
+            self.canvas.restore_region(self.background)
+        else:
+            # restore_region counts rows from the top of the canvas, and
+            # the saved region starts at its top left corner
+            height = self.canvas.figure.bbox.height
+            self.canvas.restore_region(
+                self.background, (bbox.x0, height - bbox.y1, bbox.x1, height - bbox.y0),
+                (0, 0))
+
+    def _on_draw(self, event):
+        # A finished or paused FuncAnimation clears the animated flag of the
+        # artists it drew, so this draw included them in the static layer
+        stale = [artist for artist in self.artists if not artist.get_animated()]
+        if stale:
+            for artist in stale:
+                artist.set_animated(True)
+            self.canvas.draw_idle()
+            return
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        figure = self.canvas.figure
+        for artist in sorted(self.artists, key=lambda artist: artist.get_zorder()):
+            figure.draw_artist(artist)
+
+
+class PathAnimation:
+    """
+    Geometry of every frame of the route animation, computed once per path.
+
+    The route grows at a constant speed, step map units per frame, spread
+    over at most max_frames frames so long routes do not take longer to
+    show. Frame f draws the first reached[f] nodes of the path followed by
+    the point (head_x[f], head_y[f]) on the segment it is crossing, and
+    the first labels_reached[f] junction labels.
+    """
+
+    def __init__(self, path, step=ANIMATION_STEP, max_frames=ANIMATION_MAX_FRAMES):
+        self.xs = np.array([node.x for node in path], dtype=np.float64)
+        self.ys = np.array([node.y for node in path], dtype=np.float64)
+
+        # Distance along the path at every node and at every frame
+        along = np.zeros(len(path))
+        np.cumsum(np.hypot(np.diff(self.xs), np.diff(self.ys)), out=along[1:])
+        self.num_frames = min(max(math.ceil(along[-1] / step), 1), max_frames) + 1
+        distances = np.linspace(0.0, along[-1], self.num_frames)
+        self.reached = np.searchsorted(along, distances, side='right')
+        self.head_x = np.interp(distances, along, self.xs)
+        self.head_y = np.interp(distances, along, self.ys)
+
+        # Junctions are labelled with their number, e.g. "J17"
+        junctions = [index for index, node in enumerate(path) if "Junction" in node.name]
+        self.labels = ["J" + (path[index].name.split('_')[1] if '_' in path[index].name else '')
+                       for index in junctions]
+        self.label_offsets = np.column_stack((self.xs[junctions], self.ys[junctions]))
+        self.labels_reached = np.searchsorted(junctions, self.reached)
+
+    @property
+    def offsets(self):
+        """The nodes of the path as an (n, 2) array of map coordinates."""
+        return np.column_stack((self.xs, self.ys))
+
+    def line(self, frame):
+        """x and y coordinates of the route drawn at frame."""
+        count = self.reached[frame]
+        return (np.append(self.xs[:count], self.head_x[frame]),
+                np.append(self.ys[:count], self.head_y[frame]))
+
 
 class NavigationSystem:
     def __init__(self):
@@ -586,30 +3168,133 @@ class NavigationSystem:
             "_door", "") for name, node in self.graph.nodes.items() if "door" in name]
         self.available_rooms.append("Main Entrance")
 
+        # Room-to-room queries are answered from the precomputed route table,
+        # which is loaded from disk when it matches the current graph
+        self.graph.prepare_route_table()
+        self.search_method = "table"
+        self.profile = DEFAULT_PROFILE  # Weight profile, e.g. "no_stairs"
+        # Routes shown on the interactive map, including the shortest one
+        self.alternative_routes = ALTERNATIVE_ROUTES
+
         # For the interactive mode
         self.interactive_mode = False
         self.selected_start = None
         self.selected_end = None
         self.current_animation = None  # Store animation reference
+        # Routing worker of the interactive mode and its current RouteJob
+        self._executor = None
+        self._route_job = None
+
+    def start_route(self, start_node, end_node):
+        """
+        Starts computing the route between two nodes, with its alternatives,
+        on the routing worker thread and returns its RouteJob. A job that is
+        still running is cancelled first, so only the newest request counts:
+        the "dijkstra", "astar" and "bidirectional" searches and the
+        alternatives stop within CANCEL_CHECK_INTERVAL expanded nodes, while
+        the other methods are short enough to run to the end. The worker is
+        the only thread that searches the graph.
+        """
+        self.cancel_route()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1,
+                                                thread_name_prefix="routing")
+        cancel = threading.Event()
+        future = self._executor.submit(self._compute_route, start_node, end_node, cancel)
+        self._route_job = RouteJob(future, cancel)
+        return self._route_job
+
+    def cancel_route(self):
+        """Cancels the current RouteJob, if any."""
+        job = self._route_job
+        if job is None:
+            return
+        job.cancel.set()
+        job.future.cancel()
+        if job.timer is not None:
+            job.timer.stop()
+        self._route_job = None
+
+    def _compute_route(self, start_node, end_node, cancel):
+        # Runs on the routing worker. Returns (path, distance, stats,
+        # alternatives), or None once cancelled.
+        if cancel.is_set():
+            return None
+        stats = SearchStats()
+        path, distance = self.graph.find_shortest_path(
+            start_node, end_node, method=self.search_method,
+            stats=stats, profile=self.profile, cancel=cancel)
+        alternatives = []
+        if path and self.alternative_routes > 1 and not cancel.is_set():
+            alternatives = self.graph.k_shortest_paths(
+                start_node, end_node, self.alternative_routes,
+                profile=self.profile, cancel=cancel)[1:]
+        if cancel.is_set():
+            return None
+        return path, distance, stats, alternatives
 
     def display_available_rooms(self):
         print("\nAvailable Rooms:")
         for i, room in enumerate(sorted(self.available_rooms), 1):
             print(f"{i}. {room}")
 
-    def navigate(self, start_room, end_room, animate=False):
+    @staticmethod
+    def room_node_name(room):
+        """Maps a room name such as "Room 106", "Room_106" or "Main Entrance"
+        to the name of its graph node."""
         # Handle Main Entrance as a special case
-        if start_room == "Main Entrance":
-            start_node = "Main_Entrance"
-        else:
-            start_node = f"{start_room}_door"
+        if room in ("Main Entrance", "Main_Entrance"):
+            return "Main_Entrance"
+        name = room.strip().replace(" ", "_")
+        if name.endswith("_door"):
+            return name
+        return f"{name}_door"
+
+    def route(self, start_room, end_room, stats=None):
+        """
+        Finds the route between two rooms without printing or drawing
+        anything, so it never needs matplotlib or the floor plan image.
+        Pass a SearchStats as stats to record the work the search did.
 
-        if end_room == "Main Entrance":
-            end_node = "Main_Entrance"
-        else:
-            end_node = f"{end_room}_door"
+        Returns (list of node names, distance), or (None, inf) if there is
+        no route or a room is unknown.
+        """
+        path, distance = self.graph.find_shortest_path(
+            self.room_node_name(start_room), self.room_node_name(end_room),
+            method=self.search_method, stats=stats, profile=self.profile)
+        if path is None:
+            return None, float('inf')
+        return [node.name for node in path], distance
+
+    def alternatives(self, start_room, end_room, k=None):
+        """
+        Finds up to k loopless routes between two rooms, shortest first
+        (default: self.alternative_routes), without printing or drawing
+        anything.
 
-        path, distance = self.graph.find_shortest_path(start_node, end_node)
+        Returns a list of (list of node names, distance) pairs.
+        """
+        routes = self.graph.k_shortest_paths(
+            self.room_node_name(start_room), self.room_node_name(end_room),
+            k or self.alternative_routes, profile=self.profile)
+        return [([node.name for node in path], distance) for path, distance in routes]
+
+    def doors_within(self, room, max_distance):
+        """
+        Every door (and the Main Entrance) within max_distance of a room,
+        without printing or drawing anything.
+
+        Returns a list of (node name, distance) pairs, nearest first.
+        """
+        return self.graph.doors_within(self.room_node_name(room), max_distance,
+                                       self.profile)
+
+    def navigate(self, start_room, end_room, animate=False):
+        start_node = self.room_node_name(start_room)
+        end_node = self.room_node_name(end_room)
+
+        path, distance = self.graph.find_shortest_path(
+            start_node, end_node, method=self.search_method, profile=self.profile)
 
         if path is None:
             print(f"No path found between {start_room} and {end_room}")
@@ -635,6 +3320,14 @@ class NavigationSystem:
 
     def run_interactive_mode(self):
         """Run the interactive click-based mode for selecting rooms with improved UI."""
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+        from matplotlib.collections import PathCollection
+        from matplotlib.colors import to_rgba
+        from matplotlib.font_manager import FontProperties
+        from matplotlib.textpath import TextPath
+        from matplotlib.transforms import Affine2D
+
         self.interactive_mode = True
         self.selected_start = None
         self.selected_end = None
@@ -653,66 +3346,111 @@ class NavigationSystem:
         ax_side = fig.add_subplot(gs[0:20, 16:20], facecolor='#e7ecef')
         ax_side.axis('off')
 
-        # Create dictionary mapping locations to their nodes
-        clickable_nodes = {}
+        # Static layer: map background, door markers and title bar. It is
+        # drawn once; afterwards only the dynamic artists are blitted on top
+        ax_map.imshow(self.graph.bg_img, extent=[0, 900, 0, 600])
 
-        # Function to reset the current view without creating a new window
-        def reset_view(event=None):
-            # Clear any active animation
-            if self.current_animation is not None:
-                self.current_animation = None
+        # Style improvements for better readability
+        ax_map.set_xticks([])
+        ax_map.set_yticks([])
 
-            # Clear the main map axis
-            ax_map.clear()
+        # Add a title background for better appearance
+        title_bg = plt.Rectangle(
+            (0, 580), 900, 40, facecolor='#3a506b', alpha=0.7, zorder=30)
+        ax_map.add_patch(title_bg)
 
-            # Update the side panel
-            ax_side.clear()
-            ax_side.axis('off')
+        # Door nodes, Main_Entrance and Corridor nodes in yellow, no junctions
+        doors = self.graph.door_marker_ids()
+        ax_map.scatter(self.graph.node_x[doors], self.graph.node_y[doors],
+                       c='#ff9e00', edgecolor='white', linewidth=1,
+                       s=40, alpha=0.9, zorder=10)
 
-            # Add side panel title and instructions
-            ax_side.text(0.5, 0.95, "Navigation\nSystem", fontsize=18, fontweight='bold',
-                         ha='center', va='top', color='#2b2d42')
+        # Add side panel title and instructions
+        ax_side.text(0.5, 0.95, "Navigation\nSystem", fontsize=18, fontweight='bold',
+                     ha='center', va='top', color='#2b2d42')
 
-            # Reset the selection state
-            self.selected_start = None
-            self.selected_end = None
+        blit = BlitManager(fig.canvas)
 
-            # Redraw the background and nodes
-            ax_map.imshow(self.graph.bg_img, extent=[0, 900, 0, 600])
+        # Map title, redrawn whenever the selection changes
+        ax_map.set_title("Click to select START location",
+                         fontsize=18, color='white', fontweight='bold', pad=10)
+        blit.add(ax_map.title)
 
-            # Style improvements for better readability
-            ax_map.set_xticks([])
-            ax_map.set_yticks([])
+        # Status text in side panel
+        status_text = blit.add(ax_side.text(
+            0.5, 0.35, "", fontsize=12, fontweight='bold',
+            ha='center', va='center', color='#2b2d42',
+            bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.5')))
+
+        # Search statistics of the last route in side panel
+        stats_text = blit.add(ax_side.text(0.5, 0.55, "", fontsize=10,
+                                           ha='center', va='center', color='#2b2d42'))
+
+        # Tooltip showing the name of the node under the mouse
+        tooltip = blit.add(ax_map.annotate(
+            "", xy=(0, 0), xytext=(12, 12), textcoords='offset points',
+            fontsize=10, color='#2b2d42', zorder=40, visible=False,
+            bbox=dict(facecolor='white', alpha=0.9, edgecolor='#3a506b',
+                      boxstyle='round,pad=0.3')))
+        hover = {'name': None}
+
+        # Markers and route lines of the current selection
+        selection = []
+
+        # Junction labels are drawn as glyph outlines centred on the node,
+        # in points; a Text artist per label would take about a millisecond
+        # to draw in every frame of the animation
+        label_font = FontProperties(size=8, weight='bold')
+        label_paths = {}
+
+        def label_path(text):
+            if text not in label_paths:
+                glyphs = TextPath((0, 0), text, prop=label_font)
+                extents = glyphs.get_extents()
+                label_paths[text] = glyphs.transformed(Affine2D().translate(
+                    -(extents.x0 + extents.x1) / 2, -(extents.y0 + extents.y1) / 2))
+            return label_paths[text]
+
+        def mark_node(name, label, color):
+            node = self.graph.nodes[name]
+            selection.append(blit.add(ax_map.scatter(
+                node.x, node.y, c=color, edgecolor='white', linewidth=1.5,
+                s=250, marker='*', zorder=30)))
+            selection.append(blit.add(ax_map.text(
+                node.x, node.y - 40, label, color='white', fontweight='bold',
+                horizontalalignment='center', verticalalignment='center', fontsize=12,
+                bbox=dict(facecolor=color, alpha=0.9, edgecolor='white',
+                          boxstyle='round,pad=0.3'),
+                zorder=35)))
+
+        def stop_animation():
+            # A finished animation has already stopped its timer
+            if self.current_animation is not None:
+                if self.current_animation.event_source is not None:
+                    self.current_animation.pause()
+                self.current_animation = None
 
-            # Add a title background for better appearance
-            title_bg = plt.Rectangle(
-                (0, 580), 900, 40, facecolor='#3a506b', alpha=0.7, zorder=30)
-            ax_map.add_patch(title_bg)
+        # Function to reset the current view without creating a new window
+        def reset_view(event=None):
+            # Drop a route that is still being computed
+            self.cancel_route()
 
-            # Clear the clickable_nodes dictionary before repopulating
-            clickable_nodes.clear()
+            # Clear any active animation
+            stop_animation()
 
-            # Plot only door nodes and special nodes (not junctions)
-            for name, node in self.graph.nodes.items():
-                # Skip all junction nodes
-                if "Junction" in name:
-                    continue
+            # Remove the markers and route of the last selection
+            blit.remove(*selection)
+            selection.clear()
 
-                # Only draw door nodes, Main_Entrance, and Corridor nodes
-                if "door" in name or name == "Main_Entrance" or "Corridor" in name:
-                    # Door nodes and special corridor nodes in yellow
-                    ax_map.scatter(node.x, node.y, c='#ff9e00', edgecolor='white', linewidth=1,
-                                   s=40, alpha=0.9, zorder=10)
-                    # No text labels - show only the nodes
-                    clickable_nodes[(node.x, node.y)] = name
+            # Reset the selection state
+            self.selected_start = None
+            self.selected_end = None
 
             ax_map.set_title("Click to select START location",
                              fontsize=18, color='white', fontweight='bold', pad=10)
-
-            fig.canvas.draw()
-
-        # Initial setup
-        reset_view()
+            status_text.set_text("")
+            stats_text.set_text("")
+            blit.update()
 
         # Add interactive buttons to side panel
         button_width = 0.3  # Further reduced width
@@ -730,19 +3468,143 @@ class NavigationSystem:
                                       facecolor='#e7ecef')
 
         def exit_app(event):
+            self.cancel_route()
             # Clear any active animation
-            if self.current_animation is not None:
-                self.current_animation = None
+            stop_animation()
             plt.close(fig)
 
         exit_button = plt.Button(
             exit_button_ax, 'Exit', color='#f1faee', hovercolor='#e63946')
         exit_button.on_clicked(exit_app)
 
-        # Status text in side panel
-        status_text = ax_side.text(0.5, 0.35, "", fontsize=12, fontweight='bold',
-                                   ha='center', va='center', color='#2b2d42',
-                                   bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.5'))
+        # Routes are computed on a worker thread so the window never
+        # freezes; a canvas timer polls for the result and draws it here
+        def request_route(start_node, end_node):
+            job = self.start_route(start_node, end_node)
+
+            def poll():
+                if not job.future.done():
+                    return
+                job.timer.stop()
+                if job is not self._route_job or job.future.cancelled():
+                    return
+                result = job.future.result()
+                if result is not None:
+                    show_route(start_node, end_node, *result)
+
+            job.timer = fig.canvas.new_timer(interval=ROUTE_POLL_INTERVAL)
+            job.timer.add_callback(poll)
+            job.timer.start()
+
+        def show_route(start_node, end_node, path, distance, stats, alternatives):
+            start_display_name = start_node.replace("_door", "").replace("_", " ")
+            end_display_name = end_node.replace("_door", "").replace("_", " ")
+
+            if path:
+                # Update side panel with path info and search work
+                alternative_lines = "".join(
+                    f"\nAlternative {number}: {alternative_distance:.0f}"
+                    for number, (_, alternative_distance)
+                    in enumerate(alternatives, start=1))
+                status_text.set_text(
+                    f"Start: {start_display_name}\nEnd: {end_display_name}\n"
+                    f"Distance: {distance:.0f}{alternative_lines}\nShowing route...")
+                stats_text.set_text(
+                    f"Search: {stats.method}\n"
+                    f"Expanded: {stats.expanded} nodes\n"
+                    f"Relaxed: {stats.relaxed} edges\n"
+                    f"Time: {stats.wall_time * 1000:.2f} ms")
+
+                # Format title
+                title = f"Path from {start_display_name} to {end_display_name}"
+                ax_map.set_title(
+                    title, fontsize=18, color='white', fontweight='bold', pad=10)
+
+                # Alternative routes as dashed lines under the main route
+                for number, (alternative, _) in enumerate(alternatives):
+                    selection.extend(blit.add(artist) for artist in ax_map.plot(
+                        [node.x for node in alternative],
+                        [node.y for node in alternative],
+                        linewidth=3, linestyle='--', alpha=0.8, zorder=15,
+                        color=ALTERNATIVE_COLORS[number % len(ALTERNATIVE_COLORS)]))
+
+                # Per-frame geometry of the route animation
+                frames = PathAnimation(path)
+
+                # Create empty line for animation with a solid color
+                line, = ax_map.plot([], [], linewidth=5, alpha=0.9, zorder=20,
+                                    solid_capstyle='round', color='#e94560')
+
+                # Nodes the route has reached: doors in yellow, junctions in
+                # light blue and other rooms in blue, all in one collection
+                styles = [('#ff9e00', 1.0, 1.5, 100) if "door" in node.name
+                          else ('#4cc9f0', 0.8, 1.0, 80) if "Junction" in node.name
+                          else ('#4361ee', 1.0, 1.5, 100) for node in path]
+                node_offsets = frames.offsets
+                nodes = ax_map.scatter(
+                    frames.xs, frames.ys, zorder=25,
+                    c=[to_rgba(color, alpha) for color, alpha, _, _ in styles],
+                    edgecolors=[to_rgba('white', alpha) for _, alpha, _, _ in styles],
+                    linewidths=[width for _, _, width, _ in styles],
+                    s=[size for _, _, _, size in styles])
+
+                # Junction numbers, as glyph outlines in one collection
+                paths = [label_path(text) for text in frames.labels]
+                labels = PathCollection(
+                    paths, offsets=frames.label_offsets,
+                    offset_transform=ax_map.transData,
+                    transform=Affine2D().scale(1 / 72) + fig.dpi_scale_trans,
+                    facecolor='black', edgecolor='none', zorder=26)
+                ax_map.add_collection(labels, autolim=False)
+
+                for artist in (line, nodes, labels):
+                    selection.append(blit.add(artist))
+                # Every frame redraws the same artists
+                frame_artists = (*selection, tooltip)
+                self._animation_completed = False
+
+                def update(frame):
+                    # Start from the static layer of the map
+                    blit.restore(ax_map.bbox)
+
+                    line.set_data(*frames.line(frame))
+                    nodes.set_offsets(node_offsets[:frames.reached[frame]])
+                    count = frames.labels_reached[frame]
+                    labels.set_paths(paths[:count])
+                    labels.set_offsets(frames.label_offsets[:count])
+
+                    if frame == frames.num_frames - 1:
+                        self._animation_completed = True
+                    return frame_artists
+
+                def clear_route():
+                    # Initial state: nothing of the route is drawn yet
+                    line.set_data([], [])
+                    nodes.set_offsets(node_offsets[:0])
+                    labels.set_paths([])
+                    labels.set_offsets(frames.label_offsets[:0])
+                    return frame_artists
+
+                clear_route()
+                self.current_animation = animation.FuncAnimation(
+                    fig, update, frames=frames.num_frames, init_func=clear_route,
+                    interval=ANIMATION_INTERVAL, blit=True, repeat=False)
+
+                # The animation starts with the next draw of the canvas
+                fig.canvas.draw_idle()
+            else:
+                print(
+                    f"No path found between {start_display_name} and {end_display_name}")
+                # Restore the map view, which also resets the selection to
+                # let the user try again
+                reset_view()
+                ax_map.set_title("No path found. Click to select START room",
+                                 fontsize=16, color='white', fontweight='bold', pad=10)
+
+                # Update side panel status
+                status_text.set_text(
+                    "Error: No path found\nPlease try again")
+                blit.update()
 
         # Define function to handle clicks with improved visual feedback
         def on_click(event):
@@ -752,16 +3614,14 @@ class NavigationSystem:
             x, y = event.xdata, event.ydata
 
             # Find the closest node to the click
-            closest_node = None
-            min_distance = float('inf')
-
-            for (node_x, node_y), node_name in clickable_nodes.items():
-                distance = np.sqrt((x - node_x)**2 + (y - node_y)**2)
-                if distance < min_distance and distance < 30:  # Click must be within 30 units
-                    min_distance = distance
-                    closest_node = node_name
+            closest_node = self.graph.nearest_node(x, y, CLICK_RADIUS)
 
             if closest_node:
+                # A click after both ends are chosen starts a new selection
+                # and cancels the route if it is still being computed
+                if self.selected_end is not None:
+                    reset_view()
+
                 if self.selected_start is None:
                     self.selected_start = closest_node
                     display_name = closest_node.replace(
@@ -774,16 +3634,8 @@ class NavigationSystem:
                         f"Start: {display_name}\nEnd: Not Selected")
 
                     # Highlight the selected start node with better visual
-                    start_node = self.graph.nodes[closest_node]
-                    ax_map.scatter(start_node.x, start_node.y, c='#06d6a0', edgecolor='white', linewidth=1.5,
-                                   s=250, marker='*', zorder=30)
-                    ax_map.text(start_node.x, start_node.y - 40, "START", color='white', fontweight='bold',
-                                horizontalalignment='center', verticalalignment='center', fontsize=12,
-                                bbox=dict(facecolor='#06d6a0', alpha=0.9, edgecolor='white',
-                                          boxstyle='round,pad=0.3'),
-                                zorder=35)
-
-                    fig.canvas.draw()
+                    mark_node(closest_node, "START", '#06d6a0')
+                    blit.update()
 
                 elif self.selected_end is None and closest_node != self.selected_start:
                     self.selected_end = closest_node
@@ -795,181 +3647,35 @@ class NavigationSystem:
                     # Update side panel status
                     status_text.set_text(
                         f"Start: {start_display_name}\nEnd: {end_display_name}\nCalculating path...")
-                    fig.canvas.draw()
-
-                    # Clear the figure for the new path with a small delay for UI feedback
-                    time.sleep(0.5)  # Brief delay for UI feedback
-                    ax_map.clear()
-
-                    # Display the navigation path
-                    start_room = self.selected_start.replace(
-                        "_door", "").replace("_", " ")
-                    end_room = self.selected_end.replace(
-                        "_door", "").replace("_", " ")
-
-                    # Handle Main Entrance as a special case
-                    if start_room == "Main Entrance":
-                        start_node = "Main_Entrance"
-                    else:
-                        start_node = self.selected_start
-
-                    if end_room == "Main Entrance":
-                        end_node = "Main_Entrance"
-                    else:
-                        end_node = self.selected_end
-
-                    path, distance = self.graph.find_shortest_path(
-                        start_node, end_node)
-
-                    if path:
-                        # Update side panel with path info
-                        status_text.set_text(
-                            f"Start: {start_display_name}\nEnd: {end_display_name}\nShowing route...")
-
-                        # Use animation instead of static display
-                        # Create a new axis for the map instead of reusing existing one
-                        ax_map.clear()
-
-                        # Plot map background
-                        ax_map.imshow(self.graph.bg_img,
-                                      extent=[0, 900, 0, 600])
-                        ax_map.set_xticks([])  # Remove ticks
-                        ax_map.set_yticks([])  # Remove ticks
-
-                        # Add a title background
-                        title_bg = plt.Rectangle(
-                            (0, 580), 900, 40, facecolor='#3a506b', alpha=0.7, zorder=30)
-                        ax_map.add_patch(title_bg)
-
-                        # Don't use the visualize method to draw the path line
-                        # as it was creating a direct line between visible nodes
-                        # Instead, we'll only use it to set up the map and draw door nodes
-                        # The actual path will be drawn by the animation function
-                        self.graph.visualize(None, ax=ax_map, animate=False)
-
-                        # Update the title
-                        ax_map.set_title(f"Path from {start_display_name} to {end_display_name}",
-                                         fontsize=18, color='white', fontweight='bold', pad=10)
-
-                        # Format title
-                        title = f"Path from {start_room} to {end_room}"
-                        ax_map.set_title(
-                            title, fontsize=18, color='white', fontweight='bold', pad=10)
-
-                        # Prepare path coordinates for animation
-                        path_x = [node.x for node in path]
-                        path_y = [node.y for node in path]
-
-                        # Create empty line for animation with a solid color
-                        line, = ax_map.plot([], [], linewidth=5, alpha=0.9, zorder=20,
-                                            solid_capstyle='round', color='#e94560')
-
-                        # Make sure the line is empty at the beginning and set flag
-                        line.set_data([], [])
-                        self._animation_completed = False
-
-                        # Modified animation update function with completion tracking
-                        def update(num):
-                            # Draw the path up to this segment
-                            if num > 0:  # Need at least 2 points to make a line
-                                # Update the line data with increasing portions of the path
-                                line.set_data(path_x[:num+1], path_y[:num+1])
-
-                                # Highlight the node we just reached
-                                if num < len(path):
-                                    node = path[num]
-                                    if "door" in node.name:
-                                        ax_map.scatter(node.x, node.y, c='#ff9e00', edgecolor='white', linewidth=1.5,
-                                                       s=100, alpha=1.0, zorder=25)
-                                    elif "Junction" in node.name:
-                                        # Show junction nodes when they're part of the path with proper highlighting
-                                        ax_map.scatter(node.x, node.y, c='#4cc9f0', edgecolor='white', linewidth=1.0,
-                                                       s=80, alpha=0.8, zorder=25)
-
-                                        # Extract junction number for cleaner labels
-                                        junction_num = node.name.split(
-                                            '_')[1] if '_' in node.name else ''
-                                        label_text = f"J{junction_num}"
-
-                                        # Add text label with junction number
-                                        ax_map.text(node.x, node.y, label_text, color='black',
-                                                    fontweight='bold', fontsize=8,
-                                                    horizontalalignment='center', verticalalignment='center',
-                                                    zorder=26)
-                                    elif not "Junction" in node.name:
-                                        ax_map.scatter(node.x, node.y, c='#4361ee', edgecolor='white', linewidth=1.5,
-                                                       s=100, alpha=1.0, zorder=25)
-
-                            # Mark animation as completed on last frame
-                            if num == len(path) - 1:
-                                self._animation_completed = True
-                                # Ensure the full path is visible
-                                line.set_data(path_x, path_y)
-
-                                # Draw all special nodes in the path
-                                for node in path:
-                                    if "door" in node.name:
-                                        ax_map.scatter(node.x, node.y, c='#ff9e00', edgecolor='white', linewidth=1.5,
-                                                       s=100, alpha=1.0, zorder=25)
-                                    elif "Junction" in node.name:
-                                        # Show junction nodes when they're part of the path with proper highlighting
-                                        ax_map.scatter(node.x, node.y, c='#4cc9f0', edgecolor='white', linewidth=1.0,
-                                                       s=80, alpha=0.8, zorder=25)
-
-                                        # Extract junction number for cleaner labels
-                                        junction_num = node.name.split(
-                                            '_')[1] if '_' in node.name else ''
-                                        label_text = f"J{junction_num}"
-
-                                        # Add text label with junction number
-                                        ax_map.text(node.x, node.y, label_text, color='black',
-                                                    fontweight='bold', fontsize=8,
-                                                    horizontalalignment='center', verticalalignment='center',
-                                                    zorder=26)
-                                    elif not "Junction" in node.name:
-                                        ax_map.scatter(node.x, node.y, c='#4361ee', edgecolor='white', linewidth=1.5,
-                                                       s=100, alpha=1.0, zorder=25)
-
-                            return (line,)
-
-                        # Create the animation - use Matplotlib's robust approach to prevent issues
-                        self.current_animation = animation.FuncAnimation(
-                            fig, update, frames=len(path), interval=300,
-                            blit=True, repeat=False)
-
-                        # Define a function to run when animation completes
-                        def on_animation_complete(event=None):
-                            # Explicitly redraw the full path
-                            line.set_data(path_x, path_y)
-                            # Manually trigger a redraw
-                            fig.canvas.draw_idle()
-
-                        # Add event to be triggered after the last frame (estimated time)
-                        timer = fig.canvas.new_timer(
-                            interval=300 * len(path) + 100)
-                        timer.add_callback(on_animation_complete)
-                        timer.start()
-
-                        # Force a draw to ensure animation starts
-                        fig.canvas.draw()
-                    else:
-                        print(
-                            f"No path found between {start_room} and {end_room}")
-                        # Reset selection to let the user try again
-                        self.selected_start = None
-                        self.selected_end = None
-                        ax_map.set_title("No path found. Click to select START room",
-                                         fontsize=16, color='white', fontweight='bold', pad=10)
-
-                        # Update side panel status
-                        status_text.set_text(
-                            "Error: No path found\nPlease try again")
-
-                        # Restore map view
-                        reset_view()
-
-        # Connect the click event to the figure
+                    mark_node(closest_node, "END", '#7209b7')
+                    blit.update()
+
+                    # The search runs on the routing worker; show_route
+                    # draws the result once the canvas timer picks it up
+                    request_route(self.selected_start, self.selected_end)
+
+        # Show the name of the node under the mouse
+        def on_move(event):
+            name = None
+            if event.inaxes is ax_map:
+                name = self.graph.nearest_node(
+                    event.xdata, event.ydata, CLICK_RADIUS)
+            if name == hover['name']:
+                return
+            hover['name'] = name
+
+            if name is None:
+                tooltip.set_visible(False)
+            else:
+                node = self.graph.nodes[name]
+                tooltip.xy = (node.x, node.y)
+                tooltip.set_text(name.replace("_door", "").replace("_", " "))
+                tooltip.set_visible(True)
+            blit.update()
+
+        # Connect the click and hover events to the figure
         cid = fig.canvas.mpl_connect('button_press_event', on_click)
+        fig.canvas.mpl_connect('motion_notify_event', on_move)
 
         # Add a title to the window
         fig.canvas.manager.set_window_title('Department Navigation System')
@@ -978,15 +3684,184 @@ class NavigationSystem:
         plt.subplots_adjust(left=0.02, right=0.98, top=0.98, bottom=0.02)
         plt.show()
 
+        # Stop the routing worker
+        self.cancel_route()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
         # Reset interactive mode
         self.interactive_mode = False
         self.selected_start = None
         self.selected_end = None
 
 
-if __name__ == "__main__":
-    # Set a modern matplotlib style
-    plt.style.use('ggplot')
+def route(start_room, end_room, method=None, stats=None, profile=DEFAULT_PROFILE):
+    """
+    Headless routing entry point: returns (list of node names, distance)
+    between two rooms without importing matplotlib or loading the map.
+
+    Parameters:
+    - method: Search method passed to find_shortest_path (default: the
+      precomputed route table)
+    - stats: Optional SearchStats to fill in
+    - profile: Name of the weight profile, e.g. "no_stairs"
+    """
+    nav_system = NavigationSystem()
+    if method is not None:
+        nav_system.search_method = method
+    nav_system.profile = profile
+    return nav_system.route(start_room, end_room, stats=stats)
+
+
+def alternatives(start_room, end_room, k=ALTERNATIVE_ROUTES, profile=DEFAULT_PROFILE):
+    """
+    Headless entry point for alternative routes: returns up to k
+    (list of node names, distance) pairs between two rooms, shortest first.
+    """
+    nav_system = NavigationSystem()
+    nav_system.profile = profile
+    return nav_system.alternatives(start_room, end_room, k)
+
+
+def doors_within(room, max_distance, profile=DEFAULT_PROFILE):
+    """
+    Headless reachability query: returns the (node name, distance) pairs of
+    every door within max_distance of a room, nearest first.
+    """
+    nav_system = NavigationSystem()
+    nav_system.profile = profile
+    return nav_system.doors_within(room, max_distance)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Department Navigation System. Without a command the "
+                    "interactive map is opened.")
+    subparsers = parser.add_subparsers(dest="command")
+    route_parser = subparsers.add_parser(
+        "route", help="print the route between two rooms without opening the map")
+    route_parser.add_argument("start", help='start room, e.g. "Library"')
+    route_parser.add_argument("end", help='destination room, e.g. "Room 106"')
+    route_parser.add_argument("--method", default=None,
+                              choices=SEARCH_METHODS,
+                              help="search method (default: table)")
+    route_parser.add_argument("--profile", default=DEFAULT_PROFILE,
+                              choices=sorted(WEIGHT_PROFILES),
+                              help=f"weight profile (default: {DEFAULT_PROFILE})")
+    route_parser.add_argument("--alternatives", type=int, default=1, metavar="K",
+                              help="also print the next K - 1 shortest loopless routes")
+    route_parser.add_argument("--stats", action="store_true",
+                              help="print the work done by the search")
+    within_parser = subparsers.add_parser(
+        "within", help="list the rooms within a distance of a room")
+    within_parser.add_argument("room", help='room to measure from, e.g. "Seminar Hall"')
+    within_parser.add_argument("distance", type=float, help="distance budget in map units")
+    within_parser.add_argument("--profile", default=DEFAULT_PROFILE,
+                               choices=sorted(WEIGHT_PROFILES),
+                               help=f"weight profile (default: {DEFAULT_PROFILE})")
+    within_parser.add_argument("--map", action="store_true",
+                               help="also shade the reachable area on the map")
+    evacuation_parser = subparsers.add_parser(
+        "evacuation", help="export the nearest-exit table for signage controllers")
+    evacuation_parser.add_argument("-o", "--output", default=EVACUATION_FILE,
+                                   help=f"table file (default: {EVACUATION_FILE})")
+    evacuation_parser.add_argument("--block", nargs="*", default=[], metavar="EXIT",
+                                   help="exits to leave out of use")
+    evacuation_parser.add_argument("--profile", default=DEFAULT_PROFILE,
+                                   choices=sorted(WEIGHT_PROFILES),
+                                   help=f"weight profile (default: {DEFAULT_PROFILE})")
+    subparsers.add_parser("rooms", help="list the available rooms")
+    compile_parser = subparsers.add_parser(
+        "compile", help="compile the building definition into a graph snapshot")
+    compile_parser.add_argument("definition", nargs="?", default=BUILDING_FILE,
+                                help=f"building definition (default: {BUILDING_FILE})")
+    compile_parser.add_argument("-o", "--output", default=None,
+                                help="snapshot file (default: definition name "
+                                     "with a .graph extension)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        output = args.output or os.path.splitext(args.definition)[0] + '.graph'
+        try:
+            graph = compile_building(args.definition, output)
+        except ValueError as error:
+            print(f"Invalid building definition: {error}")
+            return 1
+        print(f"Compiled {len(graph.node_names)} nodes and "
+              f"{len(graph.edge_u)} edges into {output}")
+        return 0
+
+    if args.command == "route":
+        stats = SearchStats() if args.stats else None
+        try:
+            path, distance = route(args.start, args.end, args.method, stats,
+                                   args.profile)
+        except ValueError as error:
+            print(error)
+            return 1
+        if stats is not None:
+            print(f"Search: {stats}")
+        if path is None:
+            # Tell a route the profile rules out apart from no route at all
+            closed = WEIGHT_PROFILES[args.profile].closed
+            if closed and route(args.start, args.end, args.method)[0] is not None:
+                avoided = " or ".join(f'"{name}"' for name, flag in EDGE_FLAGS.items()
+                                      if closed & flag)
+                print(f"No route between {args.start} and {args.end} for the "
+                      f"{args.profile} profile: every route uses an edge flagged {avoided}")
+            else:
+                print(f"No path found between {args.start} and {args.end}")
+            return 1
+        print(f"Distance: {distance:.1f}")
+        for name in path:
+            print(f"  → {name}")
+        if args.alternatives > 1:
+            routes = alternatives(args.start, args.end, args.alternatives, args.profile)
+            for number, (alternative, alternative_distance) in enumerate(routes[1:], start=1):
+                print(f"Alternative {number}: {alternative_distance:.1f}")
+                for name in alternative:
+                    print(f"  → {name}")
+        return 0
+
+    if args.command == "within":
+        nav_system = NavigationSystem()
+        nav_system.profile = args.profile
+        room = nav_system.room_node_name(args.room)
+        if room not in nav_system.graph.nodes:
+            print(f"Unknown room: {args.room}")
+            return 1
+        for name, distance in nav_system.doors_within(args.room, args.distance):
+            print(f"{distance:8.1f}  {name.replace('_door', '').replace('_', ' ')}")
+        if args.map:
+            nav_system.graph.visualize_reachable(room, args.distance, profile=args.profile)
+        return 0
+
+    if args.command == "evacuation":
+        graph = DepartmentGraph()
+        try:
+            table = graph.evacuation_table(profile=args.profile)
+            for exit_name in args.block:
+                table.block_exit(graph, exit_name)
+        except ValueError as error:
+            print(error)
+            return 1
+        table.save(args.output)
+        counts = np.bincount(table.exit_index[table.exit_index >= 0],
+                             minlength=len(table.exits))
+        for index, exit in enumerate(table.exits):
+            state = "blocked" if table.blocked[index] else f"{counts[index]} nodes"
+            print(f"  {graph.node_names[exit]}: {state}")
+        unreachable = int(np.count_nonzero(table.exit_index < 0))
+        if unreachable:
+            print(f"  No exit reachable from {unreachable} nodes")
+        print(f"Evacuation table written to {args.output} "
+              f"({os.path.getsize(args.output)} bytes)")
+        return 0
+
+    if args.command == "rooms":
+        NavigationSystem().display_available_rooms()
+        return 0
 
     # Create and run the navigation system
     nav_system = NavigationSystem()
@@ -994,3 +3869,8 @@ if __name__ == "__main__":
 
     print("Thank you for using the Department Navigation System!")
     # Program will exit when the interactive map window is closed
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+"""
+Route images drawn straight into the pixels of the floor plan.
+
+DepartmentGraph.visualize builds a whole matplotlib figure for every
+route, which takes far longer than finding the route. RasterRenderer
+draws the map area of that figure with NumPy instead. The background is
+resampled to the shape visualize shows it in, with the door markers and
+the title bar drawn on once. For each route it draws, on a copy of that
+layer:
+- the route line;
+- the rooms along the route;
+- the start and end stars with their START/END labels;
+- the "Path from X to Y" title.
+visualize puts the title above the map and the legend below it. The
+images only cover the map, so the title is written into the title bar
+instead and the legend is left out.
+It then encodes the pixels as a PNG file with zlib. The background is
+compressed once in bands of rows, so only the bands the route is drawn on
+are compressed again.
+
+Every shape is drawn from its distance to the pixel centres, which
+antialiases its edges the way Agg does. Markers and labels are drawn once
+as sprites and then only blended in. Marker sizes and line widths use the
+point sizes of visualize and the interactive map, converted with
+UNITS_PER_POINT.
+
+Usage:
+    python raster_renderer.py "Library" "Room 106" [-o route.png] [--width 900]
+"""
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from navigation_system import DEFAULT_PROFILE, WEIGHT_PROFILES, NavigationSystem
+
+# Map area in map units, as visualize shows it (extent=[0, 900, 0, 600])
+MAP_WIDTH = 900
+MAP_HEIGHT = 600
+# Map units per typographic point in visualize's 14 x 12 inch figure
+UNITS_PER_POINT = 0.95
+# Bottom edge of visualize's title bar, in map units
+TITLE_BAR_Y = 580
+# zlib level of the PNG data; 1 is the fastest
+PNG_COMPRESS_LEVEL = 1
+# Rows of the image compressed together. Bands the route does not touch
+# reuse the compressed rows of the background
+PNG_BAND_ROWS = 16
+
+# Marker styles, as in visualize: colour, area in points^2 like scatter's
+# s, and the width of the white edge in points
+DOOR_STYLE = ('#ff9e00', 40, 1.0)
+STOP_STYLE = ('#ff9e00', 60, 1.0)
+START_STYLE = ('#06d6a0', 150, 1.5)
+END_STYLE = ('#7209b7', 150, 1.5)
+# Route line of the interactive map: colour, width in points and opacity
+LINE_STYLE = ('#e94560', 5.0, 0.9)
+LABEL_FONT_SIZE = 12  # Points
+TITLE_FONT_SIZE = 14  # Points, small enough for the title bar
+LABEL_OFFSET = 40  # Map units between a star and its label below it
+
+# Outline of matplotlib's '*' marker with a size of one: a five-pointed
+# star around the origin, y pointing up
+_STAR_ANGLES = np.pi / 2 + np.arange(10) * np.pi / 5
+_STAR = np.column_stack((np.cos(_STAR_ANGLES), np.sin(_STAR_ANGLES))) \
+    * np.where(np.arange(10) % 2, 0.381966 * 0.5, 0.5)[:, None]
+
+
+def _rgb(color):
+    from matplotlib.colors import to_rgb
+    return np.array(to_rgb(color)) * 255.0
+
+
+def _segment_distance(px, py, x0, y0, x1, y1):
+    # Distance from the points (px, py) to the segment (x0, y0)-(x1, y1)
+    dx = x1 - x0
+    dy = y1 - y0
+    length = dx * dx + dy * dy
+    t = ((px - x0) * dx + (py - y0) * dy) / length if length else 0.0
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - x0 - t * dx, py - y0 - t * dy)
+
+
+def _polygon_distance(px, py, vertices):
+    # Signed distance from the points (px, py) to a closed polygon, negative
+    # inside it
+    shape = np.broadcast_shapes(np.shape(px), np.shape(py))
+    distance = np.full(shape, np.inf)
+    inside = np.zeros(shape, dtype=bool)
+    for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        distance = np.minimum(distance, _segment_distance(px, py, x0, y0, x1, y1))
+        # Crossing test: does a ray to the right of the point cross the edge
+        if y0 != y1:
+            crosses = ((y0 > py) != (y1 > py)) \
+                & (px < x0 + (py - y0) * (x1 - x0) / (y1 - y0))
+            inside ^= crosses
+    return np.where(inside, -distance, distance)
+
+
+def _blend(canvas, rows, cols, color, alpha):
+    # Paints color with opacity alpha over the pixels at rows, cols that
+    # lie inside the 8-bit canvas. Like Agg, every layer is rounded to
+    # 8 bits as it is drawn
+    height, width = canvas.shape[:2]
+    valid = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width) & (alpha > 0)
+    rows = rows[valid]
+    cols = cols[valid]
+    alpha = alpha[valid][:, None]
+    color = color[valid] if np.ndim(color) > 1 else color
+    pixels = canvas[rows, cols].astype(np.float64)
+    canvas[rows, cols] = pixels + (color - pixels) * alpha + 0.5
+
+
+def _window(half_width, half_height):
+    # Position of the pixel centres of a sprite relative to its centre, a
+    # pixel corner. The sprite reaches at least half_width and half_height
+    # from it, plus a pixel for the antialiased edge
+    size_x = int(np.ceil(half_width)) + 1
+    size_y = int(np.ceil(half_height)) + 1
+    return (np.arange(-size_x, size_x + 1)[None, :] + 0.5,
+            np.arange(-size_y, size_y + 1)[:, None] + 0.5)
+
+
+def _edged_shape(distance, edge_width, face, edge, alpha=1.0):
+    # Colour and coverage of a filled shape with an edge of edge_width
+    # centred on its outline, from the signed distance to the outline
+    outer = np.clip(edge_width / 2 + 0.5 - distance, 0.0, 1.0)
+    inner = np.clip(-edge_width / 2 + 0.5 - distance, 0.0, 1.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(outer > 0, inner / outer, 0.0)[..., None]
+    return face * share + edge * (1 - share), outer * alpha
+
+
+class RasterRenderer:
+    """
+    Draws route images of one graph with NumPy.
+
+    width is the width of the images in pixels; their height follows the
+    3:2 shape of the map. The default of 900 pixels is one pixel per map
+    unit.
+    """
+
+    def __init__(self, graph, width=MAP_WIDTH):
+        self.graph = graph
+        self.scale = width / MAP_WIDTH  # Pixels per map unit
+        self.point = UNITS_PER_POINT * self.scale  # Pixels per point
+        self._sprites = {}  # Markers and labels, drawn once
+
+        # Resample the floor plan to the output size (bilinear)
+        image = np.asarray(graph.bg_img, dtype=np.float64)[..., :3]
+        if graph.bg_img.dtype == np.uint8:
+            image = image / 255.0
+        height = round(MAP_HEIGHT * self.scale)
+        rows = (np.arange(height) + 0.5) * image.shape[0] / height - 0.5
+        cols = (np.arange(width) + 0.5) * image.shape[1] / width - 0.5
+        image = self._interpolate(image, np.clip(rows, 0, image.shape[0] - 1), axis=0)
+        image = self._interpolate(image, np.clip(cols, 0, image.shape[1] - 1), axis=1)
+        self.background = image * 255.0
+
+        # Title bar, as visualize draws it over the top of the map
+        bar = slice(0, round((MAP_HEIGHT - TITLE_BAR_Y) * self.scale))
+        self.background[bar] += (_rgb('#3a506b') - self.background[bar]) * 0.7
+        self.background = np.round(self.background).astype(np.uint8)
+
+        # Door nodes, Main_Entrance and Corridor nodes, as visualize draws them
+        doors = graph.door_marker_ids()
+        self._draw_sprite(self.background, graph.node_x[doors], graph.node_y[doors],
+                          self._disc(DOOR_STYLE, alpha=0.9))
+        self._bands = _deflate_bands(_filter_rows(self.background))
+
+    @staticmethod
+    def _interpolate(image, positions, axis):
+        below = np.floor(positions).astype(np.int64)
+        above = np.minimum(below + 1, image.shape[axis] - 1)
+        weight = positions - below
+        shape = [1, 1, 1]
+        shape[axis] = -1
+        weight = weight.reshape(shape)
+        return (np.take(image, below, axis=axis) * (1 - weight)
+                + np.take(image, above, axis=axis) * weight)
+
+    def _pixels(self, xs, ys):
+        # Map coordinates to pixel coordinates
+        return (np.asarray(xs, dtype=np.float64) * self.scale,
+                (MAP_HEIGHT - np.asarray(ys, dtype=np.float64)) * self.scale)
+
+    def _draw_sprite(self, canvas, xs, ys, sprite):
+        # Blends a sprite, as colour and coverage arrays, centred on each of
+        # the map coordinates xs, ys (rounded to the nearest pixel corner)
+        rgb, coverage = sprite
+        px, py = self._pixels(xs, ys)
+        height, width = coverage.shape
+        rows = np.round(py).astype(np.int64)[:, None, None] \
+            + (np.arange(height) - height // 2)[None, :, None]
+        cols = np.round(px).astype(np.int64)[:, None, None] \
+            + (np.arange(width) - width // 2)[None, None, :]
+        rows, cols = np.broadcast_arrays(rows, cols)
+        count = len(px)
+        _blend(canvas, rows.ravel(), cols.ravel(),
+               np.broadcast_to(rgb, (count,) + rgb.shape).reshape(-1, 3),
+               np.broadcast_to(coverage, (count,) + coverage.shape).ravel())
+
+    def _disc(self, style, alpha=1.0):
+        # Sprite of a round scatter marker with a white edge
+        key = ('disc', style, alpha)
+        if key not in self._sprites:
+            color, area, edge_width = style
+            radius = np.sqrt(area) / 2 * self.point
+            edge_width *= self.point
+            dx, dy = _window(radius + edge_width, radius + edge_width)
+            self._sprites[key] = _edged_shape(np.hypot(dx, dy) - radius, edge_width,
+                                              _rgb(color), _rgb('white'), alpha)
+        return self._sprites[key]
+
+    def _star(self, style):
+        # Sprite of a '*' scatter marker with a white edge
+        key = ('star', style)
+        if key not in self._sprites:
+            color, area, edge_width = style
+            size = np.sqrt(area) * self.point
+            edge_width *= self.point
+            dx, dy = _window(size / 2 + edge_width, size / 2 + edge_width)
+            # The outline has y pointing up, pixel rows count down
+            distance = _polygon_distance(dx, -dy, _STAR * size)
+            self._sprites[key] = _edged_shape(distance, edge_width,
+                                              _rgb(color), _rgb('white'))
+        return self._sprites[key]
+
+    def _draw_line(self, canvas, xs, ys):
+        color, width, alpha = LINE_STYLE
+        px, py = self._pixels(xs, ys)
+        radius = width * self.point / 2
+        margin = int(np.ceil(radius)) + 1
+
+        # Coverage of the whole line over its bounding box. Taking the
+        # maximum over the segments keeps the joins from being drawn twice
+        top = max(int(py.min()) - margin, 0)
+        left = max(int(px.min()) - margin, 0)
+        bottom = min(int(py.max()) + margin + 1, canvas.shape[0])
+        right = min(int(px.max()) + margin + 1, canvas.shape[1])
+        if top >= bottom or left >= right:
+            return
+        coverage = np.zeros((bottom - top, right - left), dtype=np.float32)
+        for x0, y0, x1, y1 in zip(px[:-1], py[:-1], px[1:], py[1:]):
+            # Only the pixels around this segment
+            row0 = max(int(min(y0, y1)) - margin, top)
+            row1 = min(int(max(y0, y1)) + margin + 1, bottom)
+            col0 = max(int(min(x0, x1)) - margin, left)
+            col1 = min(int(max(x0, x1)) + margin + 1, right)
+            if row0 >= row1 or col0 >= col1:
+                continue
+            centre_y = np.arange(row0, row1)[:, None] + 0.5
+            centre_x = np.arange(col0, col1)[None, :] + 0.5
+            distance = _segment_distance(centre_x, centre_y, x0, y0, x1, y1)
+            region = coverage[row0 - top:row1 - top, col0 - left:col1 - left]
+            np.maximum(region, np.clip(radius + 0.5 - distance, 0.0, 1.0), out=region)
+
+        rows, cols = np.nonzero(coverage)
+        _blend(canvas, rows + top, cols + left, _rgb(color), coverage[rows, cols] * alpha)
+
+    def _glyphs(self, text, size):
+        # Coverage of text in the bold font, size in points, cropped to the
+        # glyphs
+        from matplotlib.font_manager import FontProperties, findfont, get_font
+
+        font = get_font(findfont(FontProperties(weight='bold')))
+        font.set_size(size, 72 * self.point)
+        font.set_text(text, 0.0)
+        font.draw_glyphs_to_bitmap()
+        return np.asarray(font.get_image(), dtype=np.float64) / 255.0
+
+    def _title(self, text):
+        # Sprite of white bold title text. Every route has its own title, so
+        # unlike the other sprites it is not kept
+        glyphs = self._glyphs(text, TITLE_FONT_SIZE)
+        return np.broadcast_to(_rgb('white'), glyphs.shape + (3,)), glyphs
+
+    def _label(self, text, color):
+        # Sprite of a START/END label: a rounded box with a white edge and
+        # white bold text
+        key = ('label', text, color)
+        if key in self._sprites:
+            return self._sprites[key]
+
+        glyphs = self._glyphs(text, LABEL_FONT_SIZE)
+
+        # Box of boxstyle 'round,pad=0.3': the padding is also the radius
+        # of the corners
+        pad = 0.3 * LABEL_FONT_SIZE * self.point
+        edge_width = self.point
+        half_width = glyphs.shape[1] / 2 + pad
+        half_height = glyphs.shape[0] / 2 + pad
+        dx, dy = _window(half_width + edge_width, half_height + edge_width)
+        qx = np.abs(dx) - (half_width - pad)
+        qy = np.abs(dy) - (half_height - pad)
+        distance = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0)) \
+            + np.minimum(np.maximum(qx, qy), 0) - pad
+        rgb, coverage = _edged_shape(distance, edge_width, _rgb(color), _rgb('white'), 0.9)
+
+        # White text over the box
+        text_coverage = np.zeros_like(coverage)
+        row = dy.shape[0] // 2 - glyphs.shape[0] // 2
+        col = dx.shape[1] // 2 - glyphs.shape[1] // 2
+        text_coverage[row:row + glyphs.shape[0], col:col + glyphs.shape[1]] = glyphs
+        total = text_coverage + coverage * (1 - text_coverage)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(total > 0, text_coverage / total, 0.0)[..., None]
+        rgb = _rgb('white') * share + rgb * (1 - share)
+
+        self._sprites[key] = (rgb, total)
+        return self._sprites[key]
+
+    def render(self, path):
+        """
+        Draws a route, given as a list of Nodes, and returns the image as
+        an array of 8-bit RGB pixels. Without a path the map is returned
+        with the door markers and visualize's default title only.
+        """
+        canvas = self.background.copy()
+        title = "Department Navigation System"
+        if path:
+            xs = np.array([node.x for node in path])
+            ys = np.array([node.y for node in path])
+            self._draw_line(canvas, xs, ys)
+
+            # Doors and other rooms along the route, not the junctions
+            stops = np.array(["Junction" not in node.name for node in path])
+            stops[[0, -1]] = False
+            self._draw_sprite(canvas, xs[stops], ys[stops], self._disc(STOP_STYLE))
+
+            ends = ((xs[0], ys[0], START_STYLE, "START"), (xs[-1], ys[-1], END_STYLE, "END"))
+            for x, y, style, _ in ends:
+                self._draw_sprite(canvas, [x], [y], self._star(style))
+            for x, y, style, label in ends:
+                self._draw_sprite(canvas, [x], [y - LABEL_OFFSET], self._label(label, style[0]))
+
+            start, end = (node.name.replace("_door", "").replace("_", " ")
+                          for node in (path[0], path[-1]))
+            title = f"Path from {start} to {end}"
+
+        # Centred in the title bar
+        self._draw_sprite(canvas, [MAP_WIDTH / 2], [(TITLE_BAR_Y + MAP_HEIGHT) / 2],
+                          self._title(title))
+        return canvas
+
+    def render_png(self, path):
+        """
+        Draws a route like render and returns it as PNG file contents.
+        Only the bands of rows the route is drawn on are compressed; the
+        others are taken from the compressed background.
+        """
+        pixels = self.render(path)
+        filtered = _filter_rows(pixels)
+        # A filtered row changes with its own pixels and those above it
+        changed = (pixels != self.background).any(axis=(1, 2))
+        changed[1:] |= changed[:-1]
+        bands = list(self._bands)
+        for band in np.flatnonzero(np.add.reduceat(
+                changed, np.arange(0, len(changed), PNG_BAND_ROWS))):
+            rows = filtered[band * PNG_BAND_ROWS:(band + 1) * PNG_BAND_ROWS]
+            bands[band] = _deflate(rows.tobytes())
+        return _png(pixels, bands, zlib.adler32(filtered))
+
+
+def _filter_rows(pixels):
+    # The PNG scanlines of the pixels, every row with the "up" filter (the
+    # difference to the row above), which turns the large flat areas of the
+    # floor plan into zeros that zlib compresses well
+    height, width = pixels.shape[:2]
+    rows = pixels.reshape(height, width * 3)
+    filtered = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    filtered[:, 0] = 2  # Filter type "up"
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+    return filtered
+
+
+def _deflate(data, level=PNG_COMPRESS_LEVEL):
+    # Raw deflate data that ends on a byte boundary and does not refer back
+    # to earlier data, so that such pieces can be joined into one stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def _deflate_bands(filtered, level=PNG_COMPRESS_LEVEL):
+    return [_deflate(filtered[row:row + PNG_BAND_ROWS].tobytes(), level)
+            for row in range(0, len(filtered), PNG_BAND_ROWS)]
+
+
+def _png(pixels, bands, checksum):
+    # PNG file of the pixels from their compressed scanlines
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+
+    height, width = pixels.shape[:2]
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    # zlib header, the pieces, an empty final block and the Adler-32 checksum
+    data = b''.join([b'\x78\x01', *bands, b'\x03\x00', struct.pack('>I', checksum)])
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', data) + chunk(b'IEND', b''))
+
+
+def encode_png(pixels, level=PNG_COMPRESS_LEVEL):
+    """
+    Encodes an (height, width, 3) array of 8-bit RGB pixels as a PNG file.
+    """
+    filtered = _filter_rows(pixels)
+    return _png(pixels, _deflate_bands(filtered, level), zlib.adler32(filtered))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Draw the route between two rooms into a PNG file without matplotlib figures.")
+    parser.add_argument("start", help='start room, e.g. "Library"')
+    parser.add_argument("end", help='destination room, e.g. "Room 106"')
+    parser.add_argument("-o", "--output", default="route.png",
+                        help="image file (default: route.png)")
+    parser.add_argument("--width", type=int, default=MAP_WIDTH,
+                        help=f"image width in pixels (default: {MAP_WIDTH})")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE,
+                        choices=sorted(WEIGHT_PROFILES),
+                        help=f"weight profile (default: {DEFAULT_PROFILE})")
+    args = parser.parse_args()
+
+    nav_system = NavigationSystem()
+    nav_system.profile = args.profile
+    path, distance = nav_system.route(args.start, args.end)
+    if path is None:
+        print(f"No path found between {args.start} and {args.end}")
+        return 1
+
+    renderer = RasterRenderer(nav_system.graph, args.width)
+    started = time.perf_counter()
+    data = renderer.render_png([nav_system.graph.nodes[name] for name in path])
+    elapsed = time.perf_counter() - started
+    with open(args.output, 'wb') as file:
+        file.write(data)
+    print(f"Distance: {distance:.1f}")
+    print(f"Route image written to {args.output} in {elapsed * 1000:.1f} ms "
+          f"({len(data)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())